@@ -0,0 +1,111 @@
+"""
+Бенчмарк догонки опоздавших постов при старте (services.scheduler.PublishDispatcher._catch_up).
+
+Временная БД содержит --overdue постов, опоздавших в пределах окна MISFIRE_GRACE_SECONDS,
+--stale постов, опоздавших дольше окна, и один "свежий" пост, время которого наступает через две секунды
+после заполнения БД. Для каждой политики MISFIRE_POLICY замеряет время start() (не должно зависеть от хвоста),
+задержку свежего поста (хвост не должен ее увеличивать) и итоговые статусы. Публикация - через заглушку бота.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_catch_up --overdue 5000 --stale 5000 --rate 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")  # Бот создается в loader, но в сеть не обращается
+
+import services.scheduler as scheduler_service  # noqa: E402
+from loader import bot, db_manager, get_db  # noqa: E402
+from models.database import Database  # noqa: E402
+
+FRESH_CONTENT = "Свежий пост"
+
+
+class StubBot:
+    """Заглушка бота: запоминает момент отправки свежего поста."""
+
+    def __init__(self):
+        self.sent = 0
+        self.fresh_sent_at = None
+
+    async def send_message(self, text, **kwargs):
+        self.sent += 1
+        if text == FRESH_CONTENT:
+            self.fresh_sent_at = datetime.now()
+        return SimpleNamespace(message_id=self.sent)
+
+    send_photo = send_video = send_message
+
+
+def populate(db_path: str, overdue: int, stale: int) -> datetime:
+    db = Database(db_path, reader_connections=0)
+    now = datetime.now()
+    grace = timedelta(seconds=scheduler_service.MISFIRE_GRACE_SECONDS)
+    # user_id = 0: уведомления пользователям пропускаются
+    rows = [(0, f"Опоздавший {i}", (now - grace * (i + 1) / (overdue + 1)).isoformat()) for i in range(overdue)]
+    rows += [(0, f"Давно опоздавший {i}", (now - grace - timedelta(minutes=i + 1)).isoformat()) for i in range(stale)]
+    fresh_time = now + timedelta(seconds=2)
+    rows.append((0, FRESH_CONTENT, fresh_time.isoformat()))
+    db.connection.executemany(
+        "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, -100, ?, ?, 'scheduled')",
+        rows
+    )
+    db.connection.commit()
+    db.connection.close()
+    return fresh_time
+
+
+async def run_policy(db_path: str, fresh_time: datetime, policy: str, rate: float) -> dict:
+    db_manager._db_name = db_path
+    await db_manager.startup()
+    stub_bot = StubBot()
+    scheduler_service.bot = stub_bot
+    pool = scheduler_service.PublisherPool(scheduler_service.PUBLISH_WORKERS, weights={scheduler_service.LANE_BULK: 1},
+                                           capacities={scheduler_service.LANE_BULK: scheduler_service.DISPATCH_BATCH_SIZE})
+    dispatcher = scheduler_service.PublishDispatcher(pool, misfire_policy=policy, replay_rate=rate)
+    try:
+        pool.start()
+        started = time.perf_counter()
+        await dispatcher.start()
+        start_s = time.perf_counter() - started
+        db = get_db()
+        while await db.fetchone("SELECT 1 FROM posts WHERE status IN ('scheduled', 'publishing') "
+                                "AND COALESCE(next_attempt_at, publish_time) <= ? LIMIT 1", (datetime.now().isoformat(),)) \
+                or stub_bot.fresh_sent_at is None:
+            await asyncio.sleep(0.05)
+        total_s = time.perf_counter() - started
+        statuses = dict(await db.fetchall("SELECT status, COUNT(*) FROM posts GROUP BY status"))
+        await dispatcher.stop()
+        await pool.stop()
+    finally:
+        scheduler_service.bot = bot
+        await db_manager.shutdown()
+    return {"start": start_s, "fresh_lag": (stub_bot.fresh_sent_at - fresh_time).total_seconds(), "total": total_s,
+            "statuses": statuses}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--overdue", type=int, default=5_000)
+    parser.add_argument("--stale", type=int, default=5_000)
+    parser.add_argument("--rate", type=float, default=2_000, help="MISFIRE_REPLAY_RATE для замера, постов/с")
+    args = parser.parse_args()
+
+    print(f"{'политика':>10} | {'start, мс':>9} | {'задержка свежего, мс':>20} | {'всего, с':>8} | статусы")
+    for policy in ("publish", "missed", "reschedule"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "catch_up.db")
+            fresh_time = populate(db_path, args.overdue, args.stale)
+            r = await run_policy(db_path, fresh_time, policy, args.rate)
+        print(f"{policy:>10} | {r['start'] * 1000:>9.1f} | {r['fresh_lag'] * 1000:>20.1f} | {r['total']:>8.2f} | "
+              f"{r['statuses']}")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
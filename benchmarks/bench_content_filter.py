@@ -0,0 +1,103 @@
+"""
+Бенчмарк проверки текста на запрещенные слова (services.content_filter, services.aho_corasick).
+
+Для списков из --sizes слов (случайные "слова" из кириллицы) и текстов длиной --lengths символов
+сравнивает прежнюю проверку (отдельный поиск подстроки для каждого слова) с автоматом Ахо-Корасик
+на чистом Python и, если установлен pyahocorasick, с ускоренной реализацией. Печатает время сборки
+автомата, среднее время одной проверки и какую реализацию выбирает build_matcher() для такого списка.
+Отдельной колонкой - режим CONTENT_FILTER_MODE=words (services.word_matcher: нормализация текста и поиск
+целых слов); его результаты по определению отличаются и со старой проверкой не сравниваются; завершается с кодом 1, если найденные слова отличаются.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_content_filter --sizes 10 1000 100000 --lengths 100 1000 4096
+"""
+import argparse
+import random
+import sys
+import time
+
+from services.aho_corasick import AhoCorasick, PyAhoCorasick, ahocorasick, build_matcher
+from services.word_matcher import WordMatcher
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def naive_check(banned_words: set[str], text: str) -> list[str]:
+    """Прежняя реализация ContentFilter.check_text."""
+    text_lower = text.lower()
+    return [word for word in banned_words if word in text_lower]
+
+
+def random_word(rng: random.Random, min_length: int, max_length: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_length, max_length)))
+
+
+def make_texts(rng: random.Random, words: list[str], length: int, count: int) -> list[str]:
+    """Тексты из случайных слов; в половину подмешаны несколько запрещенных слов в разном регистре."""
+    texts = []
+    for i in range(count):
+        parts, size = [], 0
+        while size < length:
+            if i % 2 and rng.random() < 0.05:
+                part = rng.choice(words).capitalize()
+            else:
+                part = random_word(rng, 2, 9)
+            parts.append(part)
+            size += len(part) + 1
+        texts.append(" ".join(parts)[:length])
+    return texts
+
+
+def timed_per_call(func, texts: list[str], budget: float) -> tuple[float, list]:
+    """Среднее время вызова (мкс) - повторяет проход по текстам, пока не исчерпан бюджет времени."""
+    results = [func(text) for text in texts]
+    calls, started = len(texts), time.perf_counter()
+    while time.perf_counter() - started < budget:
+        for text in texts:
+            func(text)
+        calls += len(texts)
+    return (time.perf_counter() - started) * 1e6 / max(calls - len(texts), 1), results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1_000, 4_096])
+    parser.add_argument("--texts", type=int, default=20, help="Текстов на каждую длину")
+    parser.add_argument("--budget", type=float, default=0.5, help="Секунд замера на каждую реализацию")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    ok = True
+    print(f"{'слов':>7} | {'символов':>8} | {'сборка, мс':>10} | {'прежняя, мкс':>12} | {'Ахо-Корасик, мкс':>16} | "
+          f"{'pyahocorasick, мкс':>18} | {'слова, мкс':>10} | {'сборка слов, мс':>15} | build_matcher")
+    for size in args.sizes:
+        banned_words = {random_word(rng, 4, 10) for _ in range(size)}
+        started = time.perf_counter()
+        matcher = AhoCorasick(banned_words)
+        build_ms = (time.perf_counter() - started) * 1000
+        fast_matcher = PyAhoCorasick(banned_words) if ahocorasick is not None else None
+        chosen = type(build_matcher(banned_words)).__name__
+        started = time.perf_counter()
+        word_matcher = WordMatcher(banned_words)
+        word_build_ms = (time.perf_counter() - started) * 1000
+        for length in args.lengths:
+            texts = make_texts(rng, sorted(banned_words), length, args.texts)
+            naive_us, expected = timed_per_call(lambda text: naive_check(banned_words, text), texts, args.budget)
+            matcher_us, found = timed_per_call(lambda text: matcher.find_all(text.lower()), texts, args.budget)
+            ok &= all(set(a) == set(b) and len(a) == len(b) for a, b in zip(expected, found))
+            fast_text = "не установлен"
+            if fast_matcher is not None:
+                fast_us, fast_found = timed_per_call(lambda text: fast_matcher.find_all(text.lower()), texts,
+                                                     args.budget)
+                ok &= all(set(a) == set(b) for a, b in zip(expected, fast_found))
+                fast_text = f"{fast_us:.1f}"
+            words_us, _ = timed_per_call(word_matcher.find_all, texts, args.budget)
+            print(f"{size:>7} | {length:>8} | {build_ms:>10.1f} | {naive_us:>12.1f} | {matcher_us:>16.1f} | "
+                  f"{fast_text:>18} | {words_us:>10.1f} | {word_build_ms:>15.1f} | {chosen}")
+    print(f"{'ok  ' if ok else 'FAIL'} результаты совпадают с прежней проверкой")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
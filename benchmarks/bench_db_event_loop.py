@@ -0,0 +1,103 @@
+"""
+Бенчмарк задержки event loop при конкурентной работе пользователей с БД.
+
+Сравнивает прямые синхронные вызовы sqlite3 в корутинах (старое поведение)
+с асинхронным API Database, который выполняет запросы в потоке БД.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_db_event_loop --users 50 --queries 20 --rows 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from models.database import Database
+
+TICK_INTERVAL = 0.005  # Период "пульса" event loop, по отклонению от которого меряем задержку
+
+
+def populate(db: Database, rows: int, users: int):
+    start = datetime(2025, 1, 1)
+    statuses = ("published", "scheduled", "failed", "cancelled")
+    db.connection.executemany(
+        "INSERT OR IGNORE INTO bot_users (user_id, username) VALUES (?, ?)",
+        [(uid, f"user{uid}") for uid in range(1, users + 1)]
+    )
+    db.connection.executemany(
+        """INSERT INTO posts (user_id, channel_id, content, publish_time, status)
+           VALUES (?, ?, ?, ?, ?)""",
+        (
+            (random.randint(1, users), -1000000000000 - (i % 50), f"Пост номер {i}",
+             (start + timedelta(minutes=i)).isoformat(), random.choice(statuses))
+            for i in range(rows)
+        )
+    )
+    db.connection.commit()
+
+
+async def loop_ticker(lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_INTERVAL
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def simulated_user(db: Database, user_id: int, queries: int, use_async: bool):
+    query = """SELECT id, content, publish_time, status FROM posts
+               WHERE user_id = ? ORDER BY publish_time DESC LIMIT 5"""
+    for _ in range(queries):
+        if use_async:
+            await db.fetchall(query, (user_id,))
+        else:
+            db._fetchall_sync(query, (user_id,))  # Старое поведение: блокирующий вызов прямо в loop
+        await asyncio.sleep(0)
+
+
+async def run_scenario(db: Database, users: int, queries: int, use_async: bool) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(loop_ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(simulated_user(db, uid, queries, use_async) for uid in range(1, users + 1)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "elapsed_s": elapsed,
+        "lag_p50_ms": statistics.median(lags_ms),
+        "lag_p99_ms": lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))],
+        "lag_max_ms": lags_ms[-1],
+        "ticks": len(lags),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Количество одновременных пользователей")
+    parser.add_argument("--queries", type=int, default=20, help="Запросов на пользователя")
+    parser.add_argument("--rows", type=int, default=200_000, help="Строк в таблице posts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "bench.db"))
+        populate(db, args.rows, args.users)
+        print(f"posts: {args.rows} строк, пользователей: {args.users}, запросов на пользователя: {args.queries}")
+
+        for title, use_async in (("sync (в event loop)", False), ("async (поток БД)", True)):
+            result = await run_scenario(db, args.users, args.queries, use_async)
+            print(f"{title:<22} время {result['elapsed_s']:.2f} c | задержка loop: "
+                  f"p50 {result['lag_p50_ms']:.1f} мс, p99 {result['lag_p99_ms']:.1f} мс, "
+                  f"max {result['lag_max_ms']:.1f} мс ({result['ticks']} тиков)")
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Бенчмарк диспетчера отложенных публикаций (services.scheduler.PublishDispatcher).
+
+Для каждого размера очереди заполняет временную БД постами со статусом 'scheduled' на --days вперед
+и --due наступившими постами, затем замеряет:
+  * next_publish_time - поиск ближайшего поста, по которому диспетчер выбирает время сна;
+  * claim - забор пачки наступивших постов одним UPDATE ... RETURNING;
+  * insert - сохранение нового поста (стоимость индексов и триггеров счетчиков);
+  * drain - время, за которое диспетчер с воркерами публикует все наступившие посты через заглушку бота.
+Время операций с БД не должно заметно расти с размером очереди.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_dispatcher --sizes 1000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")  # Бот создается в loader, но в сеть не обращается
+
+import services.scheduler as scheduler_service  # noqa: E402
+from loader import bot, db_manager, get_db  # noqa: E402
+from models.database import Database  # noqa: E402
+
+
+class StubBot:
+    """Заглушка бота: "отправляет" сообщение без обращения к Telegram."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, **kwargs):
+        self.sent += 1
+        return SimpleNamespace(message_id=self.sent)
+
+    send_photo = send_video = send_message
+
+
+def populate(db_path: str, rows: int, due: int, days: int):
+    db = Database(db_path, reader_connections=0)
+    now = datetime.now()
+    start = now + timedelta(hours=1)
+    step = timedelta(days=days) / max(rows, 1)
+    posts = [(i % 100, -1000000000000 - i % 50, f"Пост {i}", (start + step * i).isoformat()) for i in range(rows)]
+    # user_id = 0: уведомления о публикации пропускаются
+    posts += [(0, -1000000000000, f"Наступивший пост {i}", (now - timedelta(seconds=i)).isoformat())
+              for i in range(due)]
+    db.connection.executemany(
+        "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, ?, ?, ?, 'scheduled')",
+        posts
+    )
+    db.connection.commit()
+    db.connection.close()
+
+
+async def timed(coro_factory, repeats: int) -> float:
+    """Среднее время вызова в миллисекундах."""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        await coro_factory()
+    return (time.perf_counter() - started) * 1000 / repeats
+
+
+async def measure(db_path: str, due: int, repeats: int) -> dict:
+    db_manager._db_name = db_path
+    await db_manager.startup()
+    db = get_db()
+    stub_bot = StubBot()
+    scheduler_service.bot = stub_bot
+    result = {}
+    try:
+        result["next"] = await timed(scheduler_service.next_publish_time, repeats)
+
+        async def claim_and_release():
+            rows = await scheduler_service.claim_due_posts(datetime.now(), scheduler_service.DISPATCH_BATCH_SIZE)
+            await db.execute(
+                f"UPDATE posts SET status = 'scheduled' WHERE id IN ({','.join('?' * len(rows))})",
+                tuple(row[0] for row in rows), commit=True
+            )
+        result["claim"] = await timed(claim_and_release, repeats)
+
+        far_future = (datetime.now() + timedelta(days=3650)).isoformat()
+        result["insert"] = await timed(lambda: db.execute(
+            "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (1, -1, 'x', ?, 'scheduled')",
+            (far_future,), commit=True
+        ), repeats)
+
+        pool = scheduler_service.PublisherPool(
+            scheduler_service.PUBLISH_WORKERS, weights={scheduler_service.LANE_BULK: 1},
+            capacities={scheduler_service.LANE_BULK: scheduler_service.DISPATCH_BATCH_SIZE}
+        )
+        # Наступившие посты при старте идут через догонку: темп повтора не ограничиваем, меряем пропускную способность
+        dispatcher = scheduler_service.PublishDispatcher(pool, replay_rate=1_000_000)
+        started = time.perf_counter()
+        pool.start()
+        await dispatcher.start()
+        while stub_bot.sent < due:
+            await asyncio.sleep(0.01)
+        result["drain"] = time.perf_counter() - started
+        await dispatcher.stop()
+        await pool.stop()
+    finally:
+        scheduler_service.bot = bot
+        await db_manager.shutdown()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--due", type=int, default=1_000, help="Сколько постов уже наступило к старту")
+    parser.add_argument("--days", type=int, default=30, help="На сколько дней вперед распределена очередь")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'в очереди':>10} | {'next, мс':>9} | {'claim, мс':>10} | {'insert, мс':>11} | drain {args.due} постов")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "dispatcher.db")
+            populate(db_path, size, args.due, args.days)
+            r = await measure(db_path, args.due, args.repeats)
+        print(f"{size:>10} | {r['next']:>9.3f} | {r['claim']:>10.3f} | {r['insert']:>11.3f} | {r['drain']:.3f} c")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
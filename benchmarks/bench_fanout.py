@@ -0,0 +1,165 @@
+"""
+Бенчмарк публикации одного поста в несколько каналов (group_id в posts, services.scheduler).
+
+Временная БД содержит --channels каналов пользователя. Заглушка бота "отправляет" сообщение за --latency секунд.
+Сценарии:
+  * sequential - как до групповой публикации: для каждого канала отдельная вставка, отправка и UPDATE по очереди;
+  * fanout - как в handlers/posts.py: одна вставка всех постов (INSERT ... RETURNING), параллельная отправка
+    через пул публикации и один общий отчет;
+  * scheduled - группа отложенных постов через диспетчер, один канал отвечает постоянной ошибкой:
+    владелец должен получить ровно одно уведомление - общий отчет по группе.
+Завершается с кодом 1, если отчет не совпал с ожидаемым.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_fanout --channels 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")  # Бот создается в loader, но в сеть не обращается
+
+from aiogram.exceptions import TelegramBadRequest  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+
+import services.scheduler as scheduler_service  # noqa: E402
+from loader import bot, db_manager, get_db  # noqa: E402
+
+USER_ID = 1
+BROKEN_CHANNEL_ID = -1000000000000
+
+
+class StubBot:
+    """Заглушка бота: отправка в канал занимает latency секунд, уведомления пользователю запоминаются."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sent_to_channels = 0
+        self.notifications = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id == USER_ID:
+            self.notifications.append(text)
+            return SimpleNamespace(message_id=0)
+        await asyncio.sleep(self.latency)
+        if chat_id == BROKEN_CHANNEL_ID:
+            raise TelegramBadRequest(SendMessage(chat_id=chat_id, text=text), "chat not found")
+        self.sent_to_channels += 1
+        return SimpleNamespace(message_id=self.sent_to_channels)
+
+
+def new_pool() -> scheduler_service.PublisherPool:
+    return scheduler_service.PublisherPool(scheduler_service.PUBLISH_WORKERS,
+                                           weights={scheduler_service.LANE_INTERACTIVE: 1,
+                                                    scheduler_service.LANE_BULK: 1})
+
+
+async def insert_posts(channel_ids: list[int], status: str, publish_time: datetime, group_id: str | None) -> list:
+    db = get_db()
+    is_publishing = status == "publishing"
+    rows_values = [(USER_ID, channel_id, "Пост", publish_time.isoformat(), status,
+                    scheduler_service.PUBLISHER_ID if is_publishing else None,
+                    scheduler_service.lease_deadline().isoformat() if is_publishing else None, group_id)
+                   for channel_id in channel_ids]
+    return await db.execute_returning(
+        f"""INSERT INTO posts (user_id, channel_id, content, publish_time, status, lease_owner, lease_until, group_id)
+            VALUES {', '.join(['(?, ?, ?, ?, ?, ?, ?, ?)'] * len(rows_values))}
+            RETURNING {scheduler_service.CLAIMED_POST_COLUMNS}""",
+        tuple(value for row_values in rows_values for value in row_values)
+    )
+
+
+async def run_sequential(channel_ids: list[int], stub_bot: StubBot) -> float:
+    db = get_db()
+    started = time.perf_counter()
+    for channel_id in channel_ids:
+        cursor = await db.execute(
+            "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, ?, 'Пост', ?, 'publishing')",
+            (USER_ID, channel_id, datetime.now().isoformat()), commit=True
+        )
+        message = await scheduler_service.send_post_content(stub_bot, channel_id, "Пост", None, None)
+        await db.execute("UPDATE posts SET status = 'published', message_id = ? WHERE id = ?",
+                         (message.message_id, cursor.lastrowid), commit=True)
+    return time.perf_counter() - started
+
+
+async def run_fanout(channel_ids: list[int], stub_bot: StubBot) -> tuple[float, str]:
+    pool = new_pool()
+    pool.start()
+    started = time.perf_counter()
+    claimed_posts = await insert_posts(channel_ids, "publishing", datetime.now(), uuid4().hex)
+    await asyncio.gather(*(pool.run(scheduler_service.LANE_INTERACTIVE, scheduler_service.publish_claimed_post,
+                                    post_row, stub_bot, False)
+                           for post_row in claimed_posts))
+    report = await scheduler_service.build_publish_report(post_ids=[row[0] for row in claimed_posts])
+    elapsed = time.perf_counter() - started
+    await pool.stop()
+    return elapsed, report
+
+
+async def run_scheduled_group(channel_ids: list[int], stub_bot: StubBot) -> list[str]:
+    await insert_posts(channel_ids + [BROKEN_CHANNEL_ID], "scheduled", datetime.now() - timedelta(seconds=1),
+                       uuid4().hex)
+    scheduler_service.bot = stub_bot
+    pool = new_pool()
+    dispatcher = scheduler_service.PublishDispatcher(pool)
+    try:
+        pool.start()
+        await dispatcher.start()
+        while not stub_bot.notifications:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)  # Лишние уведомления, если они есть, успевают прийти
+        await dispatcher.stop()
+        await pool.stop()
+    finally:
+        scheduler_service.bot = bot
+    return stub_bot.notifications
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="Время одной отправки в канал, с")
+    args = parser.parse_args()
+
+    channel_ids = [BROKEN_CHANNEL_ID - i - 1 for i in range(args.channels)]
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager._db_name = os.path.join(tmp_dir, "fanout.db")
+        await db_manager.startup()
+        try:
+            db = get_db()
+            for channel_id in channel_ids + [BROKEN_CHANNEL_ID]:
+                await db.execute("INSERT INTO channels (user_id, channel_id, title) VALUES (?, ?, ?)",
+                                 (USER_ID, channel_id, f"Канал {channel_id}"), commit=True)
+
+            sequential_s = await run_sequential(channel_ids, StubBot(args.latency))
+            fanout_s, report = await run_fanout(channel_ids, StubBot(args.latency))
+            print(f"sequential: {sequential_s:.3f} c, fanout: {fanout_s:.3f} c "
+                  f"({args.channels} каналов, воркеров пула {scheduler_service.PUBLISH_WORKERS})")
+            expected_header = f"в каналах: {args.channels} из {args.channels}"
+            ok &= expected_header in report
+            print(f"{'ok  ' if expected_header in report else 'FAIL'} отчет немедленной публикации: "
+                  f"{report.splitlines()[0]}")
+
+            notifications = await run_scheduled_group(channel_ids, StubBot(args.latency))
+            expected_header = f"в каналах: {args.channels} из {args.channels + 1}"
+            is_single_report = len(notifications) == 1 and expected_header in notifications[0] \
+                and "chat not found" in notifications[0]
+            ok &= is_single_report
+            print(f"{'ok  ' if is_single_report else 'FAIL'} отложенная группа: уведомлений {len(notifications)}, "
+                  f"{notifications[0].splitlines()[0] if notifications else '-'}")
+        finally:
+            await db_manager.shutdown()
+            await bot.session.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,211 @@
+"""
+Сквозной бенчмарк хендлеров: проигрывание синтетических апдейтов через dp.feed_update.
+
+Бот работает с заглушкой сессии (без сети, запросы к Bot API только записываются), БД - временная.
+Каждый из --users симулированных пользователей проходит полный сценарий создания поста, все пользователи
+одновременно. Нечетные пользователи выбирают шаблон с переменной, четные пишут пост вручную:
+  /new_post -> шаблон (+ значение переменной) или "без шаблона" -> отметка канала -> "Готово"
+  -> текст поста (для ручного) -> /skip_media -> время публикации -> подтверждение.
+Одновременно активны не больше --concurrency пользователей (по умолчанию все). Для каждого хендлера
+печатаются p50/p95/p99 времени обработки апдейта (feed_update целиком), среднее число запросов к БД
+и к Bot API на апдейт. Завершается с кодом 1, если не все посты оказались запланированы.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_handlers --users 200
+    python -m benchmarks.bench_handlers --users 200 --concurrency 1
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import count
+
+os.environ.setdefault("BOT_TOKEN", "123456:replay")  # Бот создается в loader, но в сеть не обращается
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.types import Update, Message, CallbackQuery, Chat, User  # noqa: E402
+
+from loader import dp, db_manager, get_db  # noqa: E402
+from handlers import common, channels, posts, history, templates, admin_features, scheduled_posts  # noqa: E402
+
+CHANNELS_PER_USER = 3
+TEMPLATE_NAME = "Анонс"
+TEMPLATE_CONTENT = "Скоро стартует {[Событие]}! Не пропустите."
+
+# Статистика текущего апдейта: хендлер, запросы к БД и к Bot API
+current_update = contextvars.ContextVar("current_update")
+
+
+class RecordingSession(BaseSession):
+    """Сессия без сети: считает запросы к Bot API и возвращает правдоподобные ответы."""
+
+    def __init__(self):
+        super().__init__()
+        self.message_ids = count(1000)
+
+    async def make_request(self, bot, method, timeout=None):
+        stats = current_update.get(None)
+        if stats is not None:
+            stats["api"] += 1
+        name = type(method).__name__
+        if name.startswith("Send") or name.startswith("Edit"):
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message.model_validate({
+                "message_id": next(self.message_ids), "date": datetime.now(), "text": getattr(method, "text", None),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+            })
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+async def handler_name_middleware(handler, event, data):
+    """Внутренний middleware: запоминает, какой хендлер обработал апдейт."""
+    stats = current_update.get(None)
+    if stats is not None:
+        stats["handler"] = data["handler"].callback.__name__
+    return await handler(event, data)
+
+
+def count_db_calls(db):
+    """Оборачивает run/run_read экземпляра БД: через них проходит каждый запрос (execute, fetchone и т.д.)."""
+    for name in ("run", "run_read"):
+        original = getattr(db, name)
+
+        async def counted(*args, __original=original, **kwargs):
+            stats = current_update.get(None)
+            if stats is not None:
+                stats["db"] += 1
+            return await __original(*args, **kwargs)
+
+        setattr(db, name, counted)
+
+
+class SimulatedUser:
+    def __init__(self, user_id: int, bot: Bot, results: list):
+        self.user = User(id=user_id, is_bot=False, first_name=f"User{user_id}")
+        self.chat = Chat(id=user_id, type="private")
+        self.bot = bot
+        self.results = results
+
+    async def feed(self, update: Update):
+        stats = {"handler": None, "db": 0, "api": 0}
+        token = current_update.set(stats)
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(self.bot, update)
+        finally:
+            current_update.reset(token)
+        stats["total"] = time.perf_counter() - started
+        self.results.append(stats)
+
+    async def send_text(self, text: str, update_ids: count):
+        message = Message(message_id=next(update_ids), date=datetime.now(), chat=self.chat, from_user=self.user,
+                          text=text)
+        await self.feed(Update(update_id=next(update_ids), message=message))
+
+    async def press(self, data: str, update_ids: count):
+        # Кнопки всегда под последним сообщением бота; его содержимое хендлерам не важно
+        message = Message(message_id=next(update_ids), date=datetime.now(), chat=self.chat, text="...")
+        callback = CallbackQuery(id=str(next(update_ids)), from_user=self.user, chat_instance="replay",
+                                 message=message, data=data)
+        await self.feed(Update(update_id=next(update_ids), callback_query=callback))
+
+
+async def user_flow(user: SimulatedUser, use_template: bool, template_id: int, channel_id: int, update_ids: count):
+    publish_time = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y %H:%M")
+    await user.send_text("/new_post", update_ids)
+    if use_template:
+        await user.press(f"post_tpl_use_{template_id}", update_ids)
+        await user.send_text("Вебинар", update_ids)
+    else:
+        await user.press("post_tpl_skip", update_ids)
+    await user.press(f"channel_{channel_id}", update_ids)
+    await user.press("channels_done", update_ids)
+    if not use_template:
+        await user.send_text("Текст поста, написанный вручную.", update_ids)
+    await user.send_text("/skip_media", update_ids)
+    await user.send_text(publish_time, update_ids)
+    await user.press("post_confirm_yes", update_ids)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, help="Сколько пользователей проходят сценарий одновременно")
+    args = parser.parse_args()
+
+    for module in (common, channels, posts, history, templates, admin_features, scheduled_posts):
+        dp.include_router(module.router)  # Как в main.py
+    dp.message.middleware(handler_name_middleware)
+    dp.callback_query.middleware(handler_name_middleware)
+
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=RecordingSession())
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager._db_name = os.path.join(tmp_dir, "handlers.db")
+        await db_manager.startup()
+        try:
+            db = get_db()
+            cursor = await db.execute("INSERT INTO templates (user_id, name, content) VALUES (0, ?, ?)",
+                                      (TEMPLATE_NAME, TEMPLATE_CONTENT), commit=True)
+            template_id = cursor.lastrowid
+            users = []
+            for user_number in range(1, args.users + 1):
+                for channel_number in range(CHANNELS_PER_USER):
+                    await db.execute("INSERT INTO channels (user_id, channel_id, title) VALUES (?, ?, ?)",
+                                     (user_number, -1000000000000 - user_number * 10 - channel_number,
+                                      f"Канал {user_number}.{channel_number}"), commit=True)
+                users.append(SimulatedUser(user_number, bot, results))
+            count_db_calls(db)
+
+            update_ids = count(1)
+            semaphore = asyncio.Semaphore(args.concurrency or args.users)
+
+            async def run_user(user: SimulatedUser):
+                async with semaphore:
+                    await user_flow(user, user.user.id % 2 == 1, template_id, -1000000000000 - user.user.id * 10,
+                                    update_ids)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(run_user(user) for user in users))
+            elapsed = time.perf_counter() - started
+            scheduled = (await get_db().fetchone("SELECT COUNT(*) FROM posts WHERE status = 'scheduled'"))[0]
+        finally:
+            await db_manager.shutdown()
+
+    by_handler = defaultdict(list)
+    for stats in results:
+        by_handler[stats["handler"] or "(не обработан)"].append(stats)
+
+    print(f"{args.users} пользователей, {len(results)} апдейтов за {elapsed:.2f} с "
+          f"({len(results) / elapsed:.0f} апдейтов/с)")
+    print(f"{'хендлер':>30} | {'апдейтов':>8} | {'p50, мс':>8} | {'p95, мс':>8} | {'p99, мс':>8} | БД/апд | API/апд")
+    for handler_name, handler_stats in sorted(by_handler.items()):
+        times = [stats["total"] * 1000 for stats in handler_stats]
+        print(f"{handler_name:>30} | {len(handler_stats):>8} | {percentile(times, 0.5):>8.2f} | "
+              f"{percentile(times, 0.95):>8.2f} | {percentile(times, 0.99):>8.2f} | "
+              f"{sum(s['db'] for s in handler_stats) / len(handler_stats):>6.1f} | "
+              f"{sum(s['api'] for s in handler_stats) / len(handler_stats):>7.1f}")
+    ok = scheduled == args.users and "(не обработан)" not in by_handler
+    print(f"{'ok  ' if ok else 'FAIL'} запланировано постов: {scheduled} из {args.users}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
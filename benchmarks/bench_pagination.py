@@ -0,0 +1,94 @@
+"""
+Бенчмарк пагинации истории: LIMIT/OFFSET + COUNT(*) против пагинации по ключу (publish_time, id)
+со счетчиком из user_post_counters.
+
+Заполняет временную БД (по умолчанию 1 000 000 постов одного пользователя, с совпадающими
+publish_time) и замеряет стоимость открытия страницы N обоими способами, сверяя, что страницы совпадают.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_pagination --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from models.database import Database
+
+PER_PAGE = 5
+USER_ID = 1
+
+SELECT_SQL = """SELECT p.id, ch.title, p.content, p.publish_time, p.status, p.message_id, p.channel_id
+    FROM posts p
+    LEFT JOIN channels ch ON p.channel_id = ch.channel_id AND p.user_id = ch.user_id
+    WHERE p.user_id = ?"""
+
+OFFSET_SQL = f"{SELECT_SQL} ORDER BY p.publish_time DESC, p.id DESC LIMIT ? OFFSET ?"
+OFFSET_COUNT_SQL = "SELECT COUNT(*) FROM posts WHERE user_id = ?"
+
+KEYSET_SQL = f"""{SELECT_SQL} AND (p.publish_time, p.id) < (?, ?)
+    ORDER BY p.publish_time DESC, p.id DESC LIMIT ?"""
+KEYSET_COUNT_SQL = "SELECT posts_total FROM user_post_counters WHERE user_id = ?"
+
+
+def populate(db: Database, rows: int):
+    start = datetime(2020, 1, 1)
+    connection = db.connection
+    connection.execute("INSERT INTO bot_users (user_id, username) VALUES (?, 'power_user')", (USER_ID,))
+    connection.execute("INSERT INTO channels (user_id, channel_id, title) VALUES (?, -1001, 'Канал')", (USER_ID,))
+    connection.executemany(
+        "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, -1001, ?, ?, 'published')",
+        # По три поста на одну минуту, чтобы проверить разрешение совпадений publish_time через id
+        ((USER_ID, f"Пост {i}", (start + timedelta(minutes=i // 3)).isoformat()) for i in range(rows))
+    )
+    connection.commit()
+
+
+def timed(func, repeat: int = 5) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "pagination.db"), reader_connections=0)
+        started = time.perf_counter()
+        populate(db, args.rows)
+        print(f"Заполнено {args.rows} постов за {time.perf_counter() - started:.1f} c\n")
+        connection = db.connection
+
+        print(f"{'страница':>10} | {'OFFSET + COUNT(*), мс':>22} | {'keyset + счетчик, мс':>21}")
+        last_page = (args.rows - 1) // PER_PAGE
+        for page in sorted({1, 10, 100, 1_000, 10_000, 100_000, last_page}):
+            if page > last_page:
+                continue
+            offset = page * PER_PAGE
+            anchor_row = connection.execute(OFFSET_SQL, (USER_ID, 1, offset - 1)).fetchone()
+            anchor = (anchor_row[3], anchor_row[0])  # Ключ (publish_time, id), как в callback_data кнопки
+
+            offset_ms, offset_rows = timed(lambda: (
+                connection.execute(OFFSET_COUNT_SQL, (USER_ID,)).fetchone(),
+                connection.execute(OFFSET_SQL, (USER_ID, PER_PAGE, offset)).fetchall()
+            ))
+            keyset_ms, keyset_rows = timed(lambda: (
+                connection.execute(KEYSET_COUNT_SQL, (USER_ID,)).fetchone(),
+                connection.execute(KEYSET_SQL, (USER_ID, *anchor, PER_PAGE + 1)).fetchall()[:PER_PAGE]
+            ))
+            assert offset_rows[0][0] == keyset_rows[0][0], "счетчик расходится с COUNT(*)"
+            assert offset_rows[1] == keyset_rows[1], f"страница {page} различается"
+            print(f"{page + 1:>10} | {offset_ms:>22.2f} | {keyset_ms:>21.3f}")
+
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Бенчмарк пропускной способности публикации через локальный фейковый Bot API (benchmarks.fake_bot_api).
+
+Бот из loader направляется на фейковый сервер через TELEGRAM_API_URL и работает целиком по-настоящему:
+aiohttp-сессия, ограничитель частоты, пул публикации, повторы временных ошибок, аренда постов в SQLite.
+Режимы:
+  * scheduled - --posts постов в --channels каналов на время через пару секунд после старта
+    (с разбросом --spread секунд) публикует диспетчер; задержка считается от publish_time;
+  * immediate - те же посты уходят как немедленная публикация (полоса interactive пула, как в
+    handlers/posts.py), --concurrency пользователей одновременно; задержка считается от нажатия.
+Печатает пропускную способность, p50/p99 задержки публикации, итоговые статусы постов и ответы сервера.
+
+Лимиты Telegram по умолчанию берутся из config (в канал - 20 сообщений в минуту), их можно поднять
+флагами, чтобы измерить сам конвейер публикации. Задержки повторов сокращены до долей секунды.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_publish_throughput --posts 1000 --channels 200 --latency 0.05 --rate-429 0.01
+    python -m benchmarks.bench_publish_throughput --mode immediate --global-rate 1000 --group-rate-per-minute 6000
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(args) -> dict:
+    # Модули бота читают настройки при импорте - импортируем после подготовки окружения в main()
+    import services.scheduler as scheduler_service
+    from benchmarks.fake_bot_api import FakeBotAPI
+    from loader import bot, db_manager, get_db
+
+    fake_api = FakeBotAPI(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429, rate_400=args.rate_400,
+                          rate_5xx=args.rate_5xx, retry_after=args.retry_after, seed=1)
+    await fake_api.start(port=args.port)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager._db_name = os.path.join(tmp_dir, "throughput.db")
+        await db_manager.startup()
+        db = get_db()
+        pool = scheduler_service.publisher_pool
+        dispatcher = scheduler_service.publish_dispatcher
+        pool.start()
+        await dispatcher.start()
+        try:
+            started_at = datetime.now()
+            # user_id = 0: уведомления владельцу пропускаются, в сервер уходят только посты
+            if args.mode == "scheduled":
+                base_time = started_at + timedelta(seconds=2)
+                rows = [(f"post {i}", -1000000000000 - i % args.channels,
+                         (base_time + timedelta(seconds=args.spread * i / args.posts)).isoformat())
+                        for i in range(args.posts)]
+
+                def insert_rows():  # Выполняется в потоке-писателе БД
+                    db.connection.executemany(
+                        "INSERT INTO posts (user_id, content, channel_id, publish_time, status) "
+                        "VALUES (0, ?, ?, ?, 'scheduled')", rows)
+                    db.connection.commit()
+
+                await db.run(insert_rows)
+                dispatcher.wake()
+                submitted = {content: datetime.fromisoformat(publish_time).timestamp()
+                             for content, _, publish_time in rows}
+            else:
+                submitted = {}
+                semaphore = asyncio.Semaphore(args.concurrency)
+
+                async def publish_now(i: int):
+                    async with semaphore:
+                        content = f"post {i}"
+                        submitted[content] = time.time()
+                        claimed = await db.execute_returning(
+                            f"""INSERT INTO posts (user_id, content, channel_id, publish_time, status,
+                                                   lease_owner, lease_until)
+                                VALUES (0, ?, ?, ?, 'publishing', ?, ?)
+                                RETURNING {scheduler_service.CLAIMED_POST_COLUMNS}""",
+                            (content, -1000000000000 - i % args.channels, datetime.now().isoformat(),
+                             scheduler_service.PUBLISHER_ID, scheduler_service.lease_deadline().isoformat())
+                        )
+                        await pool.run(scheduler_service.LANE_INTERACTIVE, scheduler_service.publish_claimed_post,
+                                       claimed[0], None, False)
+
+                await asyncio.gather(*(publish_now(i) for i in range(args.posts)))
+
+            deadline = time.monotonic() + args.timeout
+            while time.monotonic() < deadline and await db.fetchone(
+                    "SELECT 1 FROM posts WHERE status IN ('scheduled', 'publishing') LIMIT 1"):
+                await asyncio.sleep(0.1)
+            statuses = dict(await db.fetchall("SELECT status, COUNT(*) FROM posts GROUP BY status"))
+        finally:
+            await dispatcher.stop()
+            await pool.stop()
+            await db_manager.shutdown()
+            await bot.session.close()
+            await fake_api.stop()
+
+    delivered = {request.text: request.received_at for request in fake_api.requests if request.status == 200}
+    lags = [delivered[content] - submitted_at for content, submitted_at in submitted.items() if content in delivered]
+    first_submit = min(submitted.values())
+    duration = max(delivered.values()) - first_submit if delivered else float("nan")
+    return {"throughput": len(delivered) / duration if delivered else 0.0, "duration": duration,
+            "p50": percentile(lags, 0.5), "p99": percentile(lags, 0.99), "statuses": statuses,
+            "responses": fake_api.counts()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("scheduled", "immediate"), default="scheduled")
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.0, help="На сколько секунд распределены publish_time")
+    parser.add_argument("--concurrency", type=int, default=50, help="Одновременных пользователей в режиме immediate")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа фейкового API, с")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-400", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--workers", type=int, help="PUBLISH_WORKERS")
+    parser.add_argument("--global-rate", type=float, help="TELEGRAM_GLOBAL_RATE, сообщений/с")
+    parser.add_argument("--group-rate-per-minute", type=float, help="TELEGRAM_GROUP_RATE_PER_MINUTE")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    args.port = free_port()
+    os.environ.update(BOT_TOKEN="0:benchmark", TELEGRAM_API_URL=f"http://127.0.0.1:{args.port}")
+    os.environ.setdefault("PUBLISH_RETRY_BASE_SECONDS", "0.2")
+    os.environ.setdefault("PUBLISH_RETRY_MAX_SECONDS", "2")
+    for name, value in (("PUBLISH_WORKERS", args.workers), ("TELEGRAM_GLOBAL_RATE", args.global_rate),
+                        ("TELEGRAM_GROUP_RATE_PER_MINUTE", args.group_rate_per_minute)):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    r = asyncio.run(run(args))
+    print(f"режим {args.mode}: {args.posts} постов в {args.channels} каналов, "
+          f"воркеров {os.environ.get('PUBLISH_WORKERS', 'по умолчанию')}")
+    print(f"пропускная способность: {r['throughput']:.1f} постов/с ({r['duration']:.2f} с)")
+    print(f"задержка публикации p50/p99: {r['p50'] * 1000:.0f} / {r['p99'] * 1000:.0f} мс")
+    print(f"статусы постов: {r['statuses']}")
+    print(f"ответы сервера: {r['responses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Бенчмарк полос пула публикации (services.scheduler.PublisherPool).
+
+В полосу bulk разом ставится --bulk задач (как при наступлении сотен отложенных постов), а в полосу
+interactive каждые --interval секунд приходит одна задача пользователя. Каждая задача "отправляет"
+сообщение за --service секунд. Для нескольких соотношений весов печатается статистика пула по полосам:
+ожидание interactive должно оставаться порядка времени одной отправки, а не длины очереди bulk.
+
+Второй замер - все задачи bulk идут в один канал, упершийся в свой лимит (--chat-rate сообщений в секунду),
+задачи interactive - в другие чаты. Без limiter воркеры ждут слот канала, занимая место в пуле; с limiter
+задачи канала откладываются, и ожидание interactive не зависит от лимита канала. Завершается с кодом 1,
+если с limiter максимальное ожидание interactive больше --interval.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_publisher_lanes --bulk 400 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")  # Бот создается в loader, но в сеть не обращается
+
+from services.scheduler import PublisherPool, LANE_INTERACTIVE, LANE_BULK  # noqa: E402
+from services.rate_limiter import TelegramRateLimiter  # noqa: E402
+
+CHANNEL_ID = -1000000000001
+
+
+async def run_case(args, interactive_weight: int, bulk_weight: int) -> dict:
+    pool = PublisherPool(args.workers, weights={LANE_INTERACTIVE: interactive_weight, LANE_BULK: bulk_weight})
+    pool.start()
+
+    async def send():
+        await asyncio.sleep(args.service)
+
+    bulk_futures = [await pool.put(LANE_BULK, send) for _ in range(args.bulk)]
+    interactive_runs = []
+    while not all(future.done() for future in bulk_futures):
+        interactive_runs.append(asyncio.create_task(pool.run(LANE_INTERACTIVE, send)))
+        await asyncio.sleep(args.interval)
+    await asyncio.gather(*bulk_futures, *interactive_runs)
+    await pool.stop()
+    return pool.stats()
+
+
+async def run_chat_limit_case(args, use_limiter: bool) -> dict:
+    limiter = TelegramRateLimiter(global_rate=1000, chat_rate=1000, group_rate=args.chat_rate)
+    pool = PublisherPool(args.workers, weights={LANE_INTERACTIVE: 4, LANE_BULK: 1},
+                         limiter=limiter if use_limiter else None)
+    pool.start()
+
+    async def send(chat_id: int):  # Как RateLimitMiddleware: слот чата, затем сам запрос
+        await limiter.acquire(chat_id)
+        await asyncio.sleep(args.service)
+
+    bulk_futures = [await pool.put(LANE_BULK, send, CHANNEL_ID, chat_id=CHANNEL_ID)
+                    for _ in range(args.chat_posts)]
+    interactive_runs = []
+    user_id = 1
+    while not all(future.done() for future in bulk_futures):
+        interactive_runs.append(asyncio.create_task(pool.run(LANE_INTERACTIVE, send, user_id, chat_id=user_id)))
+        user_id += 1
+        await asyncio.sleep(args.interval)
+    await asyncio.gather(*bulk_futures, *interactive_runs)
+    await pool.stop()
+    return pool.stats()
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bulk", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--service", type=float, default=0.02, help="Время одной отправки, с")
+    parser.add_argument("--interval", type=float, default=0.1, help="Интервал между задачами пользователя, с")
+    parser.add_argument("--chat-posts", type=int, default=10, help="Задач bulk в один канал во втором замере")
+    parser.add_argument("--chat-rate", type=float, default=2, help="Лимит канала во втором замере, сообщений в секунду")
+    args = parser.parse_args()
+
+    print(f"{'веса i:b':>9} | {'полоса':>11} | {'задач':>6} | {'ожидание ср/макс, с':>20} | выполнение ср, с")
+    for interactive_weight, bulk_weight in ((1, 1), (4, 1), (16, 1)):
+        stats = await run_case(args, interactive_weight, bulk_weight)
+        for lane, lane_stats in stats.items():
+            print(f"{f'{interactive_weight}:{bulk_weight}':>9} | {lane:>11} | {lane_stats['served']:>6} | "
+                  f"{lane_stats['wait_avg']:>9.3f} / {lane_stats['wait_max']:>8.3f} | {lane_stats['service_avg']:.3f}")
+
+    print(f"\n{args.chat_posts} задач bulk в один канал с лимитом {args.chat_rate:g}/с:")
+    print(f"{'limiter':>9} | {'полоса':>11} | {'задач':>6} | {'ожидание ср/макс, с':>20} | отложено")
+    results = {}
+    for use_limiter in (False, True):
+        stats = await run_chat_limit_case(args, use_limiter)
+        results[use_limiter] = stats
+        for lane, lane_stats in stats.items():
+            print(f"{'да' if use_limiter else 'нет':>9} | {lane:>11} | {lane_stats['served']:>6} | "
+                  f"{lane_stats['wait_avg']:>9.3f} / {lane_stats['wait_max']:>8.3f} | {lane_stats['deferred']}")
+    wait_max = results[True][LANE_INTERACTIVE]["wait_max"]
+    ok = wait_max <= args.interval
+    print(f"{'ok  ' if ok else 'FAIL'} с limiter interactive ждет не дольше {args.interval} с: {wait_max:.3f} с")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,169 @@
+"""
+Бенчмарк повторной проверки запланированных постов после пополнения стоп-листа (services.rescreen).
+
+Временная БД: --scheduled запланированных постов от --users пользователей и --history уже
+опубликованных (история не должна влиять на стоимость). В стоп-листе --words слов, добавляются
+--added новых; в --matching постах есть одно из новых слов. Сравнивается проверка только на новые
+слова (как в PostRescreener) с проверкой на весь список. Проверяется, что сняты с публикации ровно
+посты с новыми словами и каждый затронутый владелец получил одно уведомление. Затем слова
+добавляются в список одного канала и одного пользователя (services.scoped_words): сняты должны быть
+только посты этого канала / пользователя, а такие же посты в других каналах остаются в очереди.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_rescreen --scheduled 20000 --history 100000 --words 100000 --added 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "0:rescreen")  # Бот создается в loader, но в сеть не обращается
+os.environ["BANNED_WORDS_FILE"] = os.path.join(tempfile.mkdtemp(), "banned_words.txt")
+
+from aiogram.client.session.base import BaseSession  # noqa: E402
+
+from loader import bot, db_manager, get_db, content_filter  # noqa: E402
+from services.rescreen import PostRescreener, POLICY_HOLD, screen_rows  # noqa: E402
+from services.scoped_words import scoped_words, SCOPE_CHANNEL, SCOPE_USER  # noqa: E402
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщыэюя"  # Без "ъ" и "ь": ими помечены слова стоп-листа
+
+
+class CountingSession(BaseSession):
+    """Сессия без сети: считает уведомления по получателям."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent_to: list[int] = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.sent_to.append(method.chat_id)
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(6, 12)))
+
+
+def random_text(rng: random.Random, words: int = 60) -> str:
+    return " ".join(random_word(rng) for _ in range(words))
+
+
+async def check_scoped_rescreen(db, rng: random.Random, rescreener: PostRescreener, session: CountingSession,
+                                base_time: datetime) -> bool:
+    """Слова списка канала и пользователя снимают с публикации только посты этого канала / пользователя."""
+    ok = True
+    for scope_type, owner_id, channel_id, other in ((SCOPE_CHANNEL, 9001, -2000000000001, (9001, -2000000000002)),
+                                                    (SCOPE_USER, 9003, -2000000000003, (9004, -2000000000003))):
+        word = random_word(rng) + "ь"
+        posts = [(owner_id, channel_id), other] * 5  # Одинаковые посты в области и вне ее
+        await db.run(lambda: (db.connection.executemany(
+            "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, ?, ?, ?, 'scheduled')",
+            [(user_id, post_channel_id, f"{random_text(rng, 10)} {word}", (base_time + timedelta(hours=i)).isoformat())
+             for i, (user_id, post_channel_id) in enumerate(posts)]), db.connection.commit()))
+        scope_id = channel_id if scope_type == SCOPE_CHANNEL else owner_id
+        sent_before = len(session.sent_to)
+
+        added = await scoped_words.add_words(scope_type, scope_id, [word])
+        rescreener.words_added(added, (scope_type, scope_id))  # Как в /add_scope_words
+        await rescreener.wait()
+
+        in_scope = "p.channel_id = ?" if scope_type == SCOPE_CHANNEL else "p.user_id = ?"
+        held_in_scope, scheduled_outside = await db.fetchone(
+            f"""SELECT SUM(status = 'held' AND {in_scope}), SUM(status = 'scheduled' AND NOT {in_scope})
+                FROM posts p WHERE content LIKE ?""", (scope_id, scope_id, f"% {word}"))
+        ok &= check(held_in_scope == 5 and scheduled_outside == 5 and session.sent_to[sent_before:] == [owner_id],
+                    f"слово списка {scope_type}: снято {held_in_scope} из 5 постов области, "
+                    f"вне области осталось в очереди {scheduled_outside} из 5")
+    return ok
+
+
+def check(ok: bool, text: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scheduled", type=int, default=20_000)
+    parser.add_argument("--history", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--added", type=int, default=10)
+    parser.add_argument("--matching", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    session = CountingSession()
+    bot.session = session
+    old_words = {random_word(rng) + "ъ" for _ in range(args.words)}  # Ни одно старое слово не встречается в постах
+    new_words = [random_word(rng) + "ь" for _ in range(args.added)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager._db_name = os.path.join(tmp_dir, "rescreen.db")
+        await db_manager.startup()
+        try:
+            db = get_db()
+            base_time = datetime.now() + timedelta(days=1)
+            matching_ids = set(rng.sample(range(args.scheduled), args.matching))
+            scheduled = [(i % args.users + 1, -1000000000000 - i % 50,
+                          random_text(rng) + (f" {rng.choice(new_words)}" if i in matching_ids else ""),
+                          (base_time + timedelta(seconds=i)).isoformat(), "scheduled") for i in range(args.scheduled)]
+            history = [(i % args.users + 1, -1000000000000, random_text(rng, 20),
+                        (base_time - timedelta(days=30, seconds=i)).isoformat(), "published")
+                       for i in range(args.history)]
+
+            def insert_rows():  # Выполняется в потоке-писателе БД
+                db.connection.executemany(
+                    "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, ?, ?, ?, ?)",
+                    scheduled + history)
+                db.connection.commit()
+
+            await db.run(insert_rows)
+            expected_users = {scheduled[i][0] for i in matching_ids}
+
+            # Для сравнения: проверка тех же постов на весь список (только замер времени)
+            await content_filter.add_words(old_words)
+            rows = await db.fetchall("SELECT id, user_id, channel_id, content, publish_time, NULL FROM posts "
+                                     "WHERE status = 'scheduled'")
+            started = time.perf_counter()
+            full_checker = content_filter.checker_for(frozenset(old_words | set(new_words)))
+            full_matches = screen_rows(full_checker, rows)
+            full_seconds = time.perf_counter() - started
+
+            added = await content_filter.add_words(new_words)
+            rescreener = PostRescreener(policy=POLICY_HOLD, chunk_size=500)
+            started = time.perf_counter()
+            checked, matched = await rescreener.rescreen(added)
+            rescreen_seconds = time.perf_counter() - started
+
+            held = (await db.fetchone("SELECT COUNT(*) FROM posts WHERE status = 'held'"))[0]
+            global_sent = list(session.sent_to)
+            scoped_ok = await check_scoped_rescreen(db, rng, rescreener, session, base_time)
+        finally:
+            await db_manager.shutdown()
+
+    print(f"{args.scheduled} запланированных постов, {args.history} в истории, {args.words} слов в списке, "
+          f"добавлено {args.added}")
+    print(f"проверка на весь список: {full_seconds:.2f} с; только на новые слова: {rescreen_seconds:.2f} с "
+          f"(проверено {checked}, снято {matched})")
+    ok = (checked == args.scheduled and matched == held == args.matching == len(full_matches)
+          and sorted(global_sent) == sorted(expected_users))
+    print(f"{'ok  ' if ok else 'FAIL'} сняты с публикации {held} из {args.matching} постов с новыми словами, "
+          f"уведомлений {len(global_sent)} (владельцев {len(expected_users)})")
+    return 0 if ok and scoped_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
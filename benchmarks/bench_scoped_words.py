@@ -0,0 +1,129 @@
+"""
+Бенчмарк списков запрещенных слов каналов и пользователей (services.scoped_words).
+
+Временная БД: --scopes каналов со своими списками от 20 до --max-words слов. Проверяются тексты
+около 4 КБ для случайных каналов (часть каналов "горячие" - на них приходится большинство проверок),
+кэш автоматов ограничен --cache-scopes областями и --cache-mb мегабайтами. Печатается среднее время
+проверки и доля загрузок из БД. Проверяется, что:
+  - слово канала находится только в постах этого канала;
+  - кэш не выходит за пределы по числу областей и памяти;
+  - правка через add_words/remove_word видна сразу, а правка мимо модуля (другой процесс) -
+    после сверки версии.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_scoped_words --scopes 5000 --checks 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:scoped")  # Бот создается в loader, но в сеть не обращается
+os.environ["BANNED_WORDS_FILE"] = os.path.join(tempfile.mkdtemp(), "banned_words.txt")
+
+from loader import db_manager, get_db  # noqa: E402
+from services.scoped_words import ScopedWordLists, SCOPE_CHANNEL  # noqa: E402
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщыэюя"  # Без "ъ": им помечены слова списков
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 10)))
+
+
+def random_text(rng: random.Random, length: int = 4096) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(random_word(rng))
+    return " ".join(words)
+
+
+def check(ok: bool, text: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scopes", type=int, default=5_000)
+    parser.add_argument("--max-words", type=int, default=120)
+    parser.add_argument("--checks", type=int, default=20_000)
+    parser.add_argument("--hot", type=int, default=200, help="сколько каналов получают 90%% проверок")
+    parser.add_argument("--cache-scopes", type=int, default=1_000)
+    parser.add_argument("--cache-mb", type=float, default=16)
+    args = parser.parse_args()
+
+    rng = random.Random(17)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager._db_name = os.path.join(tmp_dir, "scoped.db")
+        await db_manager.startup()
+        try:
+            db = get_db()
+            scope_words = {-1000000000000 - i: [random_word(rng) + "ъ" for _ in range(rng.randint(20, args.max_words))]
+                           for i in range(args.scopes)}
+
+            def insert_rows():  # Выполняется в потоке-писателе БД
+                db.connection.executemany(
+                    "INSERT OR IGNORE INTO banned_words (scope_type, scope_id, word) VALUES (?, ?, ?)",
+                    [(SCOPE_CHANNEL, scope_id, word) for scope_id, words in scope_words.items() for word in words])
+                db.connection.commit()
+
+            started = time.perf_counter()
+            await db.run(insert_rows)
+            total_words = sum(len(words) for words in scope_words.values())
+            print(f"{args.scopes} каналов, {total_words} слов записано за {time.perf_counter() - started:.2f} с")
+
+            scoped = ScopedWordLists(args.cache_scopes, int(args.cache_mb * 1024 * 1024), recheck_interval=5)
+            channel_ids = list(scope_words)
+            hot_ids = channel_ids[:args.hot]
+            texts = [random_text(rng) for _ in range(50)]
+            max_bytes, max_entries = 0, 0
+            started = time.perf_counter()
+            for i in range(args.checks):
+                channel_id = rng.choice(hot_ids) if rng.random() < 0.9 else rng.choice(channel_ids)
+                await scoped.check_text(texts[i % len(texts)], [channel_id])
+                stats = scoped.stats()
+                max_bytes, max_entries = max(max_bytes, stats['bytes']), max(max_entries, stats['entries'])
+            check_us = (time.perf_counter() - started) * 1_000_000 / args.checks
+            stats = scoped.stats()
+            print(f"{args.checks} проверок: {check_us:.0f} мкс на проверку, загрузок из БД {stats['loads']} "
+                  f"({stats['loads'] / args.checks:.1%}), попаданий {stats['hit_rate']:.0%}, "
+                  f"вытеснено {stats['evictions']}")
+            ok &= check(max_entries <= args.cache_scopes and max_bytes <= args.cache_mb * 1024 * 1024,
+                        f"кэш в пределах: до {max_entries} областей, до {max_bytes / 1024 / 1024:.1f} МБ")
+
+            # Слово канала находится только в его постах
+            own_id, other_id = channel_ids[0], channel_ids[1]
+            probe = f"текст {scope_words[own_id][0]} текст"
+            ok &= check(await scoped.check_text(probe, [own_id]) == [scope_words[own_id][0]]
+                        and await scoped.check_text(probe, [other_id]) == []
+                        and await scoped.check_text(probe, [other_id, own_id]) == [scope_words[own_id][0]],
+                        "слово канала находится только для этого канала")
+
+            # Правки через модуль и мимо него
+            new_word = "новоеслово"
+            probe = f"текст {new_word} текст"
+            await scoped.add_words(SCOPE_CHANNEL, own_id, [new_word])
+            ok &= check(await scoped.check_text(probe, [own_id]) == [new_word], "add_words виден сразу")
+            await scoped.remove_word(SCOPE_CHANNEL, own_id, new_word)
+            ok &= check(await scoped.check_text(probe, [own_id]) == [], "remove_word виден сразу")
+            await db.execute("INSERT INTO banned_words (scope_type, scope_id, word) VALUES (?, ?, ?)",
+                             (SCOPE_CHANNEL, own_id, new_word), commit=True)
+            before_recheck = await scoped.check_text(probe, [own_id])
+            scoped.recheck_interval = 0
+            ok &= check(before_recheck == [] and await scoped.check_text(probe, [own_id]) == [new_word],
+                        "правка другого процесса видна после сверки версии")
+        finally:
+            await db_manager.shutdown()
+
+    print(f"{'ok  ' if ok else 'FAIL'} итог")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
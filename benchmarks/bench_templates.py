@@ -0,0 +1,142 @@
+"""
+Бенчмарк разобранных шаблонов (services.template_cache).
+
+Временная БД с --templates шаблонами по --vars переменных. Сравнивается прежний путь использования
+шаблона (чтение строки, CUSTOM_VAR_REGEX.findall, replace по каждой переменной) с новым (шаблон
+из кэша, подстановка одним join по сегментам) на --uses выборах шаблонов, часть шаблонов "горячие".
+Проверяется, что:
+  - на случайных шаблонах (повторы, соседние переменные, значения с {[...]}) результат совпадает
+    с посегментной подстановкой, а у шаблонов без колонок segments/variables - с сохраненными;
+  - удаленный шаблон больше не выдается.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_templates --templates 2000 --uses 20000 --vars 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:templates")  # Бот создается в loader, но в сеть не обращается
+os.environ["BANNED_WORDS_FILE"] = os.path.join(tempfile.mkdtemp(), "banned_words.txt")
+
+from loader import db_manager, get_db  # noqa: E402
+from services.template_cache import (TemplateCache, CUSTOM_VAR_REGEX, template_columns, parse_template,  # noqa: E402
+                                     render_template)
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 10)))
+
+
+def random_template(rng: random.Random, variables: int, length: int = 1500) -> str:
+    names = [f"Переменная {i}" for i in range(variables)]
+    parts = []
+    while sum(len(part) + 1 for part in parts) < length:
+        parts.append(f"{{[{rng.choice(names)}]}}" if rng.random() < 0.05 else random_word(rng))
+    return " ".join(parts + [f"{{[{name}]}}" for name in names])
+
+
+async def old_use(db, template_id: int, user_id: int, values: dict) -> str:
+    """Прежний handlers/posts.py: строка шаблона, поиск переменных, replace по каждой."""
+    row = await db.fetchone(
+        "SELECT name, content, media, media_type FROM templates WHERE id = ? AND (user_id = 0 OR user_id = ?)",
+        (template_id, user_id)
+    )
+    content = row[1]
+    variables = list(dict.fromkeys(CUSTOM_VAR_REGEX.findall(content or "")))
+    text = content
+    for name in variables:
+        text = text.replace(f"{{[{name}]}}", values[name])
+    return text
+
+
+async def new_use(cache: TemplateCache, template_id: int, user_id: int, values: dict) -> str:
+    template = await cache.get(template_id, user_id)
+    return template.render({name: values[name] for name in template.variables})
+
+
+def check(ok: bool, text: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", type=int, default=2_000)
+    parser.add_argument("--uses", type=int, default=20_000)
+    parser.add_argument("--vars", type=int, default=5)
+    parser.add_argument("--hot", type=int, default=100, help="сколько шаблонов получают 90%% выборов")
+    args = parser.parse_args()
+
+    rng = random.Random(23)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager._db_name = os.path.join(tmp_dir, "templates.db")
+        await db_manager.startup()
+        try:
+            db = get_db()
+            contents = [random_template(rng, args.vars) for _ in range(args.templates)]
+
+            def insert_rows():  # Выполняется в потоке-писателе БД
+                db.connection.executemany(
+                    "INSERT INTO templates (user_id, name, content, segments, variables) VALUES (0, ?, ?, ?, ?)",
+                    [(f"Шаблон {i}", content, *template_columns(content)) for i, content in enumerate(contents)])
+                # Шаблон, сохраненный до появления колонок
+                db.connection.execute("INSERT INTO templates (user_id, name, content) VALUES (0, 'старый', ?)",
+                                      (contents[0],))
+                db.connection.commit()
+
+            await db.run(insert_rows)
+            ids = [row[0] for row in await db.fetchall("SELECT id FROM templates WHERE name != 'старый' ORDER BY id")]
+            old_id = (await db.fetchone("SELECT id FROM templates WHERE name = 'старый'"))[0]
+            values = {f"Переменная {i}": random_word(rng) for i in range(args.vars)}
+            choices = [rng.choice(ids[:args.hot]) if rng.random() < 0.9 else rng.choice(ids) for _ in range(args.uses)]
+
+            started = time.perf_counter()
+            for template_id in choices:
+                await old_use(db, template_id, 1, values)
+            old_us = (time.perf_counter() - started) * 1_000_000 / args.uses
+
+            cache = TemplateCache(max_entries=1_000, ttl=60)
+            started = time.perf_counter()
+            for template_id in choices:
+                await new_use(cache, template_id, 1, values)
+            new_us = (time.perf_counter() - started) * 1_000_000 / args.uses
+            stats = cache.stats()
+            print(f"{args.uses} использований шаблонов по ~1.5 КБ и {args.vars} переменных: прежний путь {old_us:.0f} мкс, "
+                  f"из кэша {new_us:.0f} мкс (попаданий {stats['hit_rate']:.0%})")
+
+            # Совпадение результатов
+            ok &= check(all([await old_use(db, template_id, 1, values) == await new_use(cache, template_id, 1, values)
+                             for template_id in ids[:200]]), "результат совпадает с прежней подстановкой")
+            tricky = "{[а]}{[б]} {[а]} текст {[в]}{[ в]} {[]} {[а"
+            tricky_values = {"а": "{[б]}", "б": "Б", "в": "", " в": "пробел"}
+            ok &= check(render_template(parse_template(tricky), tricky_values) == "{[б]}Б {[б]} текст пробел {[]} {[а",
+                        "соседние и повторные переменные, значения с {[...]} не подставляются повторно")
+            ok &= check(render_template(parse_template(tricky), {}) == tricky, "без значений текст не меняется")
+            legacy, saved = await cache.get(old_id, 1), await cache.get(ids[0], 1)
+            ok &= check(legacy.segments == saved.segments and legacy.variables == saved.variables,
+                        "шаблон без сохраненных сегментов разбирается при загрузке")
+            ok &= check(await cache.get(ids[0], 1) is not None and
+                        (await TemplateCache().get(ids[0], 2)) is not None, "общий шаблон доступен всем")
+
+            # Удаление
+            await db.execute("DELETE FROM templates WHERE id = ?", (ids[0],), commit=True)
+            cache.invalidate(ids[0])
+            ok &= check(await cache.get(ids[0], 1) is None, "удаленный шаблон не выдается")
+        finally:
+            await db_manager.shutdown()
+
+    print(f"{'ok  ' if ok else 'FAIL'} итог")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,107 @@
+"""
+Бенчмарк кэша результатов проверки текстов (ContentFilter.check_text).
+
+Поток создания поста проверяет один и тот же итоговый текст несколько раз (выбор канала, предпросмотр,
+шаблоны одних и тех же пользователей). Моделируется --posts постов по --checks проверки каждого,
+тексты длиной около 4 КБ, в списке --words слов. Сравнивается среднее время проверки без кэша
+и с кэшем, для обоих режимов фильтра. Проверяется, что:
+  - после add_word закэшированный результат не возвращается (смена версии автомата);
+  - кэш не превышает заданного числа записей и объема памяти.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_verdict_cache --posts 2000 --checks 3 --words 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from services import word_matcher
+from services.content_filter import ContentFilter, MODE_SUBSTRING, MODE_WORDS
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщыэюя"  # Без "ъ": им помечены слова стоп-листа
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 10)))
+
+
+def random_text(rng: random.Random, length: int = 4096) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(random_word(rng))
+    return " ".join(words)
+
+
+def check(ok: bool, text: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    return ok
+
+
+def run_flow(content_filter: ContentFilter, texts: list[str], checks: int) -> float:
+    """Возвращает среднее время одной проверки (мкс)."""
+    word_matcher._token_cache.clear()  # Общий кэш нормализации слов не должен переходить между замерами
+    started = time.perf_counter()
+    for text in texts:
+        for _ in range(checks):
+            content_filter.check_text(text)
+    return (time.perf_counter() - started) * 1_000_000 / (len(texts) * checks)
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=2_000)
+    parser.add_argument("--checks", type=int, default=3)
+    parser.add_argument("--words", type=int, default=5_000)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    parser.add_argument("--cache-bytes", type=int, default=4 * 1024 * 1024)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        words_file = os.path.join(tmp_dir, "banned_words.txt")
+        with open(words_file, 'w', encoding='utf-8') as f:
+            f.write("".join(f"{random_word(rng)}ъ\n" for _ in range(args.words)))
+        texts = [random_text(rng) for _ in range(args.posts)]
+
+        for mode in (MODE_SUBSTRING, MODE_WORDS):
+            uncached = ContentFilter(words_file, mode, cache_entries=0)
+            cached = ContentFilter(words_file, mode, cache_entries=args.cache_size, cache_bytes=args.cache_bytes)
+            uncached_us = run_flow(uncached, texts, args.checks)
+            cached_us = run_flow(cached, texts, args.checks)
+            stats = cached.cache_stats()
+            print(f"{mode:9}: без кэша {uncached_us:.1f} мкс, с кэшем {cached_us:.1f} мкс на проверку "
+                  f"(попаданий {stats['hit_rate']:.0%}, записей {stats['entries']}, ~{stats['bytes'] // 1024} КБ)")
+            ok &= check(all(cached.check_text(text) == uncached.check_text(text) for text in texts[:200]),
+                        f"{mode}: результаты с кэшем и без совпадают")
+
+        # Правка списка делает закэшированные результаты недействительными
+        content_filter = ContentFilter(words_file, cache_entries=args.cache_size, cache_bytes=args.cache_bytes)
+        probe = texts[0]
+        new_word = probe.split()[1]
+        ok &= check(content_filter.check_text(probe) == [], "исходный текст чист")
+        await content_filter.add_word(new_word)
+        ok &= check(content_filter.check_text(probe) == [new_word], "после add_word найдено новое слово")
+        await content_filter.remove_word(new_word)
+        ok &= check(content_filter.check_text(probe) == [], "после remove_word текст снова чист")
+
+        # Границы кэша
+        small = ContentFilter(words_file, cache_entries=100, cache_bytes=20 * 1024)
+        for text in texts:
+            small.check_text(text)
+        stats = small.cache_stats()
+        ok &= check(stats['entries'] <= 100 and stats['bytes'] <= 20 * 1024 and stats['evictions'] > 0,
+                    f"кэш ограничен: {stats['entries']} записей, {stats['bytes']} байт, "
+                    f"вытеснено {stats['evictions']}")
+
+    print(f"{'ok  ' if ok else 'FAIL'} итог")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
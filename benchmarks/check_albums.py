@@ -0,0 +1,135 @@
+"""
+Проверка альбомов (services.media и отправка альбома в services.scheduler.send_post_content).
+
+1. AlbumCollector: части альбома приходят параллельными апдейтами с разбросом задержек и в перемешанном
+   порядке - альбом должен собраться ровно один раз, целиком и в порядке message_id.
+2. Формат хранения: pack_album/unpack_album и json_array_length в SQLite (им пользуются история и очередь).
+3. Отправка: бот с заглушкой сессии (без сети, через ограничитель частоты, как в loader) публикует альбом
+   одним запросом sendMediaGroup с подписью у первого элемента. Для сравнения печатается число запросов
+   и время прохода через ограничитель для тех же файлов отдельными постами.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_albums --items 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+os.environ.setdefault("BOT_TOKEN", "0:check")  # Бот создается в loader, но в сеть не обращается
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.types import Message  # noqa: E402
+
+from loader import bot  # noqa: E402
+from services.media import AlbumCollector, pack_album, unpack_album  # noqa: E402
+from services.rate_limiter import TelegramRateLimiter, RateLimitMiddleware  # noqa: E402
+from services.scheduler import send_post_content  # noqa: E402
+
+CHANNEL_ID = -1001
+
+
+class RecordingSession(BaseSession):
+    """Сессия без сети: запоминает методы и возвращает фиктивные сообщения."""
+
+    def __init__(self):
+        super().__init__()
+        self.methods = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.methods.append(method)
+        message = {"message_id": len(self.methods), "date": datetime.now(), "chat": {"id": CHANNEL_ID, "type": "channel"}}
+        if type(method).__name__ == "SendMediaGroup":
+            return [Message.model_validate({**message, "message_id": len(self.methods) * 100 + i})
+                    for i in range(len(method.media))]
+        return Message.model_validate(message)
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+def check(condition: bool, description: str) -> bool:
+    print(f"{'ok  ' if condition else 'FAIL'} {description}")
+    return condition
+
+
+def new_bot() -> tuple[Bot, RecordingSession]:
+    session = RecordingSession()
+    # Лимиты по умолчанию из config, как у бота в loader: в канал - 20 сообщений в минуту
+    session.middleware(RateLimitMiddleware(TelegramRateLimiter(global_rate=30, chat_rate=1, group_rate=20 / 60,
+                                                               chat_burst=3)))
+    return Bot(token="0:check", session=session), session
+
+
+async def check_collector(items: int) -> bool:
+    collector = AlbumCollector(delay=0.05)
+    chat = SimpleNamespace(id=1)
+    messages = [SimpleNamespace(chat=chat, media_group_id="g1", message_id=i) for i in range(items)]
+    delivery = messages[:1] + random.sample(messages[1:], len(messages) - 1)
+
+    async def deliver(message, delay):
+        await asyncio.sleep(delay)
+        return await collector.collect(message)
+
+    results = await asyncio.gather(*(deliver(message, 0.01 * i) for i, message in enumerate(delivery)))
+    albums = [result for result in results if result is not None]
+    return check(len(albums) == 1 and [m.message_id for m in albums[0]] == list(range(items)),
+                 f"альбом из {items} частей собран один раз и по порядку")
+
+
+def check_storage(items: list[tuple[str, str]]) -> bool:
+    packed = pack_album(items)
+    with sqlite3.connect(":memory:") as connection:
+        size = connection.execute("SELECT json_array_length(?)", (packed,)).fetchone()[0]
+    return check(unpack_album(packed) == items and size == len(items),
+                 f"хранение: {len(packed)} байт, json_array_length = {size}")
+
+
+async def check_publish(items: list[tuple[str, str]]) -> bool:
+    album_bot, session = new_bot()
+    started = time.perf_counter()
+    message = await send_post_content(album_bot, CHANNEL_ID, "<b>Подпись</b>", pack_album(items), "album")
+    album_s = time.perf_counter() - started
+    method = session.methods[0]
+    captions = [media.caption for media in method.media]
+    ok = check(len(session.methods) == 1 and type(method).__name__ == "SendMediaGroup"
+               and len(method.media) == len(items) and captions[0] == "<b>Подпись</b>" and not any(captions[1:])
+               and message.message_id == 100,
+               f"альбом: {len(session.methods)} запрос sendMediaGroup, {len(method.media)} файлов, {album_s:.2f} с")
+
+    separate_bot, session = new_bot()
+    started = time.perf_counter()
+    for item_type, file_id in items:
+        await send_post_content(separate_bot, CHANNEL_ID, "<b>Подпись</b>", file_id, item_type)
+    print(f"     те же файлы отдельными постами: {len(session.methods)} запросов, "
+          f"{time.perf_counter() - started:.2f} с (лимит канала 20 сообщений в минуту)")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10)
+    args = parser.parse_args()
+
+    items = [("video" if i % 3 == 2 else "photo", f"file-{i}") for i in range(args.items)]
+    results = [
+        await check_collector(args.items),
+        check_storage(items),
+        await check_publish(items),
+    ]
+    await bot.session.close()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,150 @@
+"""
+Проверка и бенчмарк журнала правок стоп-листа (services.content_filter).
+
+1. Стоимость записи одной правки на диск при списке из --words слов: прежний способ (полная сортировка
+   и перезапись файла на каждое add_word) против строки в журнале. Отдельно - add_word целиком, вместе
+   с пересборкой автомата, последовательно и одновременно (правки во время сборки объединяются
+   в одну пересборку), и максимальная задержка цикла событий (тик каждые 5 мс).
+2. Массовое добавление --bulk слов одним вызовом add_words: одна запись в журнал и одна пересборка.
+3. Сворачивание: после compact_every записей журнал сворачивается в снимок; новый экземпляр,
+   прочитавший файлы, видит тот же список.
+4. Сбой посреди записи: недописанная последняя строка журнала игнорируется, остальное применяется.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_banned_words_journal --words 100000 --edits 200 --bulk 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from services.content_filter import ContentFilter, JOURNAL_SUFFIX
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def random_words(rng: random.Random, count: int) -> list[str]:
+    return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 12))) for _ in range(count)]
+
+
+def rewrite_whole_file(words_file: str, words: set[str]):
+    """Прежний ContentFilter._save_words_to_file."""
+    with open(words_file, 'w', encoding='utf-8') as f:
+        for word in sorted(list(words)):
+            f.write(f"{word}\n")
+
+
+async def measure_loop_stall(coro) -> tuple[object, float]:
+    """Выполняет coro и возвращает результат и максимальную задержку тика цикла событий (с)."""
+    max_stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal max_stall
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            max_stall = max(max_stall, time.perf_counter() - started - 0.005)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    try:
+        result = await coro
+    finally:
+        done = True
+        await ticker_task
+    return result, max_stall
+
+
+def check(ok: bool, text: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--bulk", type=int, default=5_000)
+    parser.add_argument("--compact-every", type=int, default=1_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        words_file = os.path.join(tmp_dir, "banned_words.txt")
+        base_words = set(random_words(rng, args.words))
+        rewrite_whole_file(words_file, base_words)
+        content_filter = ContentFilter(words_file, compact_every=args.compact_every)
+
+        # 1. Одиночные правки
+        edit_words = random_words(rng, args.edits)
+        old_words = set(base_words)
+        started = time.perf_counter()
+        for word in edit_words:
+            old_words.add(word)
+            rewrite_whole_file(os.path.join(tmp_dir, "old_way.txt"), old_words)
+        old_ms = (time.perf_counter() - started) * 1000 / args.edits
+
+        journal_words = random_words(rng, args.edits)
+        started = time.perf_counter()
+        for word in journal_words:
+            await content_filter._write_journal("-", [word])  # Удаление отсутствующего слова - список не меняется
+        journal_ms = (time.perf_counter() - started) * 1000 / args.edits
+        print(f"запись правки на диск при {args.words} словах: перезапись файла {old_ms:.2f} мс, "
+              f"строка в журнале {journal_ms:.2f} мс")
+
+        sequential_words, concurrent_words = edit_words[:5], edit_words[5:]
+
+        async def add_one_by_one():
+            for word in sequential_words:
+                await content_filter.add_word(word)
+
+        started = time.perf_counter()
+        _, stall = await measure_loop_stall(add_one_by_one())
+        sequential_ms = (time.perf_counter() - started) * 1000 / len(sequential_words)
+        started = time.perf_counter()
+        _, concurrent_stall = await measure_loop_stall(
+            asyncio.gather(*(content_filter.add_word(word) for word in concurrent_words)))
+        concurrent_ms = (time.perf_counter() - started) * 1000
+        print(f"add_word с пересборкой: по одной {sequential_ms:.0f} мс на правку; {len(concurrent_words)} одновременно "
+              f"{concurrent_ms:.0f} мс на все; макс. задержка цикла событий "
+              f"{max(stall, concurrent_stall) * 1000:.1f} мс")
+
+        # 2. Массовое добавление
+        bulk_words = random_words(rng, args.bulk)
+        started = time.perf_counter()
+        added, stall = await measure_loop_stall(content_filter.add_words(bulk_words))
+        bulk_ms = (time.perf_counter() - started) * 1000
+        print(f"add_words({args.bulk}): {bulk_ms:.0f} мс, макс. задержка цикла событий {stall * 1000:.1f} мс")
+        ok &= check(set(added) == set(bulk_words) - base_words - set(edit_words), "add_words вернул новые слова")
+        ok &= check(all(content_filter.check_text(f"текст {word} текст") for word in bulk_words[:100]),
+                    "новые слова находятся фильтром")
+
+        await content_filter.remove_word(bulk_words[0])
+        expected = (base_words | set(edit_words) | set(bulk_words)) - {bulk_words[0]}
+        ok &= check(content_filter.banned_words == expected, "список в памяти после правок")
+
+        # 3. Сворачивание и перечитывание
+        with open(words_file + JOURNAL_SUFFIX, encoding='utf-8') as f:
+            journal_lines = sum(1 for _ in f)
+        total_edits = 2 * args.edits + len(added) + 1
+        ok &= check(journal_lines < args.compact_every <= total_edits,
+                    f"журнал свернут (строк в журнале {journal_lines}, всего правок {total_edits})")
+        ok &= check(ContentFilter(words_file).banned_words == expected, "новый экземпляр читает тот же список")
+
+        # 4. Недописанная строка
+        with open(words_file + JOURNAL_SUFFIX, 'a', encoding='utf-8') as f:
+            f.write("+недопи")
+        ok &= check(ContentFilter(words_file).banned_words == expected, "недописанная строка журнала игнорируется")
+
+    print(f"{'ok  ' if ok else 'FAIL'} итог")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
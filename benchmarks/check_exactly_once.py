@@ -0,0 +1,173 @@
+"""
+Многопроцессная проверка аренды постов (lease_owner/lease_until в services.scheduler).
+
+Несколько процессов с собственными диспетчером и пулом публикации делят одну БД. Бот каждого процесса
+работает через заглушку сессии, которая дописывает текст каждого отправленного поста в общий журнал.
+Сценарии:
+  1. --instances процессов разбирают --posts наступивших постов;
+  2. "зависший" экземпляр забирает пачку постов и убивается, не успев их отправить, - после истечения
+     аренды посты должны допубликовать другие экземпляры;
+  3. медленный канал: лимит канала (--slow-rate сообщений в минуту) держит забранные посты в пуле
+     дольше срока аренды - аренда должна продлеваться, а пост, аренду которого все же потеряли,
+     не должен отправляться из старой задачи пула.
+В обоих случаях каждый пост должен быть отправлен ровно один раз и иметь статус 'published'.
+Завершается с кодом 1 при нарушении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_exactly_once --posts 2000 --instances 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+LEASE_SECONDS = 2
+
+
+def run_instance(db_path: str, sent_log: str, instance_id: str, hang: bool, chat_rate_per_minute: float):
+    """Точка входа процесса-экземпляра: настройки передаются через окружение до импорта модулей бота."""
+    os.environ.update(BOT_TOKEN="0:check", INSTANCE_ID=instance_id, PUBLISH_LEASE_SECONDS=str(LEASE_SECONDS),
+                      DISPATCH_MAX_SLEEP_SECONDS="0.2", DISPATCH_BATCH_SIZE="20", MISFIRE_REPLAY_RATE="100000",
+                      # Все посты идут в один канал; без chat_rate_per_minute лимит канала ничего не задерживает
+                      TELEGRAM_GROUP_RATE_PER_MINUTE=str(chat_rate_per_minute or 1_000_000),
+                      TELEGRAM_CHAT_BURST="1" if chat_rate_per_minute else "1000000")
+    asyncio.run(_instance_main(db_path, sent_log, hang))
+
+
+async def _instance_main(db_path: str, sent_log: str, hang: bool):
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Message
+
+    import services.scheduler as scheduler_service
+    from loader import db_manager
+
+    class JournalSession(BaseSession):
+        """Сессия без сети: дописывает текст отправленного поста в общий журнал (O_APPEND - атомарно)."""
+
+        async def make_request(self, bot, method, timeout=None):
+            if hang:
+                await asyncio.sleep(3600)  # Экземпляр "завис" до отправки и будет убит
+            await asyncio.sleep(0.001)
+            descriptor = os.open(sent_log, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+            try:
+                os.write(descriptor, f"{method.text}\n".encode())
+            finally:
+                os.close(descriptor)
+            return Message.model_validate({"message_id": 1, "date": datetime.now(), "text": method.text,
+                                           "chat": {"id": method.chat_id, "type": "channel"}})
+
+        async def stream_content(self, *args, **kwargs):
+            raise NotImplementedError
+
+        async def close(self):
+            pass
+
+    db_manager._db_name = db_path
+    await db_manager.startup()
+    scheduler_service.bot = Bot(token="0:check", session=JournalSession())
+    scheduler_service.publisher_pool.start()
+    await scheduler_service.publish_dispatcher.start()
+    await asyncio.Event().wait()  # Работаем, пока процесс не остановят
+
+
+def populate(db_path: str, posts: int):
+    # Схему создает Database при первом открытии
+    os.environ.setdefault("BOT_TOKEN", "0:check")
+    from models.database import Database
+    db = Database(db_path, reader_connections=0)
+    due = datetime.now() - timedelta(seconds=1)
+    db.connection.executemany(
+        "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (0, -100, ?, ?, 'scheduled')",
+        ((f"post-{i}", due.isoformat()) for i in range(posts))
+    )
+    db.connection.commit()
+    db.connection.close()
+
+
+def count_status(db_path: str, status: str) -> int:
+    with sqlite3.connect(db_path, timeout=30) as connection:
+        return connection.execute("SELECT COUNT(*) FROM posts WHERE status = ?", (status,)).fetchone()[0]
+
+
+def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def verify(name: str, db_path: str, sent_log: str, posts: int) -> bool:
+    with open(sent_log, encoding="utf-8") as f:
+        sent = Counter(line.strip() for line in f if line.strip())
+    duplicates = sum(1 for count in sent.values() if count > 1)
+    published = count_status(db_path, "published")
+    ok = len(sent) == posts and duplicates == 0 and published == posts
+    print(f"{'ok  ' if ok else 'FAIL'} {name}: отправлено {sum(sent.values())} (уникальных {len(sent)} из {posts}), "
+          f"дублей {duplicates}, published {published}")
+    return ok
+
+
+def scenario(context, posts: int, instances: int, with_hung_instance: bool = False,
+             chat_rate_per_minute: float = 0) -> bool:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "shared.db")
+        sent_log = os.path.join(tmp_dir, "sent.log")
+        open(sent_log, "w").close()
+        populate(db_path, posts)
+        processes = []
+        try:
+            if with_hung_instance:
+                hung = context.Process(target=run_instance, args=(db_path, sent_log, "hung", True, 0))
+                hung.start()
+                wait_for(lambda: count_status(db_path, "publishing") > 0, 30)
+                hung.kill()
+                hung.join()
+                print(f"     зависший экземпляр убит, в 'publishing' осталось {count_status(db_path, 'publishing')}")
+            for i in range(instances):
+                process = context.Process(target=run_instance, args=(db_path, sent_log, f"worker-{i}", False,
+                                                                    chat_rate_per_minute))
+                process.start()
+                processes.append(process)
+            wait_for(lambda: count_status(db_path, "published") == posts, 120)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+        if with_hung_instance:
+            name = "зависший экземпляр + восстановление аренды"
+        elif chat_rate_per_minute:
+            name = f"{instances} экземпляра, канал {chat_rate_per_minute:g}/мин, очередь дольше аренды"
+        else:
+            name = f"{instances} экземпляров"
+        return verify(name, db_path, sent_log, posts)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--slow-posts", type=int, default=60)
+    parser.add_argument("--slow-rate", type=float, default=300, help="лимит канала в сценарии 3, сообщений в минуту")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = [
+        scenario(context, args.posts, args.instances, with_hung_instance=False),
+        scenario(context, max(1, args.posts // 10), 2, with_hung_instance=True),
+        # Пачка в 20 постов при 5 сообщениях в секунду ждет в пуле до 4 с при аренде на 2 с
+        scenario(context, args.slow_posts, 2, chat_rate_per_minute=args.slow_rate),
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Проверка перечитывания стоп-листа и общего сохраненного автомата (services.content_filter).
+
+1. Запуск со списком из --words слов: сборка автомата против загрузки автомата, сохраненного
+   на диске другим экземпляром (words_file + ".matcher.json"); поврежденный или чужой файл
+   не загружается, и автомат собирается заново.
+2. Два процесса на одних файлах: второй процесс добавляет --added слов через журнал, первый
+   с reload_interval = --interval замечает правку, собирает новый автомат в фоне и подменяет его.
+   Все это время на первом процессе непрерывно идут вызовы check_text: каждый результат должен
+   соответствовать старому или новому списку целиком, а цикл событий не должен останавливаться
+   дольше --max-stall секунд.
+3. Собственные правки процесса не вызывают повторного перечитывания.
+4. Перечитывание, начатое одновременно с собственной правкой процесса (на небольшом списке
+   из --race-words слов, --race-rounds раз), не возвращает в память список без этой правки.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_hot_reload --words 100000 --added 1000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from services.content_filter import (ContentFilter, MATCHER_CACHE_SUFFIX, MODE_WORDS, state_chunks,
+                                     merge_state_chunks)
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def random_words(rng: random.Random, count: int) -> list[str]:
+    return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 12))) for _ in range(count)]
+
+
+def add_words_in_other_process(words_file: str, words: list[str]):
+    """Второй процесс бота: свой ContentFilter на тех же файлах, правка через журнал."""
+    async def run():
+        await ContentFilter(words_file).add_words(words)
+
+    asyncio.run(run())
+
+
+def check(ok: bool, text: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--added", type=int, default=1_000)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--max-stall", type=float, default=0.2)
+    parser.add_argument("--race-words", type=int, default=1_000)
+    parser.add_argument("--race-rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        words_file = os.path.join(tmp_dir, "banned_words.txt")
+        base_words = random_words(rng, args.words)
+        with open(words_file, 'w', encoding='utf-8') as f:
+            f.write("".join(f"{word}\n" for word in base_words))
+
+        # 1. Сборка против загрузки сохраненного автомата
+        started = time.perf_counter()
+        first = ContentFilter(words_file)
+        first._io.submit(lambda: None).result()  # Дождаться сохранения автомата на диск
+        build_seconds = time.perf_counter() - started
+        ok &= check(os.path.exists(words_file + MATCHER_CACHE_SUFFIX), "автомат сохранен на диск")
+        started = time.perf_counter()
+        second = ContentFilter(words_file, reload_interval=args.interval)
+        load_seconds = time.perf_counter() - started
+        print(f"запуск с {args.words} словами: сборка автомата {build_seconds:.2f} с, "
+              f"загрузка сохраненного {load_seconds:.2f} с")
+        probe_old, probe_new = f"текст {base_words[0]} текст", None
+        ok &= check(second.check_text(probe_old) == [base_words[0]], "загруженный автомат находит слова")
+
+        # Поврежденный или подмененный файл автомата не загружается
+        cache_file = words_file + MATCHER_CACHE_SUFFIX
+        with open(cache_file, encoding='utf-8') as f:
+            header, state = f.readline(), merge_state_chunks(json.loads(line) for line in f)
+        tampered = {
+            "не JSON": b"\x80\x04\x95 pickle",
+            "переход в несуществующее состояние": {**state, "fail": [10 ** 9] * len(state["fail"])},
+            "суффиксная ссылка на себя": {**state, "fail": [0] + list(range(1, len(state["fail"])))},
+            "слова не совпадают с отпечатком": {**state, "words": state["words"][1:]},
+        }
+        for name, content in tampered.items():
+            with open(cache_file, 'wb') as f:
+                f.write(content if isinstance(content, bytes) else (header + "".join(
+                    json.dumps([key, chunk]) + "\n" for key, value in content.items() for chunk in state_chunks(value)
+                )).encode("utf-8"))
+            rebuilt = ContentFilter(words_file)
+            ok &= check(rebuilt.check_text(probe_old) == [base_words[0]], f"{name}: автомат собран заново")
+            rebuilt._io.submit(lambda: None).result()  # Пересобранный автомат перезаписывает файл
+
+        # Режим words: индекс WordMatcher тоже восстанавливается из файла
+        words_mode = ContentFilter(words_file, MODE_WORDS)
+        words_mode._io.submit(lambda: None).result()
+        started = time.perf_counter()
+        words_loaded = ContentFilter(words_file, MODE_WORDS)
+        load_seconds = time.perf_counter() - started
+        ok &= check(words_loaded.check_text(probe_old) == words_mode.check_text(probe_old) == [base_words[0]],
+                    f"режим words: индекс загружен за {load_seconds:.2f} с и находит слова")
+
+        # Большие таблицы проверок выше больше не нужны: сборщик мусора обходил бы их во время перечитывания
+        del first, header, state, tampered, rebuilt, words_mode, words_loaded
+        # 2. Правка из другого процесса
+        added_words = random_words(rng, args.added)
+        probe_new = f"текст {added_words[0]} текст"
+        second.start_watching()
+        checks, torn, max_stall = 0, 0, 0.0
+        process = multiprocessing.get_context("spawn").Process(
+            target=add_words_in_other_process, args=(words_file, added_words))
+        started = time.perf_counter()
+        process.start()
+        while time.perf_counter() - started < args.timeout:
+            tick = time.perf_counter()
+            old_found, new_found = second.check_text(probe_old), second.check_text(probe_new)
+            checks += 1
+            torn += old_found != [base_words[0]]  # Старое слово должно находиться при любом автомате
+            if new_found:
+                break
+            await asyncio.sleep(0.001)
+            max_stall = max(max_stall, time.perf_counter() - tick - 0.001)
+        reload_seconds = time.perf_counter() - started
+        process.join()
+        ok &= check(bool(second.check_text(probe_new)),
+                    f"правка другого процесса видна через {reload_seconds:.2f} с (с учетом запуска процесса)")
+        ok &= check(torn == 0, f"{checks} проверок во время перечитывания, все с целым автоматом")
+        ok &= check(second.banned_words == set(base_words) | set(added_words), "список совпадает с файлами")
+        ok &= check(max_stall < args.max_stall,
+                    f"макс. задержка цикла событий во время перечитывания: {max_stall * 1000:.1f} мс")
+
+        # 3. Собственная правка
+        await second.add_word("собственноеслово")
+        await asyncio.sleep(args.interval * 3)
+        ok &= check(not await second.reload_if_changed(), "собственная правка не перечитывается повторно")
+        await second.stop_watching()
+
+        # 4. Перечитывание одновременно с собственной правкой
+        race_file = os.path.join(tmp_dir, "race_words.txt")
+        with open(race_file, 'w', encoding='utf-8') as f:
+            f.write("".join(f"{word}\n" for word in random_words(rng, args.race_words)))
+        own, other = ContentFilter(race_file), ContentFilter(race_file)
+
+        async def add_own_word(word: str, delay_steps: int):
+            for _ in range(delay_steps):  # Правка начинается на разных шагах перечитывания
+                await asyncio.sleep(0)
+            await own.add_word(word)
+
+        lost = []
+        for round_number in range(args.race_rounds):
+            await other.add_word(f"чужоеслово{round_number}")
+            own_word = f"своеслово{round_number}"
+            await asyncio.gather(own.reload_if_changed(), add_own_word(own_word, round_number % 10))
+            if own_word not in own.banned_words or own_word not in own.check_text(f"текст {own_word}"):
+                lost.append(own_word)
+        ok &= check(not lost, f"собственные правки не потеряны при перечитывании: потеряно {len(lost)} "
+                              f"из {args.race_rounds}")
+        await own.reload_if_changed()  # Перечитывание, заставшее правку, откладывается до следующей проверки
+        reread = ContentFilter(race_file)
+        ok &= check(own.banned_words == reread.banned_words, "список в памяти совпадает с файлами")
+        for content_filter in (own, other, reread):
+            content_filter._io.submit(lambda: None).result()  # Сохранения автоматов - до удаления каталога
+
+    print(f"{'ok  ' if ok else 'FAIL'} итог")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,153 @@
+"""
+Проверка планов "горячих" запросов через EXPLAIN QUERY PLAN.
+
+Создает временную БД со схемой и индексами из Database._init_db и завершается
+с кодом 1, если какой-либо из запросов ниже выполняется полным сканированием таблицы.
+При изменении SQL в хендлерах обновляйте и этот список.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_query_plans
+"""
+import os
+import sys
+import tempfile
+
+from models.database import Database
+
+HOT_QUERIES = {
+    "history_page (handlers/history.py)": (
+        """SELECT p.id, ch.title, p.content, p.publish_time, p.status, p.message_id, p.channel_id
+           FROM posts p
+           LEFT JOIN channels ch ON p.channel_id = ch.channel_id AND p.user_id = ch.user_id
+           WHERE p.user_id = ? AND (p.publish_time, p.id) < (?, ?)
+           ORDER BY p.publish_time DESC, p.id DESC LIMIT ?""",
+        (1, "2030-01-01T00:00:00", 100, 6)
+    ),
+    "scheduled_page (handlers/scheduled_posts.py)": (
+        """SELECT p.id, ch.title, p.content, p.publish_time, p.channel_id
+           FROM posts p
+           LEFT JOIN channels ch ON p.channel_id = ch.channel_id AND p.user_id = ch.user_id
+           WHERE p.user_id = ? AND p.status = 'scheduled'
+             AND (p.publish_time, p.id) > (?, ?)
+           ORDER BY p.publish_time ASC, p.id ASC LIMIT ?""",
+        (1, "2030-01-01T00:00:00", 100, 6)
+    ),
+    "post_counters (handlers/history.py, handlers/scheduled_posts.py)": (
+        "SELECT posts_total, posts_scheduled FROM user_post_counters WHERE user_id = ?", (1,)
+    ),
+    "admin_stats (handlers/admin_features.py)": ("SELECT * FROM stats_counters WHERE id = 1", ()),
+    "claim_due_posts (services/scheduler.py)": (
+        """UPDATE posts SET status = 'publishing', lease_owner = 'bot', lease_until = '2030-01-01T00:05:00'
+           WHERE id IN (SELECT id FROM posts
+                        WHERE status = 'scheduled' AND COALESCE(next_attempt_at, publish_time) > ?
+                          AND COALESCE(next_attempt_at, publish_time) <= ?
+                        ORDER BY COALESCE(next_attempt_at, publish_time)
+                        LIMIT ?)
+           RETURNING id""",
+        ("", "2030-01-01T00:00:00", 100)
+    ),
+    "next_publish_time (services/scheduler.py)": (
+        """SELECT COALESCE(next_attempt_at, publish_time) FROM posts
+           WHERE status = 'scheduled' AND COALESCE(next_attempt_at, publish_time) > ?
+           ORDER BY COALESCE(next_attempt_at, publish_time) LIMIT 1""",
+        ("",)
+    ),
+    "recover_expired_leases (services/scheduler.py)": (
+        """UPDATE posts SET status = 'scheduled', lease_owner = NULL, lease_until = NULL
+           WHERE status = 'publishing' AND (lease_until IS NULL OR lease_until < ? OR lease_owner = ?)""",
+        ("2030-01-01T00:00:00", "bot")
+    ),
+    "renew_leases (services/scheduler.py)": (
+        """UPDATE posts SET lease_until = ?
+           WHERE id IN (SELECT value FROM json_each(?)) AND status = 'publishing' AND lease_owner = ?""",
+        ("2030-01-01T00:05:00", "[1, 2, 3]", "bot")
+    ),
+    "count_due_posts (services/scheduler.py)": (
+        "SELECT COUNT(*) FROM posts WHERE status = 'scheduled' AND COALESCE(next_attempt_at, publish_time) <= ?",
+        ("2030-01-01T00:00:00",)
+    ),
+    "misfire_missed (services/scheduler.py)": (
+        """UPDATE posts SET status = 'missed'
+           WHERE id IN (SELECT id FROM posts
+                        WHERE status = 'scheduled' AND COALESCE(next_attempt_at, publish_time) < ? LIMIT ?)
+           RETURNING user_id""",
+        ("2030-01-01T00:00:00", 100)
+    ),
+    "finish_post_group (services/scheduler.py)": (
+        "SELECT COUNT(*) FROM posts WHERE group_id = ? AND status IN ('scheduled', 'publishing')", ("group",)
+    ),
+    "publish_report_group (services/scheduler.py)": (
+        """SELECT p.status, p.channel_id, p.message_id, ch.title, p.last_error, p.publish_time
+           FROM posts p
+           LEFT JOIN channels ch ON p.channel_id = ch.channel_id AND p.user_id = ch.user_id
+           WHERE p.group_id = ?
+           ORDER BY ch.title""",
+        ("group",)
+    ),
+    "rescreen_chunk (services/rescreen.py)": (
+        """SELECT p.id, p.user_id, p.channel_id, p.content, p.publish_time,
+                  (SELECT title FROM channels ch WHERE ch.channel_id = p.channel_id AND ch.user_id = p.user_id)
+           FROM posts p
+           WHERE p.status = 'scheduled' AND (p.publish_time, p.id) > (?, ?)
+           ORDER BY p.publish_time, p.id LIMIT ?""",
+        ("2030-01-01T00:00:00", 100, 500)
+    ),
+    "rescreen_chunk_channel (services/rescreen.py)": (
+        """SELECT p.id, p.user_id, p.channel_id, p.content, p.publish_time,
+                  (SELECT title FROM channels ch WHERE ch.channel_id = p.channel_id AND ch.user_id = p.user_id)
+           FROM posts p
+           WHERE p.status = 'scheduled' AND (p.publish_time, p.id) > (?, ?) AND p.channel_id = ?
+           ORDER BY p.publish_time, p.id LIMIT ?""",
+        ("2030-01-01T00:00:00", 100, -1001, 500)
+    ),
+    "rescreen_chunk_user (services/rescreen.py)": (
+        """SELECT p.id, p.user_id, p.channel_id, p.content, p.publish_time,
+                  (SELECT title FROM channels ch WHERE ch.channel_id = p.channel_id AND ch.user_id = p.user_id)
+           FROM posts p
+           WHERE p.status = 'scheduled' AND (p.publish_time, p.id) > (?, ?) AND p.user_id = ?
+           ORDER BY p.publish_time, p.id LIMIT ?""",
+        ("2030-01-01T00:00:00", 100, 1, 500)
+    ),
+    "scope_versions (services/scoped_words.py)": (
+        """SELECT scope_type, scope_id, words, version FROM banned_word_scopes
+           WHERE (scope_type = ? AND scope_id = ?) OR (scope_type = ? AND scope_id = ?)""",
+        ("channel", -1001, "user", 1)
+    ),
+    "scope_words (services/scoped_words.py)": (
+        "SELECT word FROM banned_words WHERE scope_type = ? AND scope_id = ?", ("channel", -1001)
+    ),
+    "channels_keyboard (bot_utils.py)": (
+        "SELECT channel_id, title FROM channels WHERE user_id = ? ORDER BY title", (1,)
+    ),
+    "templates_for_user (handlers/templates.py)": (
+        "SELECT id, name, user_id FROM templates WHERE user_id = ? OR user_id = ? ORDER BY user_id ASC, name ASC",
+        (0, 1)
+    ),
+    "list_users (handlers/admin_features.py)": (
+        "SELECT user_id, username, first_name, is_admin, created_at FROM bot_users ORDER BY created_at DESC LIMIT ?",
+        (10,)
+    ),
+}
+
+
+def full_scans(plan_rows) -> list:
+    """Строки плана вида 'SCAN <таблица>' без индекса - полное сканирование таблицы."""
+    return [detail for *_, detail in plan_rows if detail.startswith("SCAN") and "INDEX" not in detail]
+
+
+def main() -> int:
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "plans.db"), reader_connections=0)
+        for name, (query, params) in HOT_QUERIES.items():
+            plan = db.connection.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            scans = full_scans(plan)
+            details = "; ".join(row[-1] for row in plan)
+            print(f"{'FAIL' if scans else 'ok  '} {name}: {details}")
+            failed = failed or bool(scans)
+        db.connection.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
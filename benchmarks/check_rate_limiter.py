@@ -0,0 +1,139 @@
+"""
+Проверка ограничителя исходящих сообщений (services.rate_limiter) на симулированном времени.
+
+Бот с заглушкой сессии (без сети) отправляет пачку постов в каналы и уведомления пользователям
+одновременно, как при наступлении сотен отложенных постов в одну минуту. Часы лимитера виртуальные,
+поэтому проверка выполняется мгновенно и детерминированно. Скрипт проверяет, что ни в одном окне
+не превышены глобальный и поканальные лимиты, печатает метрики и завершается с кодом 1 при нарушении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_rate_limiter --posts 300 --channels 40 --users 20
+"""
+import argparse
+import asyncio
+import heapq
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Message
+
+from services.rate_limiter import TelegramRateLimiter, RateLimitMiddleware
+
+
+class VirtualClock:
+    """Виртуальное время: sleep() не ждет реально, а ставит таймер; run() продвигает время к ближайшему таймеру."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._timers = []
+        self._seq = 0
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (self.now + delay, self._seq, future))
+        self._seq += 1
+        await future
+
+    async def run(self, tasks: list[asyncio.Task]):
+        while not all(task.done() for task in tasks):
+            for _ in range(20):  # Даем задачам дойти до следующего sleep()
+                await asyncio.sleep(0)
+            if self._timers:
+                moment, _, future = heapq.heappop(self._timers)
+                self.now = max(self.now, moment)
+                future.set_result(None)
+        await asyncio.gather(*tasks)
+
+
+class StubSession(BaseSession):
+    """Сессия без сети: записывает время каждого запроса и возвращает фиктивное сообщение."""
+
+    def __init__(self, clock: VirtualClock):
+        super().__init__()
+        self.clock = clock
+        self.sent: list[tuple[float, int]] = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.sent.append((self.clock.time(), method.chat_id))
+        chat_type = "channel" if method.chat_id < 0 else "private"
+        return Message.model_validate({
+            "message_id": len(self.sent), "date": datetime.now(), "text": "ok",
+            "chat": {"id": method.chat_id, "type": chat_type},
+        })
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+def max_in_window(times: list[float], window: float) -> int:
+    """Максимальное количество отправок в любом полуинтервале длиной window."""
+    best, left = 0, 0
+    for right, moment in enumerate(times):
+        while moment - times[left] >= window:
+            left += 1
+        best = max(best, right - left + 1)
+    return best
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=300)
+    parser.add_argument("--channels", type=int, default=40)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--global-rate", type=float, default=30)
+    parser.add_argument("--chat-rate", type=float, default=1)
+    parser.add_argument("--group-rate-per-minute", type=float, default=20)
+    parser.add_argument("--chat-burst", type=int, default=3)
+    args = parser.parse_args()
+
+    clock = VirtualClock()
+    limiter = TelegramRateLimiter(args.global_rate, args.chat_rate, args.group_rate_per_minute / 60,
+                                  chat_burst=args.chat_burst, clock=clock.time, sleep=clock.sleep)
+    session = StubSession(clock)
+    session.middleware(RateLimitMiddleware(limiter))
+    bot = Bot(token="0:check", session=session)
+
+    tasks = [asyncio.create_task(bot.send_message(chat_id=-1000000000000 - i % args.channels, text=f"Пост {i}"))
+             for i in range(args.posts)]
+    tasks += [asyncio.create_task(bot.send_message(chat_id=1000 + i % args.users, text=f"Уведомление {i}"))
+              for i in range(args.posts)]
+    await clock.run(tasks)
+
+    per_chat = defaultdict(list)
+    for moment, chat_id in session.sent:
+        per_chat[chat_id].append(moment)
+    all_times = sorted(moment for moment, _ in session.sent)
+
+    # Граница GCRA: в окне W не больше burst + W * rate отправок
+    checks = {
+        "global, 1 c": (max_in_window(all_times, 1.0), 1 + args.global_rate),
+        "личный чат, 1 c": (max(max_in_window(sorted(t), 1.0) for c, t in per_chat.items() if c > 0),
+                             args.chat_burst + args.chat_rate),
+        "канал, 60 c": (max(max_in_window(sorted(t), 60.0) for c, t in per_chat.items() if c < 0),
+                        args.chat_burst + args.group_rate_per_minute),
+    }
+    failed = False
+    for name, (observed, limit) in checks.items():
+        ok = observed <= limit
+        failed = failed or not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: максимум {observed} при лимите {limit:g}")
+
+    stats = limiter.stats()
+    print(f"Отправлено {len(session.sent)} сообщений за {clock.now:.1f} c виртуального времени")
+    print(f"Метрики: очередь до {stats['max_waiting']}, задержано {stats['delayed']}, "
+          f"ожидание в среднем {stats['avg_wait']:.2f} c, максимум {stats['max_wait']:.2f} c")
+    await bot.session.close()
+    return 1 if failed or len(session.sent) != 2 * args.posts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
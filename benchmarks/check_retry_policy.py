@@ -0,0 +1,128 @@
+"""
+Проверка повторов публикации (services.retry_policy и services.scheduler.record_publish_failure).
+
+1. Классификация ошибок и задержки: retry_after соблюдается, backoff растет и ограничен сверху.
+2. Сквозной сценарий на временной БД с заглушкой бота: временные ошибки возвращают пост в очередь
+   с attempts/last_error в строке posts, постоянная ошибка или исчерпание попыток - 'failed'.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_retry_policy
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("BOT_TOKEN", "0:check")  # Бот создается в loader, но в сеть не обращается
+
+from aiogram.exceptions import (TelegramRetryAfter, TelegramServerError, TelegramBadRequest,  # noqa: E402
+                                TelegramForbiddenError, TelegramNetworkError)
+from aiogram.methods import SendMessage  # noqa: E402
+
+import services.scheduler as scheduler_service  # noqa: E402
+from config import PUBLISH_MAX_ATTEMPTS, PUBLISH_RETRY_MAX_SECONDS  # noqa: E402
+from loader import bot, db_manager, get_db  # noqa: E402
+from services.retry_policy import is_transient_error, retry_delay  # noqa: E402
+
+METHOD = SendMessage(chat_id=-100, text="x")
+
+
+class FailingBot:
+    """Заглушка бота: бросает ошибки из списка по очереди, затем "отправляет" сообщение."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+
+    async def send_message(self, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(message_id=42)
+
+
+def check(condition: bool, description: str) -> bool:
+    print(f"{'ok  ' if condition else 'FAIL'} {description}")
+    return condition
+
+
+async def publish_once(post_db_id: int, stub_bot) -> tuple:
+    db = get_db()
+    # Забираем конкретный пост, как это сделал бы диспетчер, не дожидаясь его publish_time
+    rows = await db.execute_returning(
+        f"UPDATE posts SET status = 'publishing', lease_owner = ?, lease_until = ? WHERE id = ? AND status = 'scheduled' "
+        f"RETURNING {scheduler_service.CLAIMED_POST_COLUMNS}",
+        (scheduler_service.PUBLISHER_ID, scheduler_service.lease_deadline().isoformat(), post_db_id)
+    )
+    await scheduler_service.publish_claimed_post(rows[0], stub_bot)
+    return await db.fetchone("SELECT status, attempts, last_error, message_id FROM posts WHERE id = ?", (post_db_id,))
+
+
+async def scenario(errors) -> tuple:
+    db = get_db()
+    cursor = await db.execute(
+        "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (0, -100, 'x', ?, 'scheduled')",
+        (datetime.now().isoformat(),), commit=True
+    )
+    stub_bot = FailingBot(errors)
+    while True:
+        row = await publish_once(cursor.lastrowid, stub_bot)
+        if row[0] != "scheduled":
+            return row
+
+
+async def main() -> int:
+    results = [
+        check(is_transient_error(TelegramRetryAfter(METHOD, "flood", 7)), "RetryAfter - временная"),
+        check(is_transient_error(TelegramServerError(METHOD, "502")), "5xx - временная"),
+        check(is_transient_error(TelegramNetworkError(METHOD, "timeout")), "сеть - временная"),
+        check(not is_transient_error(TelegramBadRequest(METHOD, "chat not found")), "BadRequest - постоянная"),
+        check(not is_transient_error(TelegramForbiddenError(METHOD, "kicked")), "Forbidden - постоянная"),
+        check(retry_delay(TelegramRetryAfter(METHOD, "flood", 7), 1, rand=lambda: 0.0) == 7,
+              "retry_after соблюдается"),
+        check(retry_delay(TelegramServerError(METHOD, "502"), 50, rand=lambda: 1.0) == PUBLISH_RETRY_MAX_SECONDS,
+              "backoff ограничен сверху"),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager._db_name = os.path.join(tmp_dir, "retry.db")
+        await db_manager.startup()
+        try:
+            flood = TelegramRetryAfter(METHOD, "flood", 0)
+            status, attempts, last_error, message_id = await scenario([flood, TelegramServerError(METHOD, "502")])
+            results.append(check(status == "published" and attempts == 2 and message_id == 42,
+                                 f"две временные ошибки, затем успех: {status}, attempts={attempts}"))
+
+            status, attempts, last_error, _ = await scenario([TelegramBadRequest(METHOD, "chat not found")])
+            results.append(check(status == "failed" and attempts == 1 and "chat not found" in last_error,
+                                 f"постоянная ошибка: {status}, attempts={attempts}, last_error={last_error!r}"))
+
+            # Повтор назначается в next_attempt_at, время, выбранное пользователем, не меняется
+            publish_time = datetime.now().replace(microsecond=0) - timedelta(seconds=5)
+            cursor = await get_db().execute(
+                "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (0, -100, 'x', ?, 'scheduled')",
+                (publish_time.isoformat(),), commit=True
+            )
+            await publish_once(cursor.lastrowid, FailingBot([TelegramRetryAfter(METHOD, "flood", 30)]))
+            stored_time, next_attempt_at = await get_db().fetchone(
+                "SELECT publish_time, next_attempt_at FROM posts WHERE id = ?", (cursor.lastrowid,)
+            )
+            claimed_now = await scheduler_service.claim_due_posts(datetime.now(), 10)
+            claimed_later = await scheduler_service.claim_due_posts(datetime.fromisoformat(next_attempt_at), 10)
+            results.append(check(stored_time == publish_time.isoformat() and next_attempt_at is not None
+                                 and not claimed_now and [row[0] for row in claimed_later] == [cursor.lastrowid],
+                                 f"повтор в next_attempt_at={next_attempt_at}, publish_time={stored_time} не изменен, "
+                                 f"пост забирается только после повтора"))
+
+            status, attempts, _, _ = await scenario([flood] * PUBLISH_MAX_ATTEMPTS)
+            results.append(check(status == "failed" and attempts == PUBLISH_MAX_ATTEMPTS,
+                                 f"исчерпаны попытки: {status}, attempts={attempts}"))
+        finally:
+            await db_manager.shutdown()
+            await bot.session.close()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
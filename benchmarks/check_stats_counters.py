@@ -0,0 +1,82 @@
+"""
+Проверка счетчиков постов в stats_counters (триггеры Database._init_counters).
+
+Посты проходят через все статусы (вставка, смена статуса, удаление), после чего счетчики сравниваются
+с COUNT(*) по таблице posts. Отдельно проверяется БД, созданная до появления счетчиков 'publishing',
+'missed' и 'held': при открытии колонки добавляются, триггеры пересоздаются, а счетчики пересчитываются.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_stats_counters --posts 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+os.environ.setdefault("BOT_TOKEN", "0:counters")  # config требует токен, в сеть никто не обращается
+
+from models.database import Database, STATS_ADDED_COLUMNS  # noqa: E402
+
+STATUSES = ("scheduled", "publishing", "published", "failed", "cancelled", "missed", "held")
+
+
+def check(ok: bool, text: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    return ok
+
+
+def counters_match(db: Database, name: str) -> bool:
+    columns = ", ".join(f"posts_{status}" for status in STATUSES)
+    counters = dict(zip(STATUSES, db.connection.execute(f"SELECT {columns} FROM stats_counters").fetchone()))
+    actual = {status: 0 for status in STATUSES}
+    actual.update(db.connection.execute("SELECT status, COUNT(*) FROM posts GROUP BY status").fetchall())
+    return check(counters == actual, f"{name}: {counters}")
+
+
+def shuffle_statuses(db: Database, rng: random.Random, posts: int):
+    db.connection.executemany(
+        "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, -100, 'x', '2030-01-01', ?)",
+        [(rng.randint(1, 50), rng.choice(STATUSES)) for _ in range(posts)]
+    )
+    ids = [row[0] for row in db.connection.execute("SELECT id FROM posts")]
+    db.connection.executemany("UPDATE posts SET status = ? WHERE id = ?",
+                              [(rng.choice(STATUSES), rng.choice(ids)) for _ in range(posts)])
+    db.connection.executemany("DELETE FROM posts WHERE id = ?", [(post_id,) for post_id in rng.sample(ids, posts // 10)])
+    db.connection.commit()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=5_000)
+    args = parser.parse_args()
+
+    rng = random.Random(22)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "counters.db")
+        db = Database(db_path, reader_connections=0)
+        shuffle_statuses(db, rng, args.posts)
+        ok &= counters_match(db, "новая БД")
+
+        # БД до появления новых счетчиков: без колонок и со старыми триггерами, которые их не ведут
+        for trigger in ("trg_stats_posts_insert", "trg_stats_posts_delete", "trg_stats_posts_status"):
+            db.connection.execute(f"DROP TRIGGER {trigger}")
+        for column in STATS_ADDED_COLUMNS:
+            db.connection.execute(f"ALTER TABLE stats_counters DROP COLUMN {column}")
+        db.connection.commit()
+        db.connection.close()
+
+        db = Database(db_path, reader_connections=0)
+        ok &= counters_match(db, "старая БД после открытия")
+        shuffle_statuses(db, rng, args.posts)
+        ok &= counters_match(db, "старая БД после новых правок")
+        db.connection.close()
+
+    print(f"{'ok  ' if ok else 'FAIL'} итог")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Корпус проверки режима CONTENT_FILTER_MODE=words (services.word_matcher).
+
+Каждый случай - текст, список запрещенных слов и ожидаемый набор найденных слов. Корпус покрывает
+уловки, которые должен ловить нормализованный режим (ё/е, латиница вместо кириллицы, разделители
+и повторы букв, буквы через пробел), и ложные срабатывания прежнего поиска подстрок, которых
+в новом режиме быть не должно. Для наглядности печатается и результат режима substring.
+Завершается с кодом 1 при расхождении.
+
+Запуск из корня проекта:
+    python -m benchmarks.check_word_matching
+"""
+import os
+import sys
+import tempfile
+
+from services.content_filter import ContentFilter, MODE_SUBSTRING, MODE_WORDS
+
+# (текст, запрещенные слова, что должен найти режим words)
+CORPUS = [
+    ("Лучшее казино в городе", ["казино"], {"казино"}),
+    ("КАЗИНО! Заходи", ["казино"], {"казино"}),
+    ("Играй в kaзинo онлайн", ["казино"], {"казино"}),  # Латинские k, o
+    ("Играй в KA3NHO", ["казино"], set()),  # N - не двойник: совпадения нет
+    ("Это к.а.з.и.н.о", ["казино"], {"казино"}),
+    ("Это к-а-з-и-н-о и к_а_з_и_н_о", ["казино"], {"казино"}),
+    ("Это к а з и н о рядом", ["казино"], {"казино"}),
+    ("Каааазиииино!!!", ["казино"], {"казино"}),
+    ("Ёлка и елка", ["елка"], {"елка"}),
+    ("Купи ёлку", ["ёлку"], {"ёлку"}),
+    ("Купи елку", ["ёлку"], {"ёлку"}),
+    ("ка́зино со ударением", ["казино"], {"казино"}),  # Комбинируемый знак ударения
+    ("каз​ино с невидимым пробелом", ["казино"], {"казино"}),
+    ("ＫＡＺＩＮＯ полной ширины", ["kazino"], {"kazino"}),
+    ("Оскорбление: аренда", ["рен"], set()),  # Подстрока внутри другого слова - не совпадение
+    ("Полиграфия и граф Толстой", ["граф"], {"граф"}),
+    ("Закладка для книги", ["кладка"], set()),
+    ("Пост про наркотики и наркотиками", ["наркотик*"], {"наркотик*"}),
+    ("Ставки на спорт здесь", ["ставки на спорт"], {"ставки на спорт"}),
+    ("Ставки,   на... спорт", ["ставки на спорт"], {"ставки на спорт"}),  # Знаки и лишние пробелы между словами
+    ("Ставки на киберспорт", ["ставки на спорт"], set()),
+    ("Просто текст без нарушений", ["казино", "ставки"], set()),
+    ("", ["казино"], set()),
+    ("Казино, ставки и к.а.з.и.н.о снова", ["казино", "ставки", "спорт"], {"казино", "ставки"}),
+]
+
+
+def main() -> int:
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        words_file = os.path.join(tmp_dir, "banned_words.txt")
+        for text, words, expected in CORPUS:
+            with open(words_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(words))
+            found = set(ContentFilter(words_file, MODE_WORDS).check_text(text))
+            substring_found = set(ContentFilter(words_file, MODE_SUBSTRING).check_text(text))
+            passed = found == expected
+            ok &= passed
+            print(f"{'ok  ' if passed else 'FAIL'} {text!r}: words={sorted(found)} substring={sorted(substring_found)}"
+                  + ("" if passed else f" ожидалось {sorted(expected)}"))
+    print(f"{'ok  ' if ok else 'FAIL'} корпус из {len(CORPUS)} случаев")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
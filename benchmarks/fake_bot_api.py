@@ -0,0 +1,140 @@
+"""
+Локальный фейковый Telegram Bot API на aiohttp для бенчмарков публикации.
+
+Принимает запросы вида POST /bot<token>/<method> (как настоящий сервер и aiogram AiohttpSession),
+отвечает правдоподобными объектами Message, выдерживает настраиваемую задержку и с заданной
+вероятностью отвечает ошибками: 429 с retry_after, 400 (chat not found) и 5xx. Каждый запрос
+записывается в FakeBotAPI.requests (время получения, метод, chat_id, текст, код ответа).
+
+Бот направляется на сервер через TELEGRAM_API_URL (см. config.py), например:
+    python -m benchmarks.fake_bot_api --port 8081 --latency 0.05 --rate-429 0.01
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import time
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+
+@dataclass
+class RecordedRequest:
+    received_at: float  # time.time() момента получения запроса
+    method: str
+    chat_id: int | None
+    text: str | None
+    status: int
+
+
+@dataclass
+class FakeBotAPI:
+    latency: float = 0.0  # Базовая задержка ответа, с
+    jitter: float = 0.0  # Случайная добавка к задержке: равномерно от 0 до jitter, с
+    rate_429: float = 0.0  # Доли запросов отправки, получающих ошибку
+    rate_400: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: int = 1  # retry_after в ответах 429, с
+    seed: int | None = None
+    requests: list[RecordedRequest] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+        self._message_id = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запускает сервер в текущем цикле событий и возвращает базовый URL для TELEGRAM_API_URL."""
+        # Сокет открываем сами: при port=0 порт выбирает ОС, и его можно узнать без приватных полей aiohttp
+        sock = socket.create_server((host, port))
+        bound_port = sock.getsockname()[1]
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    def counts(self) -> dict[int, int]:
+        """Количество ответов по HTTP-кодам."""
+        result = {}
+        for request in self.requests:
+            result[request.status] = result.get(request.status, 0) + 1
+        return result
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        received_at = time.time()
+        method = request.match_info["method"]
+        data = await request.post()
+        chat_id = int(data["chat_id"]) if "chat_id" in data else None
+        text = data.get("text") or data.get("caption")
+        if text is None and "media" in data:  # sendMediaGroup: подпись у первого элемента
+            text = json.loads(data["media"])[0].get("caption")
+
+        delay = self.latency + self._random.random() * self.jitter
+        if delay:
+            await asyncio.sleep(delay)
+
+        status, payload = 200, None
+        if method.startswith("send") or method in ("forwardMessage", "copyMessage"):
+            roll = self._random.random()
+            if roll < self.rate_429:
+                status, payload = 429, {"ok": False, "error_code": 429,
+                                        "description": f"Too Many Requests: retry after {self.retry_after}",
+                                        "parameters": {"retry_after": self.retry_after}}
+            elif roll < self.rate_429 + self.rate_400:
+                status, payload = 400, {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"}
+            elif roll < self.rate_429 + self.rate_400 + self.rate_5xx:
+                status, payload = 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+        if payload is None:
+            payload = {"ok": True, "result": self._result(method, chat_id, text, data)}
+
+        self.requests.append(RecordedRequest(received_at, method, chat_id, text, status))
+        return web.json_response(payload, status=status)
+
+    def _result(self, method: str, chat_id: int | None, text: str | None, data) -> object:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method == "sendMediaGroup":
+            return [self._message(chat_id, text if index == 0 else None)
+                    for index in range(len(json.loads(data["media"])))]
+        if method.startswith("send") or method in ("forwardMessage", "copyMessage"):
+            return self._message(chat_id, text)
+        return True  # deleteMessage, editMessage*, answerCallbackQuery и прочие - просто "ok"
+
+    def _message(self, chat_id: int | None, text: str | None) -> dict:
+        self._message_id += 1
+        chat_type = "channel" if chat_id is not None and chat_id < 0 else "private"
+        message = {"message_id": self._message_id, "date": int(time.time()), "chat": {"id": chat_id, "type": chat_type}}
+        if text is not None:
+            message["text"] = text
+        return message
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-400", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    fake_api = FakeBotAPI(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429, rate_400=args.rate_400,
+                          rate_5xx=args.rate_5xx, retry_after=args.retry_after)
+    web.run_app(fake_api.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Нагрузочная проверка пула соединений Database на временном файле БД.
+
+Параллельно запускает писателей (INSERT + UPDATE с проверкой rowcount/lastrowid)
+и читателей (выборки истории), после чего сверяет итоговое состояние таблицы posts.
+Завершается с кодом 1, если хоть один rowcount/lastrowid оказался чужим.
+
+Запуск из корня проекта:
+    python -m benchmarks.stress_db_pool --writers 20 --readers 50 --iterations 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from models.database import Database
+
+
+async def writer(db: Database, user_id: int, iterations: int, errors: list):
+    for i in range(iterations):
+        cursor = await db.execute(
+            "INSERT INTO posts (user_id, channel_id, content, publish_time, status) VALUES (?, ?, ?, ?, 'scheduled')",
+            (user_id, -100, f"{user_id}:{i}", datetime.now().isoformat()),
+            commit=True
+        )
+        post_id = cursor.lastrowid
+        row = await db.fetchone("SELECT content FROM posts WHERE id = ?", (post_id,))
+        if not row or row[0] != f"{user_id}:{i}":
+            errors.append(f"lastrowid {post_id} указывает на чужую строку: {row}")
+
+        cursor = await db.execute(
+            "UPDATE posts SET status = 'published' WHERE user_id = ? AND status = 'scheduled'",
+            (user_id,),
+            commit=True
+        )
+        if cursor.rowcount != 1:
+            errors.append(f"user {user_id}: rowcount {cursor.rowcount} вместо 1")
+
+
+async def reader(db: Database, user_id: int, iterations: int, latencies: list):
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await db.fetchall(
+            "SELECT id, content, status FROM posts WHERE user_id = ? ORDER BY publish_time DESC LIMIT 5",
+            (user_id,)
+        )
+        latencies.append(time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    errors, latencies = [], []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "stress.db"))
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(writer(db, uid, args.iterations, errors) for uid in range(1, args.writers + 1)),
+            *(reader(db, uid % args.writers + 1, args.iterations, latencies) for uid in range(args.readers))
+        )
+        elapsed = time.perf_counter() - started
+
+        published = (await db.fetchone("SELECT COUNT(*) FROM posts WHERE status = 'published'"))[0]
+        expected = args.writers * args.iterations
+        if published != expected:
+            errors.append(f"опубликовано {published} строк, ожидалось {expected}")
+        await db.close()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    print(f"{elapsed:.2f} c, записей: {args.writers * args.iterations * 2}, чтений: {len(latencies)}, "
+          f"p99 чтения {p99:.1f} мс, ошибок: {len(errors)}")
+    for error in errors[:20]:
+        print("  ", error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -32,19 +32,23 @@ def get_main_keyboard() -> types.ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
-async def get_channels_keyboard(user_id: int, selected_channel_id: int = None) -> types.InlineKeyboardMarkup:
+async def get_channels_keyboard(user_id: int, selected_channel_ids=None) -> types.InlineKeyboardMarkup:
+    """Клавиатура выбора каналов: нажатие отмечает/снимает канал, «Готово» завершает выбор."""
     db = get_db()
-    channels = db.fetchall(
+    channels = await db.fetchall(
         "SELECT channel_id, title FROM channels WHERE user_id = ? ORDER BY title",
         (user_id,)
     )
+    selected_channel_ids = set(selected_channel_ids or ())
     builder = InlineKeyboardBuilder()
     if channels:
         for cid, title in channels:
             button_text = escape_html(title)
-            if selected_channel_id and cid == selected_channel_id:
+            if cid in selected_channel_ids:
                 button_text = f"✅ {button_text}"
             builder.row(types.InlineKeyboardButton(text=button_text, callback_data=f"channel_{cid}"))
+        builder.row(types.InlineKeyboardButton(text=f"➡️ Готово (выбрано: {len(selected_channel_ids)})",
+                                               callback_data="channels_done"))
     return builder.as_markup()
 
 
@@ -55,12 +59,16 @@ async def notify_user(bot: Bot, user_id: int, text: str, **kwargs):
         print(f"Ошибка отправки уведомления пользователю {user_id}: {e}")
 
 
+def channel_post_link(channel_id: int, message_id: int) -> str:
+    channel_id_str = str(channel_id).replace('-100', '')
+    return f"https://t.me/c/{channel_id_str}/{message_id}"
+
+
 async def notify_post_published(bot: Bot, user_id: int, channel_id: int, message_id: int, channel_title: str):
     try:
-        channel_id_str = str(channel_id).replace('-100', '')
         safe_channel_title = escape_html(channel_title)
         text = (f"✅ Пост опубликован в канале «{safe_channel_title}»!\n"
-                f"👁‍🗨 Посмотреть: https://t.me/c/{channel_id_str}/{message_id}")
+                f"👁‍🗨 Посмотреть: {channel_post_link(channel_id, message_id)}")
         await notify_user(bot, user_id, text, disable_web_page_preview=True)
     except Exception as e:
         print(f"Ошибка уведомления о публикации: {e}")
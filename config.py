@@ -5,8 +5,38 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL") # Адрес Bot API (свой сервер или benchmarks.fake_bot_api); по умолчанию api.telegram.org
 DATABASE_NAME = os.getenv("DATABASE_NAME", "database.db") # Значение по умолчанию, если не задано
 BANNED_WORDS_FILE = os.getenv("BANNED_WORDS_FILE", "banned_words.txt") # Значение по умолчанию
+BANNED_WORDS_COMPACT_EVERY = int(os.getenv("BANNED_WORDS_COMPACT_EVERY", 1000)) # Записей в журнале правок стоп-листа, после которых он сворачивается в файл
+BANNED_WORDS_RELOAD_SECONDS = float(os.getenv("BANNED_WORDS_RELOAD_SECONDS", 5)) # Как часто проверять файлы стоп-листа на чужие правки (0 - не проверять)
+RESCREEN_POLICY = os.getenv("RESCREEN_POLICY", "hold") # Запланированные посты с новыми запрещенными словами: hold - снять с публикации, flag - только предупредить владельца
+RESCREEN_CHUNK_SIZE = int(os.getenv("RESCREEN_CHUNK_SIZE", 500)) # Постов за один запрос при повторной проверке
+CONTENT_FILTER_MODE = os.getenv("CONTENT_FILTER_MODE", "substring") # substring - подстрока в тексте; words - целые слова после нормализации (ё/е, латиница, разделители)
+CONTENT_FILTER_CACHE_SIZE = int(os.getenv("CONTENT_FILTER_CACHE_SIZE", 10000)) # Сколько результатов проверки текстов держать в кэше (0 - без кэша)
+CONTENT_FILTER_CACHE_MAX_BYTES = int(os.getenv("CONTENT_FILTER_CACHE_MAX_BYTES", 4 * 1024 * 1024)) # Примерный предел памяти кэша результатов проверки
+SCOPED_MATCHERS_MAX = int(os.getenv("SCOPED_MATCHERS_MAX", 2000)) # Сколько автоматов списков каналов/пользователей держать в памяти
+SCOPED_MATCHERS_MAX_BYTES = int(os.getenv("SCOPED_MATCHERS_MAX_BYTES", 64 * 1024 * 1024)) # Примерный предел памяти этих автоматов
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", 1000)) # Сколько разобранных шаблонов держать в памяти
+TEMPLATE_CACHE_TTL = float(os.getenv("TEMPLATE_CACHE_TTL", 60)) # Через сколько секунд перечитывать шаблон из БД (удаление в другом процессе)
 SUPER_ADMIN_ID = int(os.getenv("SUPER_ADMIN_ID", 0)) # 0 если не задано, чтобы не было ошибки
-
-
+DB_READER_CONNECTIONS = int(os.getenv("DB_READER_CONNECTIONS", 4)) # Соединений-читателей SQLite (0 - читать через писателя)
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", 4)) # Воркеров пула публикации (одновременных отправок постов)
+INTERACTIVE_LANE_WEIGHT = int(os.getenv("INTERACTIVE_LANE_WEIGHT", 4)) # Вес полосы действий пользователя в пуле публикации
+BULK_LANE_WEIGHT = int(os.getenv("BULK_LANE_WEIGHT", 1)) # Вес полосы отложенных постов в пуле публикации
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", 100)) # Сколько наступивших постов диспетчер забирает за один запрос
+DISPATCH_MAX_SLEEP_SECONDS = float(os.getenv("DISPATCH_MAX_SLEEP_SECONDS", 60)) # Максимальный сон диспетчера между проверками очереди
+INSTANCE_ID = os.getenv("INSTANCE_ID") # Имя экземпляра бота для аренды постов (по умолчанию хост и PID процесса)
+PUBLISH_LEASE_SECONDS = float(os.getenv("PUBLISH_LEASE_SECONDS", 300)) # Срок аренды забранного поста; после него пост может забрать другой экземпляр
+PUBLISH_SHUTDOWN_GRACE_SECONDS = float(os.getenv("PUBLISH_SHUTDOWN_GRACE_SECONDS", 10)) # Сколько при остановке бота ждать уже начатые отправки постов
+MISFIRE_POLICY = os.getenv("MISFIRE_POLICY", "publish") # Посты, опоздавшие дольше окна: publish, missed или reschedule (на сутки вперед)
+MISFIRE_GRACE_SECONDS = float(os.getenv("MISFIRE_GRACE_SECONDS", 3600)) # Окно, в котором опоздавший пост публикуется всегда
+MISFIRE_REPLAY_RATE = float(os.getenv("MISFIRE_REPLAY_RATE", 5)) # Постов в секунду при догонке опоздавших после старта
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30)) # Сообщений в секунду на бота (лимит Telegram ~30/с)
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1)) # Сообщений в секунду в один личный чат
+TELEGRAM_GROUP_RATE_PER_MINUTE = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", 20)) # Сообщений в минуту в одну группу/канал
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3)) # Сколько сообщений в чат можно отправить подряд без ожидания
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", 5)) # Попыток публикации поста при временных ошибках
+PUBLISH_RETRY_BASE_SECONDS = float(os.getenv("PUBLISH_RETRY_BASE_SECONDS", 5)) # Базовая задержка повтора (растет экспоненциально)
+PUBLISH_RETRY_MAX_SECONDS = float(os.getenv("PUBLISH_RETRY_MAX_SECONDS", 600)) # Максимальная задержка между повторами
+ALBUM_COLLECT_SECONDS = float(os.getenv("ALBUM_COLLECT_SECONDS", 0.8)) # Сколько ждать следующую часть альбома (медиагруппы) от пользователя
@@ -9,7 +9,7 @@ class IsAdmin(Filter):
         db = get_db()
         user_id = event.from_user.id
 
-        admin_status = db.fetchone("SELECT is_admin FROM bot_users WHERE user_id = ?", (user_id,))
+        admin_status = await db.fetchone("SELECT is_admin FROM bot_users WHERE user_id = ?", (user_id,))
 
         # Проверяем, что запись найдена и is_admin == 1
         return bool(admin_status and admin_status[0] == 1)
\ No newline at end of file
@@ -1,7 +1,13 @@
+import re
+
 from aiogram import Router, types, F
 from aiogram.filters import Command, CommandObject
 
-from loader import content_filter, get_db  # Добавляем get_db
+from loader import content_filter, get_db, rate_limiter  # Добавляем get_db
+from services.scheduler import publisher_pool
+from services.rescreen import post_rescreener
+from services.scoped_words import scoped_words, SCOPE_TYPES
+from services.template_cache import template_cache
 from filters.admin import IsAdmin
 from bot_utils import escape_html
 
@@ -9,6 +15,10 @@ router = Router()
 router.message.filter(IsAdmin())
 router.callback_query.filter(IsAdmin())
 
+BANNED_WORD_MAX_LENGTH = 50
+BANNED_WORDS_FILE_MAX_BYTES = 1024 * 1024  # Максимальный размер .txt со списком слов для /add_banned_words
+WORDS_SEPARATOR_REGEX = re.compile(r"[\s,;]+")
+
 
 @router.message(Command("add_banned_word"))
 async def admin_add_banned_word(message: types.Message, command: CommandObject):
@@ -29,20 +39,63 @@ async def admin_add_banned_word(message: types.Message, command: CommandObject):
         await message.answer("Пожалуйста, добавляйте слова по одному, без пробелов.")
         return
 
-    if len(word_to_add) > 50:
-        await message.answer("Слишком длинное слово (максимум 50 символов).")
+    if len(word_to_add) > BANNED_WORD_MAX_LENGTH:
+        await message.answer(f"Слишком длинное слово (максимум {BANNED_WORD_MAX_LENGTH} символов).")
         return
 
     if word_to_add in content_filter.banned_words:
         await message.answer(f"Слово «{escape_html(word_to_add)}» уже есть в списке.")
         return
 
-    if content_filter.add_word(word_to_add):
+    if await content_filter.add_word(word_to_add):
+        post_rescreener.words_added([word_to_add])  # Проверить уже запланированные посты на новое слово
         await message.answer(f"✅ Слово «{escape_html(word_to_add)}» успешно добавлено в список запрещенных.")
     else:
         await message.answer(f"❌ Не удалось добавить слово «{escape_html(word_to_add)}». Проверьте логи.")
 
 
+@router.message(Command("add_banned_words"))
+async def admin_add_banned_words(message: types.Message, command: CommandObject):
+    # Слова - через пробел, запятую или с новой строки, в тексте команды или в .txt-файле с подписью команды
+    words_text = command.args or ""
+    if message.document:
+        if message.document.file_size and message.document.file_size > BANNED_WORDS_FILE_MAX_BYTES:
+            await message.answer(f"Файл слишком большой (максимум {BANNED_WORDS_FILE_MAX_BYTES // 1024} КБ).")
+            return
+        file_data = await message.bot.download(message.document)
+        try:
+            words_text += "\n" + file_data.read().decode("utf-8")
+        except UnicodeDecodeError:
+            await message.answer("Не удалось прочитать файл: ожидается текст в кодировке UTF-8.")
+            return
+
+    words = [word for word in WORDS_SEPARATOR_REGEX.split(words_text.lower()) if word]
+    if not words:
+        await message.answer(
+            "Пожалуйста, укажите слова для добавления через пробел, запятую или с новой строки, "
+            "либо отправьте .txt-файл с подписью <code>/add_banned_words</code>.\n"
+            "Пример: <code>/add_banned_words плохой, ужасный</code>",
+            parse_mode="HTML"
+        )
+        return
+
+    too_long = [word for word in words if len(word) > BANNED_WORD_MAX_LENGTH]
+    candidates = [word for word in words if len(word) <= BANNED_WORD_MAX_LENGTH]
+    added = await content_filter.add_words(candidates)
+    if added is None:
+        await message.answer("❌ Не удалось добавить слова. Проверьте логи.")
+        return
+    already_present = len(set(candidates)) - len(added)
+    post_rescreener.words_added(added)
+
+    response_parts = [f"✅ Добавлено слов: {len(added)}."]
+    if already_present:
+        response_parts.append(f"ℹ️ Уже были в списке: {already_present}.")
+    if too_long:
+        response_parts.append(f"⚠️ Пропущено слишком длинных (больше {BANNED_WORD_MAX_LENGTH} символов): {len(too_long)}.")
+    await message.answer("\n".join(response_parts))
+
+
 @router.message(Command("remove_banned_word"))
 async def admin_remove_banned_word(message: types.Message, command: CommandObject):
     if command.args is None:
@@ -62,7 +115,7 @@ async def admin_remove_banned_word(message: types.Message, command: CommandObjec
         await message.answer(f"Слова «{escape_html(word_to_remove)}» нет в списке запрещенных.")
         return
 
-    if content_filter.remove_word(word_to_remove):
+    if await content_filter.remove_word(word_to_remove):
         await message.answer(f"🗑️ Слово «{escape_html(word_to_remove)}» успешно удалено из списка.")
     else:
         await message.answer(f"❌ Не удалось удалить слово «{escape_html(word_to_remove)}». Проверьте логи.")
@@ -94,6 +147,95 @@ async def admin_list_banned_words(message: types.Message):
             await message.answer(part, parse_mode="HTML")
 
 
+def parse_scope_args(args: str | None) -> tuple[str, int, str] | None:
+    """Разбирает "<channel|user> <id> остальное" для команд списков каналов и пользователей."""
+    parts = (args or "").split(maxsplit=2)
+    if len(parts) < 2 or parts[0].lower() not in SCOPE_TYPES or not parts[1].lstrip("-").isdigit():
+        return None
+    return parts[0].lower(), int(parts[1]), parts[2] if len(parts) > 2 else ""
+
+
+SCOPE_USAGE = ("Укажите область: <code>channel</code> и ID канала или <code>user</code> и ID пользователя.\n"
+               "Пример: <code>{command} channel -1001234567890{example}</code>")
+
+
+@router.message(Command("add_scope_words"))
+async def admin_add_scope_words(message: types.Message, command: CommandObject):
+    # Слова для списка отдельного канала или пользователя; проверяются вместе с общим списком
+    scope = parse_scope_args(command.args)
+    words = [word for word in WORDS_SEPARATOR_REGEX.split(scope[2].lower()) if word] if scope else []
+    if not words:
+        await message.answer(SCOPE_USAGE.format(command="/add_scope_words", example=" плохой, ужасный"),
+                             parse_mode="HTML")
+        return
+    scope_type, scope_id, _ = scope
+
+    too_long = [word for word in words if len(word) > BANNED_WORD_MAX_LENGTH]
+    candidates = [word for word in words if len(word) <= BANNED_WORD_MAX_LENGTH]
+    try:
+        added = await scoped_words.add_words(scope_type, scope_id, candidates)
+    except Exception:
+        await message.answer("❌ Не удалось добавить слова. Проверьте логи.")
+        return
+    post_rescreener.words_added(added, (scope_type, scope_id))  # Уже запланированные посты канала/пользователя
+
+    response_parts = [f"✅ В список {scope_type} {scope_id} добавлено слов: {len(added)}."]
+    if len(set(candidates)) > len(added):
+        response_parts.append(f"ℹ️ Уже были в списке: {len(set(candidates)) - len(added)}.")
+    if too_long:
+        response_parts.append(f"⚠️ Пропущено слишком длинных (больше {BANNED_WORD_MAX_LENGTH} символов): {len(too_long)}.")
+    await message.answer("\n".join(response_parts))
+
+
+@router.message(Command("remove_scope_word"))
+async def admin_remove_scope_word(message: types.Message, command: CommandObject):
+    scope = parse_scope_args(command.args)
+    if not scope or not scope[2].strip():
+        await message.answer(SCOPE_USAGE.format(command="/remove_scope_word", example=" плохой"), parse_mode="HTML")
+        return
+    scope_type, scope_id, word_to_remove = scope[0], scope[1], scope[2].strip().lower()
+
+    try:
+        removed = await scoped_words.remove_word(scope_type, scope_id, word_to_remove)
+    except Exception:
+        await message.answer(f"❌ Не удалось удалить слово «{escape_html(word_to_remove)}». Проверьте логи.")
+        return
+    if removed:
+        await message.answer(f"🗑️ Слово «{escape_html(word_to_remove)}» удалено из списка {scope_type} {scope_id}.")
+    else:
+        await message.answer(f"Слова «{escape_html(word_to_remove)}» нет в списке {scope_type} {scope_id}.")
+
+
+@router.message(Command("list_scope_words"))
+async def admin_list_scope_words(message: types.Message, command: CommandObject):
+    scope = parse_scope_args(command.args)
+    if not scope:
+        await message.answer(SCOPE_USAGE.format(command="/list_scope_words", example=""), parse_mode="HTML")
+        return
+    scope_type, scope_id, _ = scope
+
+    words = await scoped_words.list_words(scope_type, scope_id)
+    if not words:
+        await message.answer(f"Список {scope_type} {scope_id} пуст.")
+        return
+
+    header = f"📜 <b>Запрещенные слова {scope_type} {scope_id}:</b>\n\n"
+    words_text = ""
+    message_parts = []
+    for word in words:
+        word_line = f"• <code>{escape_html(word)}</code>\n"
+        if len(header) + len(words_text) + len(word_line) > 4000:
+            message_parts.append(header + words_text)
+            words_text = ""
+            header = ""
+        words_text += word_line
+    if words_text:
+        message_parts.append(header + words_text)
+
+    for part in message_parts:
+        await message.answer(part, parse_mode="HTML")
+
+
 # --- НОВЫЕ АДМИНСКИЕ ФУНКЦИИ ---
 
 @router.message(Command("admin_stats"))
@@ -101,48 +243,92 @@ async def admin_stats(message: types.Message):
     db = get_db()
     stats_text_parts = ["📊 <b>Статистика бота:</b>\n"]
 
+    # Все счетчики поддерживаются триггерами в одной строке stats_counters (см. Database._init_counters)
+    (users_count, admins_count, channels_count,
+     posts_total_count, posts_scheduled, posts_publishing, posts_published, posts_failed, posts_cancelled,
+     posts_missed, posts_held,
+     templates_total_count, templates_common, templates_personal) = await db.fetchone(
+        """SELECT users_total, users_admins, channels_total,
+                  posts_total, posts_scheduled, posts_publishing, posts_published, posts_failed, posts_cancelled,
+                  posts_missed, posts_held,
+                  templates_total, templates_common, templates_personal
+           FROM stats_counters WHERE id = 1"""
+    )
+
     # Пользователи
-    users_count = db.fetchone("SELECT COUNT(*) FROM bot_users")[0]
-    admins_count = db.fetchone("SELECT COUNT(*) FROM bot_users WHERE is_admin = TRUE")[0]
     stats_text_parts.append(f"<b>Пользователи:</b>")
     stats_text_parts.append(f"  ▫️ Всего зарегистрировано: {users_count}")
     stats_text_parts.append(f"  ▫️ Из них администраторов бота: {admins_count}\n")
 
     # Каналы
-    channels_count = db.fetchone("SELECT COUNT(*) FROM channels")[0]
     stats_text_parts.append(f"<b>Каналы:</b>")
     stats_text_parts.append(f"  ▫️ Всего подключено каналов: {channels_count}\n")
 
     # Посты
-    posts_total_count = db.fetchone("SELECT COUNT(*) FROM posts")[0]
-    posts_scheduled = db.fetchone("SELECT COUNT(*) FROM posts WHERE status = 'scheduled'")[0]
-    posts_published = db.fetchone("SELECT COUNT(*) FROM posts WHERE status = 'published'")[0]
-    posts_failed = db.fetchone("SELECT COUNT(*) FROM posts WHERE status = 'failed'")[0]
-    posts_cancelled = db.fetchone("SELECT COUNT(*) FROM posts WHERE status = 'cancelled'")[0]
     stats_text_parts.append(f"<b>Посты:</b>")
     stats_text_parts.append(f"  ▫️ Всего постов в системе: {posts_total_count}")
     stats_text_parts.append(f"  ▫️ Запланировано: {posts_scheduled}")
+    stats_text_parts.append(f"  ▫️ Публикуются сейчас: {posts_publishing}")
     stats_text_parts.append(f"  ▫️ Опубликовано: {posts_published}")
     stats_text_parts.append(f"  ▫️ Ошибок публикации: {posts_failed}")
-    stats_text_parts.append(f"  ▫️ Отменено пользователями: {posts_cancelled}\n")
+    stats_text_parts.append(f"  ▫️ Отменено пользователями: {posts_cancelled}")
+    stats_text_parts.append(f"  ▫️ Пропущено (бот был недоступен): {posts_missed}")
+    stats_text_parts.append(f"  ▫️ Снято с публикации фильтром: {posts_held}\n")
 
     # Шаблоны
-    templates_total_count = db.fetchone("SELECT COUNT(*) FROM templates")[0]
-    # COMMON_TEMPLATE_USER_ID = 0 (из handlers.templates, но лучше определить его в config или общем месте)
-    # Для простоты здесь используем 0 напрямую
-    templates_common = db.fetchone("SELECT COUNT(*) FROM templates WHERE user_id = 0")[0]
-    templates_personal = db.fetchone("SELECT COUNT(*) FROM templates WHERE user_id != 0")[0]
     stats_text_parts.append(f"<b>Шаблоны:</b>")
     stats_text_parts.append(f"  ▫️ Всего шаблонов: {templates_total_count}")
     stats_text_parts.append(f"  ▫️ Общих шаблонов: {templates_common}")
     stats_text_parts.append(f"  ▫️ Личных шаблонов: {templates_personal}\n")
 
-    # Можно добавить количество активных задач в APScheduler, если это нужно,
-    # но это требует доступа к `scheduler.get_jobs()` и их анализа.
+    # Ограничитель исходящих сообщений
+    limiter_stats = rate_limiter.stats()
+    stats_text_parts.append(f"<b>Отправка сообщений:</b>")
+    stats_text_parts.append(f"  ▫️ Ожидают отправки сейчас: {limiter_stats['waiting']} (максимум: {limiter_stats['max_waiting']})")
+    stats_text_parts.append(f"  ▫️ Отправлено / задержано лимитером: {limiter_stats['acquired']} / {limiter_stats['delayed']}")
+    stats_text_parts.append(f"  ▫️ Среднее / максимальное ожидание: {limiter_stats['avg_wait']:.2f} / {limiter_stats['max_wait']:.2f} с\n")
+
+    # Пул воркеров публикации по полосам
+    stats_text_parts.append(f"<b>Пул публикации:</b>")
+    for lane, lane_stats in publisher_pool.stats().items():
+        stats_text_parts.append(
+            f"  ▫️ {lane}: в очереди {lane_stats['queued']}, выполнено {lane_stats['served']} "
+            f"(ошибок {lane_stats['failed']}, отложено по лимиту чата {lane_stats['deferred']}), ожидание {lane_stats['wait_avg']:.2f} / {lane_stats['wait_max']:.2f} с, "
+            f"выполнение {lane_stats['service_avg']:.2f} / {lane_stats['service_max']:.2f} с")
+
+    # Кэш результатов фильтра контента
+    cache_stats = content_filter.cache_stats()
+    stats_text_parts.append(f"\n<b>Кэш фильтра контента:</b>")
+    stats_text_parts.append(f"  ▫️ Записей: {cache_stats['entries']} (~{cache_stats['bytes'] // 1024} КБ), версия списка: {cache_stats['version']}")
+    stats_text_parts.append(f"  ▫️ Попаданий / промахов: {cache_stats['hits']} / {cache_stats['misses']} ({cache_stats['hit_rate']:.0%})")
+    stats_text_parts.append(f"  ▫️ Вытеснено: {cache_stats['evictions']}")
+
+    # Автоматы списков каналов и пользователей
+    scoped_stats = scoped_words.stats()
+    stats_text_parts.append(f"\n<b>Списки каналов и пользователей:</b>")
+    stats_text_parts.append(f"  ▫️ Областей в памяти: {scoped_stats['entries']} (~{scoped_stats['bytes'] // 1024} КБ), загрузок из БД: {scoped_stats['loads']}")
+    stats_text_parts.append(f"  ▫️ Попаданий / промахов: {scoped_stats['hits']} / {scoped_stats['misses']}, вытеснено: {scoped_stats['evictions']}")
+
+    # Разобранные шаблоны
+    template_stats = template_cache.stats()
+    stats_text_parts.append(f"\n<b>Кэш шаблонов:</b>")
+    stats_text_parts.append(f"  ▫️ Шаблонов в памяти: {template_stats['entries']}, попаданий / промахов: {template_stats['hits']} / {template_stats['misses']} ({template_stats['hit_rate']:.0%})")
 
     await message.answer("\n".join(stats_text_parts), parse_mode="HTML")
 
 
+@router.message(Command("admin_stats_rebuild"))
+async def admin_stats_rebuild(message: types.Message):
+    # Полный пересчет счетчиков статистики и пагинации (например, после ручных правок БД)
+    db = get_db()
+    try:
+        await db.rebuild_counters()
+    except Exception:
+        await message.answer("❌ Не удалось пересчитать счетчики статистики. Проверьте логи.")
+        return
+    await message.answer("✅ Счетчики статистики пересчитаны. Используйте /admin_stats для просмотра.")
+
+
 @router.message(Command("list_users"))
 async def admin_list_users(message: types.Message, command: CommandObject):
     db = get_db()
@@ -155,7 +341,7 @@ async def admin_list_users(message: types.Message, command: CommandObject):
             limit = 50
             await message.answer("ℹ️ Максимальное количество пользователей для вывода ограничено до 50.")
 
-    users_data = db.fetchall(
+    users_data = await db.fetchall(
         """SELECT user_id, username, first_name, is_admin, created_at
            FROM bot_users
            ORDER BY created_at DESC LIMIT ?""",
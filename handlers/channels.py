@@ -56,7 +56,7 @@ async def handle_forwarded_channel_message(message: types.Message, bot: Bot):  #
         return
 
     try:
-        db.execute(
+        await db.execute(
             "INSERT INTO channels (user_id, channel_id, title) VALUES (?, ?, ?)",
             (user_id_who_adds, channel_id_telegram, channel_title),  # Сохраняем оригинальный title
             commit=True
@@ -79,7 +79,7 @@ async def list_my_channels(message: types.Message):
     db = get_db()
     current_user_id = message.from_user.id
 
-    channels_data = db.fetchall(
+    channels_data = await db.fetchall(
         "SELECT id, channel_id, title FROM channels WHERE user_id = ? ORDER BY title",
         (current_user_id,)
     )
@@ -113,7 +113,7 @@ async def confirm_delete_channel(callback: types.CallbackQuery):
     db = get_db()
 
     # Проверяем, что канал принадлежит этому пользователю
-    channel_info = db.fetchone(
+    channel_info = await db.fetchone(
         "SELECT title FROM channels WHERE id = ? AND user_id = ?",
         (db_channel_id_to_delete, current_user_id)
     )
@@ -164,7 +164,7 @@ async def process_delete_channel(callback: types.CallbackQuery):
     db = get_db()
 
     # Еще раз проверяем принадлежность канала перед удалением
-    channel_info = db.fetchone(
+    channel_info = await db.fetchone(
         "SELECT title FROM channels WHERE id = ? AND user_id = ?",
         (db_channel_id_to_delete, current_user_id)
     )
@@ -185,12 +185,12 @@ async def process_delete_channel(callback: types.CallbackQuery):
         # мы не сможем получить его название из `channels` через JOIN. Это нужно будет учесть в `history.py`.
         # Пока просто удаляем канал из списка пользователя.
 
-        db.execute(
+        cursor = await db.execute(
             "DELETE FROM channels WHERE id = ? AND user_id = ?",
             (db_channel_id_to_delete, current_user_id),
             commit=True
         )
-        if db.cursor.rowcount > 0:
+        if cursor.rowcount > 0:
             logger.info(f"User {current_user_id} deleted channel {channel_title} (DB ID {db_channel_id_to_delete})")
             await callback.message.edit_text(f"✅ Канал «{escaped_channel_title}» успешно удален из вашего списка.",
                                              reply_markup=None, parse_mode="HTML")
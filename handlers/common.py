@@ -18,7 +18,7 @@ async def cmd_start(message: types.Message, state: FSMContext):
     db = get_db()
     user = message.from_user
     try:
-        db.upsert_user(
+        await db.upsert_user(
             user_id=user.id,
             username=user.username,
             first_name=user.first_name,
@@ -85,9 +85,14 @@ async def cmd_help(message: types.Message):
         help_text_parts.extend([
             "\n👑 <b>Команды Супер-Администратора:</b>\n",
             "▫️ /add_banned_word <i>слово</i> - Добавить слово в глобальный черный список.",
+            "▫️ /add_banned_words <i>слова</i> - Добавить много слов сразу (через пробел, запятую или .txt-файлом).",
             "▫️ /remove_banned_word <i>слово</i> - Удалить слово из черного списка.",
-            "▫️ /list_banned_words - Показать текущий черный список слов.\n",
+            "▫️ /list_banned_words - Показать текущий черный список слов.",
+            "▫️ /add_scope_words <i>channel|user ID слова</i> - Добавить слова в список отдельного канала или пользователя.",
+            "▫️ /remove_scope_word <i>channel|user ID слово</i> - Удалить слово из такого списка.",
+            "▫️ /list_scope_words <i>channel|user ID</i> - Показать список канала или пользователя.\n",
             "▫️ /admin_stats - Показать статистику использования бота.",
+            "▫️ /admin_stats_rebuild - Пересчитать счетчики статистики по данным БД.",
             "▫️ /list_users <i>N</i> - Показать последних N зарегистрированных пользователей (по умолчанию 10)."
         ])
 
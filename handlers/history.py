@@ -1,12 +1,14 @@
 import sqlite3
 from datetime import datetime
 from aiogram import Router, types, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import logging
 
 from loader import get_db
 from bot_utils import get_main_keyboard, escape_html
+from services.media import media_label
 
 router = Router()
 logger = logging.getLogger(__name__)  # Используем логгер из logging
@@ -20,37 +22,74 @@ async def show_history_command(message: types.Message):
     await display_history_page(message, page=0)
 
 
-async def display_history_page(message_or_callback: types.Message | types.CallbackQuery, page: int):
+async def display_history_page(message_or_callback: types.Message | types.CallbackQuery, page: int,
+                               direction: str | None = None, anchor: tuple[str, int] | None = None):
+    """
+    Показывает страницу истории. Пагинация по ключу (publish_time, id):
+    direction='n' - посты старше anchor, direction='p' - новее, None - первая страница.
+    Ключ граничного поста передается целиком, поэтому удаление этого поста не ломает переход.
+    Стоимость любой страницы одинакова, в отличие от LIMIT/OFFSET.
+    """
     db = get_db()
     current_user_id = message_or_callback.from_user.id
-    offset = page * POSTS_PER_PAGE
 
     try:
-        # Считаем общее количество постов для пагинации ДЛЯ ТЕКУЩЕГО ПОЛЬЗОВАТЕЛЯ
-        total_posts_query = db.fetchone(
-            "SELECT COUNT(*) FROM posts WHERE user_id = ?",
+        # Общее количество постов берем из счетчика, поддерживаемого триггерами, а не COUNT(*)
+        total_posts_query = await db.fetchone(
+            "SELECT posts_total FROM user_post_counters WHERE user_id = ?",
             (current_user_id,)
         )
         total_posts = total_posts_query[0] if total_posts_query else 0
 
         # Запрос постов для текущей страницы ДЛЯ ТЕКУЩЕГО ПОЛЬЗОВАТЕЛЯ
         # Используем LEFT JOIN, чтобы получить посты, даже если канал был удален из списка пользователя
-        posts_data = db.fetchall(
-            f"""SELECT 
+        # Берем на одну запись больше, чтобы понять, есть ли следующая страница в этом направлении
+        select_sql = """SELECT 
                 p.id, 
                 ch.title,        -- Название канала из таблицы channels (может быть NULL)
                 p.content, 
                 p.publish_time, 
                 p.status,
                 p.message_id,    -- ID сообщения в канале
-                p.channel_id     -- Telegram ID канала из таблицы posts
+                p.channel_id,    -- Telegram ID канала из таблицы posts
+                p.media_type,
+                CASE WHEN p.media_type = 'album' THEN json_array_length(p.media) END  -- Размер альбома
             FROM posts p
             LEFT JOIN channels ch ON p.channel_id = ch.channel_id AND p.user_id = ch.user_id 
-            WHERE p.user_id = ?
-            ORDER BY p.publish_time DESC 
-            LIMIT ? OFFSET ?""",
-            (current_user_id, POSTS_PER_PAGE, offset)
-        )
+            WHERE p.user_id = ?"""
+        if direction == "n" and anchor is not None:
+            posts_data = await db.fetchall(
+                f"""{select_sql} AND (p.publish_time, p.id) < (?, ?)
+                ORDER BY p.publish_time DESC, p.id DESC
+                LIMIT ?""",
+                (current_user_id, *anchor, POSTS_PER_PAGE + 1)
+            )
+            has_more = len(posts_data) > POSTS_PER_PAGE
+            posts_data = posts_data[:POSTS_PER_PAGE]
+            has_newer, has_older = page > 0, has_more
+        elif direction == "p" and anchor is not None:
+            posts_data = await db.fetchall(
+                f"""{select_sql} AND (p.publish_time, p.id) > (?, ?)
+                ORDER BY p.publish_time ASC, p.id ASC
+                LIMIT ?""",
+                (current_user_id, *anchor, POSTS_PER_PAGE + 1)
+            )
+            has_more = len(posts_data) > POSTS_PER_PAGE
+            posts_data = list(reversed(posts_data[:POSTS_PER_PAGE]))
+            has_newer, has_older = has_more, True
+            if not has_more:
+                page = 0  # Дошли до самых новых постов
+        else:
+            page = 0
+            posts_data = await db.fetchall(
+                f"""{select_sql}
+                ORDER BY p.publish_time DESC, p.id DESC
+                LIMIT ?""",
+                (current_user_id, POSTS_PER_PAGE + 1)
+            )
+            has_more = len(posts_data) > POSTS_PER_PAGE
+            posts_data = posts_data[:POSTS_PER_PAGE]
+            has_newer, has_older = False, has_more
 
         if not posts_data and page == 0:
             response_text = "📭 Ваша история публикаций пуста."
@@ -66,8 +105,7 @@ async def display_history_page(message_or_callback: types.Message | types.Callba
         if not posts_data and page > 0:
             response_text = "📭 Больше нет записей в вашей истории."
             builder = InlineKeyboardBuilder()
-            if page > 0:  # Кнопка назад всегда должна быть, если page > 0
-                builder.button(text="⬅️ Назад", callback_data=f"history_page_{page - 1}")
+            builder.button(text="⬅️ В начало", callback_data="history_page_0")
             builder.button(text="🏠 В меню", callback_data="history_to_main_menu")  # Общая кнопка в меню
             reply_markup = builder.as_markup()
 
@@ -77,8 +115,10 @@ async def display_history_page(message_or_callback: types.Message | types.Callba
             # Для message такой ситуации (page > 0 и нет постов) быть не должно, т.к. history_page вызывается только из коллбэка
             return
 
-        response_parts = [f"📜 <b>Ваша история публикаций (Страница {page + 1}):</b>\n"]
-        for post_id, ch_title_from_db, content, pub_time_iso, status, msg_id, ch_id_tg_from_post in posts_data:
+        total_pages = max(1, (total_posts + POSTS_PER_PAGE - 1) // POSTS_PER_PAGE)
+        response_parts = [f"📜 <b>Ваша история публикаций (Страница {min(page + 1, total_pages)} из {total_pages}):</b>\n"]
+        for (post_id, ch_title_from_db, content, pub_time_iso, status, msg_id, ch_id_tg_from_post, media_type,
+             album_size) in posts_data:
 
             safe_content_preview = escape_html(
                 content[:70] + "..." if content and len(content) > 70 else (content or "[Без текста]")
@@ -86,9 +126,11 @@ async def display_history_page(message_or_callback: types.Message | types.Callba
 
             publish_time_dt = datetime.fromisoformat(pub_time_iso)
             publish_time_str = escape_html(publish_time_dt.strftime('%d.%m.%Y %H:%M'))
+            media_line = f"📎 <b>Медиа:</b> {media_label(media_type, album_size)}\n" if media_type else ""
 
             status_emoji = {
-                "published": "✅", "scheduled": "⏳", "failed": "❌", "cancelled": "🚫"
+                "published": "✅", "scheduled": "⏳", "publishing": "📤", "failed": "❌", "cancelled": "🚫", "missed": "⏰",
+                "held": "🛑"
             }.get(status, "❓")
             safe_status_capitalized = escape_html(status.capitalize())
 
@@ -112,18 +154,21 @@ async def display_history_page(message_or_callback: types.Message | types.Callba
                 f"📢 <b>Канал:</b> {safe_ch_title_display}\n"
                 f"⏰ <b>Время:</b> {publish_time_str}\n"
                 f"📝 <b>Текст:</b> {safe_content_preview}\n"
+                f"{media_line}"
                 f"🔸 <b>Статус:</b> {status_emoji} {safe_status_capitalized}{post_link_html}\n"
             )
 
         response_text = "\n".join(response_parts)
         builder = InlineKeyboardBuilder()
         row_buttons = []
-        if page > 0:
-            row_buttons.append(types.InlineKeyboardButton(text="⬅️ Пред.", callback_data=f"history_page_{page - 1}"))
-
-        total_pages = (total_posts + POSTS_PER_PAGE - 1) // POSTS_PER_PAGE
-        if page < total_pages - 1:
-            row_buttons.append(types.InlineKeyboardButton(text="След. ➡️", callback_data=f"history_page_{page + 1}"))
+        # В callback_data кодируем номер страницы, направление и ключ (publish_time, id) граничного поста текущей страницы
+        first_post, last_post = posts_data[0], posts_data[-1]
+        if has_newer:
+            row_buttons.append(types.InlineKeyboardButton(
+                text="⬅️ Пред.", callback_data=f"history_page_{page - 1}_p_{first_post[3]}_{first_post[0]}"))
+        if has_older:
+            row_buttons.append(types.InlineKeyboardButton(
+                text="След. ➡️", callback_data=f"history_page_{page + 1}_n_{last_post[3]}_{last_post[0]}"))
 
         if row_buttons:
             builder.row(*row_buttons)
@@ -138,7 +183,7 @@ async def display_history_page(message_or_callback: types.Message | types.Callba
             try:
                 await message_or_callback.message.edit_text(response_text, reply_markup=builder.as_markup(),
                                                             parse_mode=parse_mode_to_use, disable_web_page_preview=True)
-            except types.TelegramBadRequest as e:
+            except TelegramBadRequest as e:
                 if "message is not modified" in str(e).lower():
                     logger.debug("Message not modified in history page display.")
                 else:
@@ -166,8 +211,14 @@ async def display_history_page(message_or_callback: types.Message | types.Callba
 # Обработчик для кнопок пагинации истории
 @router.callback_query(F.data.startswith("history_page_"))
 async def process_history_page_callback(callback: types.CallbackQuery):
-    page = int(callback.data.split("_")[2])
-    await display_history_page(callback, page=page)
+    # history_page_{page}_{n|p}_{publish_time}_{post_id} (в ISO-времени нет "_");
+    # кнопки прежних форматов (history_page_{page} и history_page_{page}_{n|p}_{post_id}) ведут на первую страницу
+    parts = callback.data.split("_")
+    if len(parts) == 6:
+        await display_history_page(callback, page=int(parts[2]), direction=parts[3],
+                                   anchor=(parts[4], int(parts[5])))
+    else:
+        await display_history_page(callback, page=0)
 
 
 # Обработчик для кнопки "В меню" из истории
@@ -1,22 +1,29 @@
+import asyncio
 import logging
 import re
+from uuid import uuid4
 from datetime import datetime, timedelta
 from aiogram import Router, F, types, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import sqlite3
 
-from loader import get_db, scheduler, content_filter
-from bot_utils import get_main_keyboard, get_channels_keyboard, notify_user, notify_post_published, escape_html
+from loader import get_db
+from bot_utils import get_main_keyboard, get_channels_keyboard, escape_html
+from services.media import (album_collector, message_media, pack_album, unpack_album, album_input_media,
+                            MEDIA_TYPE_ALBUM, ALBUM_MAX_ITEMS)
 from post_states import PostCreation
-from services.scheduler import add_scheduled_job
+from services.scoped_words import scoped_words
+from services.template_cache import template_cache, render_template
+from services.scheduler import (publisher_pool, publish_dispatcher, publish_claimed_post, build_publish_report,
+                               lease_deadline, hold_leases, LANE_INTERACTIVE, PUBLISHER_ID, CLAIMED_POST_COLUMNS)
 
 router = Router()
 logger = logging.getLogger(__name__)
 
-# Регулярное выражение для поиска переменных вида {[имя]}
-CUSTOM_VAR_REGEX = re.compile(r"{\[([^\]\[{}]+)\]}")
+SELECT_CHANNELS_PROMPT = "📌 В какие из ваших каналов будем публиковать? Отметьте один или несколько и нажмите «Готово»."
 
 
 # Автоматические переменные полностью убираем из этой логики.
@@ -28,7 +35,7 @@ async def start_post_creation(message: types.Message, state: FSMContext):
     db = get_db()
     current_user_id = message.from_user.id
 
-    channels_count_data = db.fetchone(
+    channels_count_data = await db.fetchone(
         "SELECT COUNT(*) FROM channels WHERE user_id = ?", (current_user_id,)
     )
     channels_count = channels_count_data[0] if channels_count_data else 0
@@ -41,7 +48,7 @@ async def start_post_creation(message: types.Message, state: FSMContext):
         )
         return
 
-    templates_data = db.fetchall(
+    templates_data = await db.fetchall(
         "SELECT id, name, user_id FROM templates WHERE user_id = 0 OR user_id = ? ORDER BY user_id ASC, name ASC",
         (current_user_id,)
     )
@@ -76,10 +83,10 @@ async def start_post_creation(message: types.Message, state: FSMContext):
                                  reply_markup=get_main_keyboard())
             await state.clear()
             return
-        await message.answer("📌 В какой из ваших каналов будем публиковать?", reply_markup=channels_kb_markup)
+        await message.answer(SELECT_CHANNELS_PROMPT, reply_markup=channels_kb_markup)
         await state.set_state(PostCreation.SELECT_CHANNEL)
-        await state.update_data(template_id=None, raw_template_content=None, template_media_id=None,
-                                template_media_type=None,
+        await state.update_data(template_id=None, template_segments=None, template_media_id=None,
+                                template_media_type=None, selected_channel_ids=[],
                                 variables_values={})  # variables_values вместо custom_vars_values
 
 
@@ -88,31 +95,27 @@ async def process_template_selection(callback: types.CallbackQuery, state: FSMCo
     await callback.answer()
     template_id = int(callback.data.split("_")[3])
     current_user_id = callback.from_user.id
-    db = get_db()
-
-    template_data_row = db.fetchone(
-        "SELECT name, content, media, media_type FROM templates WHERE id = ? AND (user_id = 0 OR user_id = ?)",
-        (template_id, current_user_id)
-    )
 
-    if not template_data_row:
+    # Шаблон уже разобран на текст и переменные (services.template_cache), повторно не ищем их в тексте
+    template = await template_cache.get(template_id, current_user_id)
+    if template is None:
         await callback.message.edit_text("❌ Выбранный шаблон не найден или недоступен. Попробуйте еще раз.")
         return
 
-    tpl_name, tpl_content, tpl_media_id, tpl_media_type = template_data_row
-
-    found_variables = list(dict.fromkeys(CUSTOM_VAR_REGEX.findall(tpl_content or "")))
+    tpl_name = template.name
+    found_variables = template.variables
 
     await state.update_data(
         original_message_id=callback.message.message_id,  # Сохраняем ID сообщения с выбором шаблона
         template_id=template_id,
         template_name=tpl_name,
-        raw_template_content=tpl_content,
-        template_media_id=tpl_media_id,
-        template_media_type=tpl_media_type,
+        template_segments=template.segments,
+        template_media_id=template.media,
+        template_media_type=template.media_type,
         variables_to_fill=found_variables,
         current_variable_index=0,
-        variables_values={}
+        variables_values={},
+        selected_channel_ids=[]
     )
 
     if found_variables:
@@ -135,7 +138,7 @@ async def process_template_selection(callback: types.CallbackQuery, state: FSMCo
             await state.clear()
             return
         # Это сообщение будет новым
-        await callback.message.answer("📌 В какой из ваших каналов будем публиковать?", reply_markup=channels_kb_markup)
+        await callback.message.answer(SELECT_CHANNELS_PROMPT, reply_markup=channels_kb_markup)
         await state.set_state(PostCreation.SELECT_CHANNEL)
 
 
@@ -145,8 +148,8 @@ async def process_no_template(callback: types.CallbackQuery, state: FSMContext):
     current_user_id = callback.from_user.id
     await state.update_data(
         original_message_id=callback.message.message_id,
-        template_id=None, raw_template_content=None, template_media_id=None,
-        template_media_type=None, variables_values={}
+        template_id=None, template_segments=None, template_media_id=None,
+        template_media_type=None, variables_values={}, selected_channel_ids=[]
     )
 
     channels_kb_markup = await get_channels_keyboard(user_id=current_user_id)
@@ -155,7 +158,7 @@ async def process_no_template(callback: types.CallbackQuery, state: FSMContext):
                                       reply_markup=get_main_keyboard())
         await state.clear()
         return
-    await callback.message.edit_text("📌 Шаблон не используется. В какой из ваших каналов будем публиковать?",
+    await callback.message.edit_text(f"Шаблон не используется.\n{SELECT_CHANNELS_PROMPT}",
                                      reply_markup=channels_kb_markup)
     await state.set_state(PostCreation.SELECT_CHANNEL)
 
@@ -178,7 +181,8 @@ async def process_fill_custom_variable(message: types.Message, state: FSMContext
 
     var_name_being_filled = variables_to_fill[current_index]
 
-    found_banned_words = content_filter.check_text(user_input_value)
+    # Каналы еще не выбраны - проверяем по общему списку и списку пользователя
+    found_banned_words = await scoped_words.check_text(user_input_value, user_id=message.from_user.id)
     if found_banned_words:
         await message.answer(
             f"❌ В значении для переменной <code>{escape_html(var_name_being_filled)}</code> "
@@ -228,56 +232,75 @@ async def process_fill_custom_variable(message: types.Message, state: FSMContext
                                  reply_markup=get_main_keyboard())
             await state.clear()
             return
-        await message.answer("📌 В какой из ваших каналов будем публиковать?", reply_markup=channels_kb_markup)
+        await message.answer(SELECT_CHANNELS_PROMPT, reply_markup=channels_kb_markup)
         await state.set_state(PostCreation.SELECT_CHANNEL)
 
 
 @router.callback_query(F.data.startswith("channel_"), PostCreation.SELECT_CHANNEL)
-async def process_channel_selection(callback: types.CallbackQuery, state: FSMContext):
+async def process_channel_toggle(callback: types.CallbackQuery, state: FSMContext):
+    await callback.answer()
+    toggled_channel_telegram_id = int(callback.data.split("_")[1])
+    fsm_data = await state.get_data()
+    selected_channel_ids = list(fsm_data.get("selected_channel_ids", []))
+    if toggled_channel_telegram_id in selected_channel_ids:
+        selected_channel_ids.remove(toggled_channel_telegram_id)
+    else:
+        selected_channel_ids.append(toggled_channel_telegram_id)
+    await state.update_data(selected_channel_ids=selected_channel_ids)
+
+    channels_kb_markup = await get_channels_keyboard(user_id=callback.from_user.id,
+                                                     selected_channel_ids=selected_channel_ids)
+    try:
+        await callback.message.edit_reply_markup(reply_markup=channels_kb_markup)
+    except TelegramBadRequest as e_edit:  # Двойное нажатие: клавиатура не изменилась
+        logger.warning(f"Не удалось обновить клавиатуру выбора каналов: {e_edit}")
+
+
+@router.callback_query(F.data == "channels_done", PostCreation.SELECT_CHANNEL)
+async def process_channels_done(callback: types.CallbackQuery, state: FSMContext):
+    fsm_data = await state.get_data()
+    selected_channel_ids = fsm_data.get("selected_channel_ids", [])
+    if not selected_channel_ids:
+        await callback.answer("Отметьте хотя бы один канал.", show_alert=True)
+        return
     await callback.answer()
-    selected_channel_telegram_id = int(callback.data.split("_")[1])
     current_user_id = callback.from_user.id
     db = get_db()
 
-    channel_data_row = db.fetchone(
-        "SELECT title FROM channels WHERE channel_id = ? AND user_id = ?",
-        (selected_channel_telegram_id, current_user_id)
+    # Каналы могли удалить, пока пользователь выбирал: берем только те, что еще есть у него в списке
+    channels_data = await db.fetchall(
+        f"""SELECT channel_id, title FROM channels
+            WHERE user_id = ? AND channel_id IN ({', '.join('?' * len(selected_channel_ids))})
+            ORDER BY title""",
+        (current_user_id, *selected_channel_ids)
     )
 
-    if not channel_data_row:
+    if not channels_data:
         # Редактируем сообщение с выбором канала
         await callback.message.edit_text(
-            "❌ Выбранный канал не найден в вашем списке или недоступен. Попробуйте еще раз.")
+            "❌ Выбранные каналы не найдены в вашем списке или недоступны. Попробуйте еще раз.")
         return
 
-    channel_title = channel_data_row[0]
-    escaped_channel_title = escape_html(channel_title)
-    await state.update_data(
-        selected_channel_id=selected_channel_telegram_id,
-        selected_channel_title=channel_title
-    )
+    await state.update_data(selected_channels=[[cid, title] for cid, title in channels_data])
+    if len(channels_data) == 1:
+        channels_selected_text = f"✅ Канал «{escape_html(channels_data[0][1])}» выбран.\n"
+    else:
+        channels_selected_text = (f"✅ Выбрано каналов: {len(channels_data)} "
+                                  f"({escape_html(', '.join(title for _, title in channels_data))}).\n")
 
     fsm_data = await state.get_data()
     final_post_text = ""  # Будет сформирован здесь
 
     if fsm_data.get('template_id') is not None:
-        raw_template_content = fsm_data.get('raw_template_content', '')
         variables_values = fsm_data.get('variables_values', {})
 
-        processed_text = raw_template_content
-        for var_name, var_value in variables_values.items():
-            # Пользовательский ввод для переменных уже проверен на banned_words и должен быть безопасен
-            # Экранировать здесь var_value не нужно, если мы хотим, чтобы пользователь мог вставлять HTML в переменные
-            # Но если мы хотим обезопасить вывод, то лучше var_value экранировать.
-            # Пока оставим без экранирования var_value, предполагая, что пользователь знает, что делает,
-            # или мы полагаемся на проверку content_filter для var_value.
-            processed_text = processed_text.replace(f"{{[{var_name}]}}", var_value)
-            # Убрал escape_html(var_value) для возможности HTML в переменных
-
-        final_post_text = processed_text
+        # Пользовательский ввод для переменных уже проверен на banned_words и подставляется без экранирования,
+        # чтобы в переменных можно было использовать HTML. Подстановка - один проход по сегментам шаблона.
+        final_post_text = render_template(fsm_data.get('template_segments') or [""], variables_values)
 
         # Проверка итогового текста на запрещенные слова
-        found_banned_final = content_filter.check_text(final_post_text)
+        found_banned_final = await scoped_words.check_text(
+            final_post_text, [cid for cid, _ in channels_data], current_user_id)
         if found_banned_final:
             await callback.message.edit_text(  # Редактируем сообщение с выбором канала
                 f"❌ В тексте, сгенерированном из шаблона «{escape_html(fsm_data.get('template_name'))}» "
@@ -291,7 +314,7 @@ async def process_channel_selection(callback: types.CallbackQuery, state: FSMCon
 
         await state.update_data(final_post_content=final_post_text)
 
-        msg_text_after_channel_select = f"✅ Канал «{escaped_channel_title}» выбран.\n"
+        msg_text_after_channel_select = channels_selected_text
         if fsm_data.get('template_media_id'):
             await state.update_data(
                 final_post_media_id=fsm_data.get('template_media_id'),
@@ -302,7 +325,7 @@ async def process_channel_selection(callback: types.CallbackQuery, state: FSMCon
             await state.set_state(PostCreation.SCHEDULE)
         else:
             msg_text_after_channel_select += "Будет использован текст из шаблона (с вашими данными).\n"
-            msg_text_after_channel_select += "📎 Хотите добавить фото/видео к этому посту? Отправьте его или нажмите /skip_media."
+            msg_text_after_channel_select += "📎 Хотите добавить фото/видео или альбом к этому посту? Отправьте его или нажмите /skip_media."
             await state.set_state(PostCreation.MEDIA)
 
         # Редактируем сообщение с выбором канала
@@ -311,7 +334,7 @@ async def process_channel_selection(callback: types.CallbackQuery, state: FSMCon
 
     else:  # Если шаблон НЕ использовался (ручной ввод)
         # Редактируем сообщение с выбором канала
-        await callback.message.edit_text(f"✅ Канал «{escaped_channel_title}» выбран.\n"
+        await callback.message.edit_text(f"{channels_selected_text}"
                                          "📝 Теперь введите текст для вашего поста:",
                                          parse_mode="HTML", reply_markup=None)  # Убираем кнопки выбора канала
         await state.set_state(PostCreation.CONTENT)
@@ -326,7 +349,9 @@ async def process_post_content(message: types.Message, state: FSMContext):
     except:
         pass
 
-    found_banned_words = content_filter.check_text(post_text)
+    fsm_data = await state.get_data()
+    found_banned_words = await scoped_words.check_text(
+        post_text, [cid for cid, _ in fsm_data.get('selected_channels', [])], message.from_user.id)
     if found_banned_words:
         await message.answer(  # Отправляем новое сообщение
             f"❌ В вашем тексте обнаружены запрещенные слова:\n"
@@ -337,30 +362,36 @@ async def process_post_content(message: types.Message, state: FSMContext):
         return  # Остаемся в состоянии CONTENT, ждем новый ввод
 
     await state.update_data(final_post_content=post_text)  # Здесь нет авто-переменных
-    await message.answer("📎 Текст принят. Хотите добавить фото/видео? Отправьте его или нажмите /skip_media.")
+    await message.answer("📎 Текст принят. Хотите добавить фото/видео или альбом? Отправьте его или нажмите /skip_media.")
     await state.set_state(PostCreation.MEDIA)
 
 
 @router.message(PostCreation.MEDIA, F.photo | F.video)
 async def process_post_media(message: types.Message, state: FSMContext):
-    media_id = None
-    media_type = None
-    if message.photo:
-        media_id = message.photo[-1].file_id
-        media_type = "photo"
-    elif message.video:
-        media_id = message.video.file_id
-        media_type = "video"
-
-    if not media_id:
+    album_messages = [message]
+    if message.media_group_id:  # Альбом приходит несколькими сообщениями - обрабатываем его целиком один раз
+        album_messages = await album_collector.collect(message)
+        if album_messages is None:
+            return
+
+    media_items = [item for item in map(message_media, album_messages) if item]
+    if not media_items:
         await message.answer("❌ Не удалось распознать медиа. Попробуйте еще раз или /skip_media.")
         return
 
-    # Удаляем сообщение пользователя с медиа
-    try:
-        await message.delete()
-    except:
-        pass
+    # Удаляем сообщения пользователя с медиа
+    for album_message in album_messages:
+        try:
+            await album_message.delete()
+        except:
+            pass
+
+    if len(media_items) > 1:
+        media_type, media_id = MEDIA_TYPE_ALBUM, pack_album(media_items)
+        if len(media_items) > ALBUM_MAX_ITEMS:
+            await message.answer(f"⚠️ В альбоме может быть не больше {ALBUM_MAX_ITEMS} файлов, лишние не будут опубликованы.")
+    else:
+        media_type, media_id = media_items[0]
 
     await state.update_data(final_post_media_id=media_id, final_post_media_type=media_type)
     await message.answer("✅ Медиа добавлено.\n"
@@ -411,7 +442,8 @@ async def process_schedule_time(message: types.Message, state: FSMContext):
     text_for_preview = current_data.get('final_post_content', "[Нет текста]")
 
     # Финальная проверка на запрещенные слова еще раз (на всякий случай, если что-то изменилось)
-    found_banned_preview = content_filter.check_text(text_for_preview)
+    found_banned_preview = await scoped_words.check_text(
+        text_for_preview, [cid for cid, _ in current_data.get('selected_channels', [])], message.from_user.id)
     if found_banned_preview:
         await message.answer(
             f"❌ В итоговом тексте поста обнаружены запрещенные слова:\n"
@@ -422,14 +454,15 @@ async def process_schedule_time(message: types.Message, state: FSMContext):
         await state.clear()
         return
 
-    channel_title_for_preview = escape_html(current_data.get('selected_channel_title', "Неизвестный канал"))
+    selected_channels = current_data.get('selected_channels', [])
+    channels_for_preview = escape_html(", ".join(title for _, title in selected_channels) or "Неизвестный канал")
     publish_time_str_for_preview = escape_html(publish_time_dt.strftime('%d.%m.%Y %H:%M'))
     final_media_id = current_data.get('final_post_media_id')
     final_media_type = current_data.get('final_post_media_type')
 
     preview_caption_parts = [
         f"✨ <b>ПРЕДПРОСМОТР ПОСТА</b> ✨\n",
-        f"📢 <b>Канал:</b> {channel_title_for_preview}",
+        f"📢 <b>{'Каналы' if len(selected_channels) > 1 else 'Канал'}:</b> {channels_for_preview}",
         f"⏰ <b>Время публикации:</b> {publish_time_str_for_preview}",
         f"\n📝 <b>Текст поста:</b>\n{text_for_preview}"
     ]
@@ -446,7 +479,12 @@ async def process_schedule_time(message: types.Message, state: FSMContext):
     try:
         # Отправляем предпросмотр как НОВОЕ сообщение
         if final_media_id:
-            if final_media_type == "photo":
+            if final_media_type == MEDIA_TYPE_ALBUM:
+                # У альбома не может быть кнопок: показываем его отдельно, а текст с кнопками - следом
+                await message.answer_media_group(media=album_input_media(unpack_album(final_media_id)))
+                sent_preview_message = await message.answer(preview_caption, reply_markup=confirm_kb.as_markup(),
+                                                            parse_mode=parse_mode_to_use)
+            elif final_media_type == "photo":
                 sent_preview_message = await message.answer_photo(photo=final_media_id, caption=preview_caption,
                                                                   reply_markup=confirm_kb.as_markup(),
                                                                   parse_mode=parse_mode_to_use)
@@ -502,7 +540,7 @@ async def process_post_confirmation(callback: types.CallbackQuery, state: FSMCon
             else:
                 await bot.edit_message_text(text=callback.message.text, chat_id=callback.message.chat.id,
                                             message_id=preview_message_id, reply_markup=None)
-        except types.TelegramBadRequest as e_edit_preview:
+        except TelegramBadRequest as e_edit_preview:
             if "message to edit not found" in str(e_edit_preview).lower() or "message can't be edited" in str(
                     e_edit_preview).lower() or "message is not modified" in str(e_edit_preview).lower():
                 logger.warning(f"Не удалось убрать кнопки у предпросмотра (ID: {preview_message_id}): {e_edit_preview}")
@@ -532,79 +570,59 @@ async def process_post_confirmation(callback: types.CallbackQuery, state: FSMCon
     current_data = fsm_data  # Используем уже полученные fsm_data
     db = get_db()
 
-    channel_telegram_id = current_data['selected_channel_id']
-    channel_title = current_data['selected_channel_title']
+    selected_channels = current_data['selected_channels']
     content_to_post = current_data.get('final_post_content', '')  # Текст УЖЕ ПОЛНОСТЬЮ ГОТОВ
     media_to_post = current_data.get('final_post_media_id')
     media_type_to_post = current_data.get('final_post_media_type')
     publish_time_iso_from_state = current_data['publish_time_iso']
     publish_time_dt = datetime.fromisoformat(publish_time_iso_from_state)
     user_id_creator = callback.from_user.id
-    post_status = "scheduled"
+    is_immediate = publish_time_dt <= datetime.now() + timedelta(seconds=20)
+    # Немедленный пост сразу сохраняем как 'publishing', чтобы диспетчер отложенных публикаций его не забрал
+    post_status = "publishing" if is_immediate else "scheduled"
+    lease_owner = PUBLISHER_ID if is_immediate else None
+    lease_until = lease_deadline().isoformat() if is_immediate else None
+    # Посты одной публикации в несколько каналов связаны group_id: по нему собирается общий отчет
+    group_id = uuid4().hex if len(selected_channels) > 1 else None
     message_to_user = ""
 
     try:
-        cursor = db.execute(
-            """INSERT INTO posts (user_id, channel_id, content, media, media_type, publish_time, status)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (user_id_creator, channel_telegram_id, content_to_post, media_to_post, media_type_to_post,
-             publish_time_iso_from_state, post_status),
-            commit=True
+        # Все каналы - одна вставка и одна транзакция: либо сохранены посты для всех каналов, либо ни одного
+        rows_values = [(user_id_creator, channel_telegram_id, content_to_post, media_to_post, media_type_to_post,
+                        publish_time_iso_from_state, post_status, lease_owner, lease_until, group_id)
+                       for channel_telegram_id, _ in selected_channels]
+        claimed_posts = await db.execute_returning(
+            f"""INSERT INTO posts (user_id, channel_id, content, media, media_type, publish_time, status,
+                                   lease_owner, lease_until, group_id)
+                VALUES {', '.join(['(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'] * len(rows_values))}
+                RETURNING {CLAIMED_POST_COLUMNS}""",
+            tuple(value for row_values in rows_values for value in row_values)
         )
-        post_db_id = cursor.lastrowid
+        post_db_ids = [row[0] for row in claimed_posts]
         logger.info(
-            f"Post (DB ID: {post_db_id}) by user {user_id_creator} for channel {channel_telegram_id} saved to DB with status 'scheduled'.")
-
-        if publish_time_dt <= datetime.now() + timedelta(seconds=20):
-            # (логика немедленной публикации остается такой же)
-            logger.info(f"Post (DB ID: {post_db_id}) is for immediate publication.")
-            published_message = None
-            try:
-                if media_to_post:
-                    if media_type_to_post == "photo":
-                        published_message = await bot.send_photo(chat_id=channel_telegram_id, photo=media_to_post,
-                                                                 caption=content_to_post, parse_mode="HTML")
-                    elif media_type_to_post == "video":
-                        published_message = await bot.send_video(chat_id=channel_telegram_id, video=media_to_post,
-                                                                 caption=content_to_post, parse_mode="HTML")
-                    else:
-                        published_message = await bot.send_message(chat_id=channel_telegram_id,
-                                                                   text=f"{content_to_post}\n[Медиафайл: {escape_html(media_to_post)}]",
-                                                                   parse_mode="HTML")
-                else:
-                    published_message = await bot.send_message(chat_id=channel_telegram_id, text=content_to_post,
-                                                               parse_mode="HTML")
-
-                post_status = "published"
-                message_id_in_channel = published_message.message_id if published_message else None
-                db.execute("UPDATE posts SET status = ?, message_id = ? WHERE id = ?",
-                           (post_status, message_id_in_channel, post_db_id), commit=True)
-                logger.info(
-                    f"Post (DB ID: {post_db_id}) published immediately. Channel Msg ID: {message_id_in_channel}")
-                message_to_user = "✅ Пост успешно опубликован немедленно!"
-                if message_id_in_channel:
-                    await notify_post_published(bot, user_id_creator, channel_telegram_id, message_id_in_channel,
-                                                channel_title)
-
-            except Exception as e_publish:
-                logger.error(f"Ошибка немедленной публикации поста ID {post_db_id}: {e_publish}", exc_info=True)
-                post_status = "failed"
-                db.execute("UPDATE posts SET status = ? WHERE id = ?", (post_status, post_db_id), commit=True)
-                message_to_user = f"❌ Ошибка немедленной публикации: {escape_html(str(e_publish))}"
+            f"Posts (DB IDs: {post_db_ids}) by user {user_id_creator} for {len(post_db_ids)} channel(s) saved to DB "
+            f"with status '{post_status}' (group: {group_id}).")
+
+        if is_immediate:
+            logger.info(f"Posts (DB IDs: {post_db_ids}) are for immediate publication.")
+            # Полоса interactive пула: не ждет, пока разойдется массовая публикация отложенных постов.
+            # Каналы публикуются параллельно; ошибки записывает publish_claimed_post (временные - с повтором),
+            # а пользователю уходит один отчет по всем каналам. Пока посты ждут лимита канала,
+            # их аренду продлевает диспетчер
+            hold_leases(claimed_posts)
+            await asyncio.gather(*(publisher_pool.run(LANE_INTERACTIVE, publish_claimed_post, post_row, bot, False,
+                                                      chat_id=post_row[2])
+                                   for post_row in claimed_posts))
+            message_to_user = await build_publish_report(post_ids=post_db_ids)
         else:
-            scheduler_data = {
-                'post_db_id': post_db_id, 'channel_id': channel_telegram_id, 'content': content_to_post,
-                'media': media_to_post, 'media_type': media_type_to_post,
-                'publish_time': publish_time_dt, 'user_id': user_id_creator, 'channel_title': channel_title
-            }
-            if add_scheduled_job(scheduler, bot, scheduler_data):
-                logger.info(f"Post (DB ID: {post_db_id}) scheduled for {publish_time_dt.strftime('%d.%m.%Y %H:%M')}.")
-                message_to_user = (f"✅ Пост запланирован на {publish_time_dt.strftime('%d.%m.%Y %H:%M')} "
-                                   f"в канал «{escape_html(channel_title)}».")
+            # Диспетчер мог уснуть до более позднего поста - будим, чтобы он пересчитал время сна
+            publish_dispatcher.wake()
+            logger.info(f"Posts (DB IDs: {post_db_ids}) scheduled for {publish_time_dt.strftime('%d.%m.%Y %H:%M')}.")
+            if len(selected_channels) == 1:
+                channels_text = f"в канал «{escape_html(selected_channels[0][1])}»"
             else:
-                logger.error(f"Failed to schedule post DB ID {post_db_id}. Setting status to 'failed'.")
-                db.execute("UPDATE posts SET status = 'failed' WHERE id = ?", (post_db_id,), commit=True)
-                message_to_user = "❌ Ошибка при планировании поста. Пост не будет опубликован. Попробуйте снова."
+                channels_text = f"в выбранные каналы ({len(selected_channels)})"
+            message_to_user = f"✅ Пост запланирован на {publish_time_dt.strftime('%d.%m.%Y %H:%M')} {channels_text}."
 
     except sqlite3.Error as e_db:
         logger.error(f"DB ошибка при подтверждении поста (user {user_id_creator}): {e_db}", exc_info=True)
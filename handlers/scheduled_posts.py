@@ -1,14 +1,15 @@
 import sqlite3
 from datetime import datetime
 from aiogram import Router, types, F, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import logging
 
-from loader import get_db, scheduler  # Импортируем scheduler
+from loader import get_db
 from bot_utils import get_main_keyboard, escape_html, notify_user
-from services.scheduler import remove_scheduled_job  # Импортируем функцию удаления задачи
+from services.media import media_label
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -22,34 +23,69 @@ async def show_scheduled_posts_command(message: types.Message):
     await display_scheduled_posts_page(message, page=0)
 
 
-async def display_scheduled_posts_page(message_or_callback: types.Message | types.CallbackQuery, page: int):
+async def display_scheduled_posts_page(message_or_callback: types.Message | types.CallbackQuery, page: int,
+                                       direction: str | None = None, anchor: tuple[str, int] | None = None):
+    """
+    Показывает страницу запланированных постов. Пагинация по ключу (publish_time, id), как в истории:
+    direction='n' - посты позже anchor, direction='p' - раньше, None - первая страница.
+    Граничный пост мог быть опубликован или отменен, поэтому его ключ приходит в callback_data, а не из БД.
+    """
     db = get_db()
     current_user_id = message_or_callback.from_user.id
-    offset = page * SCHEDULED_POSTS_PER_PAGE
 
     try:
-        # Считаем общее количество ЗАПЛАНИРОВАННЫХ постов для текущего пользователя
-        total_scheduled_posts_query = db.fetchone(
-            "SELECT COUNT(*) FROM posts WHERE user_id = ? AND status = 'scheduled'",
+        # Количество ЗАПЛАНИРОВАННЫХ постов пользователя берем из счетчика, поддерживаемого триггерами
+        total_scheduled_posts_query = await db.fetchone(
+            "SELECT posts_scheduled FROM user_post_counters WHERE user_id = ?",
             (current_user_id,)
         )
         total_scheduled_posts = total_scheduled_posts_query[0] if total_scheduled_posts_query else 0
 
-        # Запрос запланированных постов для текущей страницы
-        scheduled_posts_data = db.fetchall(
-            f"""SELECT 
+        # Запрос запланированных постов для текущей страницы (+1 запись, чтобы понять, есть ли продолжение)
+        select_sql = """SELECT 
                 p.id, 
                 ch.title, 
                 p.content, 
                 p.publish_time,
-                p.channel_id -- Telegram ID канала из таблицы posts
+                p.channel_id, -- Telegram ID канала из таблицы posts
+                p.media_type,
+                CASE WHEN p.media_type = 'album' THEN json_array_length(p.media) END -- Размер альбома
             FROM posts p
             LEFT JOIN channels ch ON p.channel_id = ch.channel_id AND p.user_id = ch.user_id
-            WHERE p.user_id = ? AND p.status = 'scheduled'
-            ORDER BY p.publish_time ASC -- Показываем ближайшие по времени сначала
-            LIMIT ? OFFSET ?""",
-            (current_user_id, SCHEDULED_POSTS_PER_PAGE, offset)
-        )
+            WHERE p.user_id = ? AND p.status = 'scheduled'"""
+        if direction == "n" and anchor is not None:
+            scheduled_posts_data = await db.fetchall(
+                f"""{select_sql} AND (p.publish_time, p.id) > (?, ?)
+                ORDER BY p.publish_time ASC, p.id ASC -- Показываем ближайшие по времени сначала
+                LIMIT ?""",
+                (current_user_id, *anchor, SCHEDULED_POSTS_PER_PAGE + 1)
+            )
+            has_more = len(scheduled_posts_data) > SCHEDULED_POSTS_PER_PAGE
+            scheduled_posts_data = scheduled_posts_data[:SCHEDULED_POSTS_PER_PAGE]
+            has_prev, has_next = page > 0, has_more
+        elif direction == "p" and anchor is not None:
+            scheduled_posts_data = await db.fetchall(
+                f"""{select_sql} AND (p.publish_time, p.id) < (?, ?)
+                ORDER BY p.publish_time DESC, p.id DESC
+                LIMIT ?""",
+                (current_user_id, *anchor, SCHEDULED_POSTS_PER_PAGE + 1)
+            )
+            has_more = len(scheduled_posts_data) > SCHEDULED_POSTS_PER_PAGE
+            scheduled_posts_data = list(reversed(scheduled_posts_data[:SCHEDULED_POSTS_PER_PAGE]))
+            has_prev, has_next = has_more, True
+            if not has_more:
+                page = 0  # Дошли до ближайших постов
+        else:
+            page = 0
+            scheduled_posts_data = await db.fetchall(
+                f"""{select_sql}
+                ORDER BY p.publish_time ASC, p.id ASC -- Показываем ближайшие по времени сначала
+                LIMIT ?""",
+                (current_user_id, SCHEDULED_POSTS_PER_PAGE + 1)
+            )
+            has_more = len(scheduled_posts_data) > SCHEDULED_POSTS_PER_PAGE
+            scheduled_posts_data = scheduled_posts_data[:SCHEDULED_POSTS_PER_PAGE]
+            has_prev, has_next = False, has_more
 
         if not scheduled_posts_data and page == 0:
             response_text = "🗓️ У вас нет запланированных постов."
@@ -64,8 +100,7 @@ async def display_scheduled_posts_page(message_or_callback: types.Message | type
         if not scheduled_posts_data and page > 0:
             response_text = "🗓️ Больше нет запланированных постов."
             builder = InlineKeyboardBuilder()
-            if page > 0:
-                builder.button(text="⬅️ Назад", callback_data=f"sched_page_{page - 1}")
+            builder.button(text="⬅️ В начало", callback_data="sched_page_0")
             builder.button(text="🏠 В меню", callback_data="sched_to_main_menu")
             reply_markup = builder.as_markup()
 
@@ -74,15 +109,18 @@ async def display_scheduled_posts_page(message_or_callback: types.Message | type
                 await message_or_callback.answer()
             return
 
-        response_parts = [f"🗓️ <b>Ваши запланированные посты (Страница {page + 1}):</b>\n"]
+        total_pages = max(1, (total_scheduled_posts + SCHEDULED_POSTS_PER_PAGE - 1) // SCHEDULED_POSTS_PER_PAGE)
+        response_parts = [f"🗓️ <b>Ваши запланированные посты (Страница {min(page + 1, total_pages)} из {total_pages}):</b>\n"]
         builder = InlineKeyboardBuilder()  # Клавиатура для кнопок отмены и пагинации
 
-        for post_db_id, ch_title_from_db, content, pub_time_iso, ch_id_tg_from_post in scheduled_posts_data:
+        for (post_db_id, ch_title_from_db, content, pub_time_iso, ch_id_tg_from_post, media_type,
+             album_size) in scheduled_posts_data:
             safe_content_preview = escape_html(
                 content[:50] + "..." if content and len(content) > 50 else (content or "[Без текста]")
             )
             publish_time_dt = datetime.fromisoformat(pub_time_iso)
             publish_time_str = escape_html(publish_time_dt.strftime('%d.%m.%Y %H:%M'))
+            media_line = f"📎 <b>Медиа:</b> {media_label(media_type, album_size)}\n" if media_type else ""
 
             safe_ch_title_display: str
             if ch_title_from_db:
@@ -96,6 +134,7 @@ async def display_scheduled_posts_page(message_or_callback: types.Message | type
                 f"📢 <b>Канал:</b> {safe_ch_title_display}\n"
                 f"⏰ <b>Время:</b> {publish_time_str}\n"
                 f"📝 <b>Текст:</b> {safe_content_preview}\n"
+                f"{media_line}"
             )
             # Кнопка отмены для каждого поста
             builder.row(
@@ -110,14 +149,14 @@ async def display_scheduled_posts_page(message_or_callback: types.Message | type
 
         # Кнопки пагинации
         pagination_buttons = []
-        if page > 0:
-            pagination_buttons.append(
-                types.InlineKeyboardButton(text="⬅️ Пред.", callback_data=f"sched_page_{page - 1}"))
-
-        total_pages = (total_scheduled_posts + SCHEDULED_POSTS_PER_PAGE - 1) // SCHEDULED_POSTS_PER_PAGE
-        if page < total_pages - 1:
-            pagination_buttons.append(
-                types.InlineKeyboardButton(text="След. ➡️", callback_data=f"sched_page_{page + 1}"))
+        # В callback_data кодируем номер страницы, направление и ключ (publish_time, id) граничного поста текущей страницы
+        first_post, last_post = scheduled_posts_data[0], scheduled_posts_data[-1]
+        if has_prev:
+            pagination_buttons.append(types.InlineKeyboardButton(
+                text="⬅️ Пред.", callback_data=f"sched_page_{page - 1}_p_{first_post[3]}_{first_post[0]}"))
+        if has_next:
+            pagination_buttons.append(types.InlineKeyboardButton(
+                text="След. ➡️", callback_data=f"sched_page_{page + 1}_n_{last_post[3]}_{last_post[0]}"))
 
         if pagination_buttons:
             builder.row(*pagination_buttons)
@@ -132,7 +171,7 @@ async def display_scheduled_posts_page(message_or_callback: types.Message | type
             try:
                 await message_or_callback.message.edit_text(response_text, reply_markup=builder.as_markup(),
                                                             parse_mode=parse_mode_to_use, disable_web_page_preview=True)
-            except types.TelegramBadRequest as e:
+            except TelegramBadRequest as e:
                 if "message is not modified" not in str(e).lower(): raise
             await message_or_callback.answer()
 
@@ -159,8 +198,14 @@ async def display_scheduled_posts_page(message_or_callback: types.Message | type
 # Пагинация
 @router.callback_query(F.data.startswith("sched_page_"))
 async def process_scheduled_page_callback(callback: types.CallbackQuery):
-    page = int(callback.data.split("_")[2])
-    await display_scheduled_posts_page(callback, page=page)
+    # sched_page_{page}_{n|p}_{publish_time}_{post_id} (в ISO-времени нет "_");
+    # кнопки прежних форматов (sched_page_{page} и sched_page_{page}_{n|p}_{post_id}) ведут на первую страницу
+    parts = callback.data.split("_")
+    if len(parts) == 6:
+        await display_scheduled_posts_page(callback, page=int(parts[2]), direction=parts[3],
+                                           anchor=(parts[4], int(parts[5])))
+    else:
+        await display_scheduled_posts_page(callback, page=0)
 
 
 # Возврат в меню
@@ -183,7 +228,7 @@ async def confirm_cancel_scheduled_post(callback: types.CallbackQuery, bot: Bot)
     current_user_id = callback.from_user.id
     db = get_db()
 
-    post_info = db.fetchone(
+    post_info = await db.fetchone(
         "SELECT channel_id, publish_time FROM posts WHERE id = ? AND user_id = ? AND status = 'scheduled'",
         (post_db_id_to_cancel, current_user_id)
     )
@@ -222,7 +267,7 @@ async def process_cancel_scheduled_post(callback: types.CallbackQuery, bot: Bot)
     db = get_db()
 
     # Еще раз проверяем пост перед действием
-    post_info = db.fetchone(
+    post_info = await db.fetchone(
         "SELECT channel_id, publish_time FROM posts WHERE id = ? AND user_id = ? AND status = 'scheduled'",
         (post_db_id_to_cancel, current_user_id)
     )
@@ -232,56 +277,42 @@ async def process_cancel_scheduled_post(callback: types.CallbackQuery, bot: Bot)
                                          reply_markup=None)
         return
 
-    job_id = f"post_{post_db_id_to_cancel}"
-    removed_from_scheduler = remove_scheduled_job(scheduler, job_id)
+    # Диспетчер публикует только посты в статусе 'scheduled', поэтому отмена - это только смена статуса.
+    # Если диспетчер уже забрал пост ('publishing'), условие ниже не сработает.
+    try:
+        cursor = await db.execute(
+            "UPDATE posts SET status = 'cancelled' WHERE id = ? AND user_id = ? AND status = 'scheduled'",
+            (post_db_id_to_cancel, current_user_id),
+            commit=True
+        )
+    except sqlite3.Error as e_db:
+        logger.error(f"DB error updating post {post_db_id_to_cancel} to cancelled: {e_db}", exc_info=True)
+        await callback.message.edit_text("❌ Ошибка базы данных при отмене поста. Пост мог остаться в расписании.",
+                                         reply_markup=None)
+        return
 
-    if removed_from_scheduler:
-        try:
-            db.execute(
-                "UPDATE posts SET status = 'cancelled' WHERE id = ? AND user_id = ?",
-                (post_db_id_to_cancel, current_user_id),
-                commit=True
-            )
-            if db.cursor.rowcount > 0:
-                logger.info(
-                    f"User {current_user_id} cancelled scheduled post DB ID {post_db_id_to_cancel}. Status updated. Job removed.")
-                await callback.message.edit_text(f"✅ Запланированный пост ID {post_db_id_to_cancel} успешно отменен.",
-                                                 reply_markup=None)
-                # await notify_user(bot, current_user_id, f"Ваш запланированный пост (ID: {post_db_id_to_cancel}) был отменен.")
-            else:  # Маловероятно, если первая проверка прошла
-                logger.warning(
-                    f"Failed to update status to 'cancelled' for post DB ID {post_db_id_to_cancel} for user {current_user_id}, though job was removed.")
-                await callback.message.edit_text(
-                    "⚠️ Пост удален из расписания, но произошла ошибка обновления статуса в БД.", reply_markup=None)
-
-        except sqlite3.Error as e_db:
-            logger.error(f"DB error updating post {post_db_id_to_cancel} to cancelled: {e_db}", exc_info=True)
-            await callback.message.edit_text("❌ Ошибка базы данных при отмене поста. Пост мог остаться в расписании.",
-                                             reply_markup=None)
-            # Здесь можно попытаться передобавить задачу, если отмена в БД не удалась, но это усложнит логику
+    if cursor.rowcount > 0:
+        logger.info(
+            f"User {current_user_id} cancelled scheduled post DB ID {post_db_id_to_cancel}. Status updated.")
+        await callback.message.edit_text(f"✅ Запланированный пост ID {post_db_id_to_cancel} успешно отменен.",
+                                         reply_markup=None)
+        # await notify_user(bot, current_user_id, f"Ваш запланированный пост (ID: {post_db_id_to_cancel}) был отменен.")
     else:
-        # Если задача не найдена в планировщике, возможно, она уже выполнилась или была удалена ранее.
-        # Проверим статус в БД еще раз.
-        current_status_info = db.fetchone("SELECT status FROM posts WHERE id = ?", (post_db_id_to_cancel,))
+        # Статус успел измениться (пост забран диспетчером публикаций или отменен ранее). Проверим статус в БД еще раз.
+        current_status_info = await db.fetchone("SELECT status FROM posts WHERE id = ?", (post_db_id_to_cancel,))
         current_status = current_status_info[0] if current_status_info else "unknown"
 
-        if current_status == 'scheduled':
-            # Это странная ситуация: в планировщике нет, а в БД 'scheduled'
-            logger.error(
-                f"Job {job_id} for post {post_db_id_to_cancel} not found in scheduler, but DB status is 'scheduled'. Attempting to set 'failed'.")
-            db.execute("UPDATE posts SET status = 'failed' WHERE id = ?", (post_db_id_to_cancel,),
-                       commit=True)  # или 'cancelled_error'
-            await callback.message.edit_text(
-                "⚠️ Пост не найден в активном расписании. Его статус в БД обновлен на 'ошибка'.", reply_markup=None)
-        elif current_status == 'published':
+        if current_status == 'published':
             await callback.message.edit_text("ℹ️ Этот пост уже был опубликован.", reply_markup=None)
         elif current_status == 'cancelled':
             await callback.message.edit_text("ℹ️ Этот пост уже был отменен ранее.", reply_markup=None)
+        elif current_status == 'publishing':
+            await callback.message.edit_text("ℹ️ Этот пост уже публикуется, отменить его нельзя.", reply_markup=None)
         else:  # failed или другой статус
             await callback.message.edit_text(
                 f"ℹ️ Не удалось отменить пост. Текущий статус: {escape_html(current_status)}.", reply_markup=None)
             logger.warning(
-                f"Could not cancel post {post_db_id_to_cancel}. Job not in scheduler. DB status: {current_status}.")
+                f"Could not cancel post {post_db_id_to_cancel}. DB status: {current_status}.")
 
     # После действия, можно предложить вернуться к списку или в меню
     # Для простоты пока просто убираем клавиатуру. Пользователь может нажать кнопку "Запланированные" снова.
@@ -6,6 +6,8 @@ import logging
 
 from loader import get_db
 from bot_utils import get_main_keyboard, escape_html
+from services.media import album_collector, message_media, pack_album, unpack_album, album_input_media, MEDIA_TYPE_ALBUM
+from services.template_cache import template_cache, template_columns, template_preview_html
 from post_states import TemplateStates
 from filters.admin import IsAdmin
 from config import SUPER_ADMIN_ID
@@ -24,14 +26,14 @@ async def get_templates_for_user(user_id: int) -> list:
                OR user_id = ?
             ORDER BY user_id ASC, name ASC \
             """
-    return db.fetchall(query, (COMMON_TEMPLATE_USER_ID, user_id))
+    return await db.fetchall(query, (COMMON_TEMPLATE_USER_ID, user_id))
 
 
 async def check_if_user_is_admin_for_display(user_id: int) -> bool:
     if user_id == SUPER_ADMIN_ID:
         return True
     db = get_db()
-    admin_status = db.fetchone("SELECT is_admin FROM bot_users WHERE user_id = ?", (user_id,))
+    admin_status = await db.fetchone("SELECT is_admin FROM bot_users WHERE user_id = ?", (user_id,))
     return bool(admin_status and admin_status[0] == 1)
 
 
@@ -157,7 +159,7 @@ async def process_template_name(message: types.Message, state: FSMContext):
         await message.answer("Название шаблона не может быть пустым. Попробуйте еще раз.")
         return
 
-    existing_template = db.fetchone(
+    existing_template = await db.fetchone(
         "SELECT id FROM templates WHERE user_id = ? AND name = ?",
         (target_user_id_for_db, template_name)
     )
@@ -175,7 +177,7 @@ async def process_template_name(message: types.Message, state: FSMContext):
     await message.answer(
         f"📄 Теперь отправьте текст для {template_type_description} шаблона «{escape_html(template_name)}».\n"
         "Используйте переменные вида <code>{[название]}</code>, чтобы потом их заполнить. " # Обновлен текст
-        "Можно также прикрепить ОДНО фото/видео."
+        "Можно также прикрепить фото/видео или альбом (до 10 файлов, текст - подписью к альбому)."
         "\n\n<i>Для отмены введите /cancel или 'отмена'.</i>",
         parse_mode="HTML"
     )
@@ -210,32 +212,43 @@ async def process_template_content(message: types.Message, state: FSMContext):
     template_owner_user_id = COMMON_TEMPLATE_USER_ID if is_common_being_created else message.from_user.id
     template_type_description = "Общий" if is_common_being_created else "Ваш личный"
 
-    content_from_user = message.text or message.caption
+    album_messages = [message]
+    if message.media_group_id:  # Альбом приходит несколькими сообщениями - сохраняем его целиком один раз
+        album_messages = await album_collector.collect(message)
+        if album_messages is None:
+            return
+
+    # Подпись альбома Telegram присылает у одного из сообщений (обычно первого)
+    content_from_user = next((m.text or m.caption for m in album_messages if m.text or m.caption), None)
+    media_items = [item for item in map(message_media, album_messages) if item]
     media_id = None
     media_type_str = None
 
-    if message.photo:
-        media_id = message.photo[-1].file_id
-        media_type_str = "photo"
-    elif message.video:
-        media_id = message.video.file_id
-        media_type_str = "video"
+    if len(media_items) > 1:
+        media_id, media_type_str = pack_album(media_items), MEDIA_TYPE_ALBUM
+    elif media_items:
+        media_type_str, media_id = media_items[0]
 
     if not content_from_user and not media_id:
         await message.answer("Шаблон должен содержать текст или медиа. Попробуйте еще раз.")
         return
 
     final_content_for_db = content_from_user if content_from_user is not None else ""
-    try:
-        await message.delete()
-    except Exception:
-        logger.warning(f"Could not delete message with template content from user {message.from_user.id}")
+    for album_message in album_messages:
+        try:
+            await album_message.delete()
+        except Exception:
+            logger.warning(f"Could not delete message with template content from user {message.from_user.id}")
 
     db = get_db()
+    # Переменные ищутся один раз здесь; при использовании шаблона берутся готовые сегменты
+    segments_json, variables_json = template_columns(final_content_for_db)
     try:
-        db.execute(
-            "INSERT INTO templates (user_id, name, content, media, media_type) VALUES (?, ?, ?, ?, ?)",
-            (template_owner_user_id, template_name, final_content_for_db, media_id, media_type_str),
+        await db.execute(
+            """INSERT INTO templates (user_id, name, content, media, media_type, segments, variables)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (template_owner_user_id, template_name, final_content_for_db, media_id, media_type_str,
+             segments_json, variables_json),
             commit=True
         )
         logger.info(
@@ -272,25 +285,23 @@ async def view_template_callback(callback: types.CallbackQuery):
     await callback.answer()
     tpl_id_to_view = int(callback.data.split("_")[2])
     current_user_id = callback.from_user.id
-    db = get_db()
 
-    template_data = db.fetchone(
-        "SELECT name, content, media, media_type, user_id FROM templates WHERE id = ? AND (user_id = ? OR user_id = ?)",
-        (tpl_id_to_view, current_user_id, COMMON_TEMPLATE_USER_ID)
-    )
-    if not template_data:
+    template = await template_cache.get(tpl_id_to_view, current_user_id)
+    if template is None:
         logger.warning(
             f"User {current_user_id} tried to view non-existent or non-accessible template ID {tpl_id_to_view}")
         keyboard = await templates_menu_keyboard_for_user(current_user_id, callback.message.message_id)
         await callback.message.edit_text("❌ Шаблон не найден или недоступен.", reply_markup=keyboard)
         return
 
-    name, content, media_file_id, media_type_from_db, tpl_owner_id = template_data
-    template_type_str = "(Общий)" if tpl_owner_id == COMMON_TEMPLATE_USER_ID else "(Личный)"
+    name, media_file_id, media_type_from_db = template.name, template.media, template.media_type
+    template_type_str = "(Общий)" if template.user_id == COMMON_TEMPLATE_USER_ID else "(Личный)"
 
     text_to_send_parts = [f"📄 <b>Шаблон «{escape_html(name)}» {template_type_str}</b>"]
-    if content:
-        text_to_send_parts.append(f"\n{escape_html(content)}")
+    if template.segments != [""]:
+        text_to_send_parts.append(f"\n{template_preview_html(template.segments)}")
+        if template.variables:
+            text_to_send_parts.append(f"\n🔤 Переменных для заполнения: {len(template.variables)}")
     else:
         text_to_send_parts.append("\n[Без текстового содержимого]")
 
@@ -299,7 +310,12 @@ async def view_template_callback(callback: types.CallbackQuery):
     if media_file_id:
         media_info_text = "🖼️ <i>К шаблону прикреплено медиа.</i>"
         try:
-            if media_type_from_db == "photo":
+            if media_type_from_db == MEDIA_TYPE_ALBUM:
+                album_items = unpack_album(media_file_id)
+                media_info_text = f"🖼️ <i>К шаблону прикреплен альбом ({len(album_items)}).</i>"
+                await callback.message.answer_media_group(
+                    media=album_input_media(album_items, f"{final_caption_for_media}\n{media_info_text}", "HTML"))
+            elif media_type_from_db == "photo":
                 await callback.message.answer_photo(media_file_id,
                                                     caption=f"{final_caption_for_media}\n{media_info_text}",
                                                     parse_mode="HTML")
@@ -328,7 +344,7 @@ async def delete_personal_template_ask_callback(callback: types.CallbackQuery):
     current_user_id = callback.from_user.id
     db = get_db()
 
-    template_data = db.fetchone(
+    template_data = await db.fetchone(
         "SELECT name FROM templates WHERE id = ? AND user_id = ? AND user_id != ?",
         (tpl_id_to_delete, current_user_id, COMMON_TEMPLATE_USER_ID)
     )
@@ -366,7 +382,7 @@ async def delete_personal_template_confirm_callback(callback: types.CallbackQuer
     current_user_id = callback.from_user.id
     db = get_db()
 
-    template_data = db.fetchone(
+    template_data = await db.fetchone(
         "SELECT name FROM templates WHERE id = ? AND user_id = ? AND user_id != ?",
         (tpl_id_to_delete, current_user_id, COMMON_TEMPLATE_USER_ID)
     )
@@ -379,12 +395,13 @@ async def delete_personal_template_confirm_callback(callback: types.CallbackQuer
 
     template_name = template_data[0]
     try:
-        db.execute(
+        cursor = await db.execute(
             "DELETE FROM templates WHERE id = ? AND user_id = ?",
             (tpl_id_to_delete, current_user_id),
             commit=True
         )
-        if db.cursor.rowcount > 0:
+        template_cache.invalidate(tpl_id_to_delete)
+        if cursor.rowcount > 0:
             logger.info(
                 f"User {current_user_id} deleted personal template '{template_name}' (DB ID {tpl_id_to_delete})")
             await callback.answer(f"🗑 Личный шаблон «{escape_html(template_name)}» удален.", show_alert=True)
@@ -408,7 +425,7 @@ async def delete_personal_template_confirm_callback(callback: types.CallbackQuer
 async def manage_common_templates_menu_logic(user_id: int, bot_instance: Bot, message_id_to_edit: int,
                                              chat_id: int):
     db = get_db()
-    common_templates = db.fetchall(
+    common_templates = await db.fetchall(
         "SELECT id, name FROM templates WHERE user_id = ? ORDER BY name ASC",
         (COMMON_TEMPLATE_USER_ID,)
     )
@@ -467,7 +484,7 @@ async def delete_common_template_ask_callback(callback: types.CallbackQuery):
     original_message_id_for_menu = int(parts[1])
     db = get_db()
 
-    template_data = db.fetchone(
+    template_data = await db.fetchone(
         "SELECT name FROM templates WHERE id = ? AND user_id = ?",
         (tpl_id_to_delete, COMMON_TEMPLATE_USER_ID)
     )
@@ -509,7 +526,7 @@ async def delete_common_template_confirm_callback(callback: types.CallbackQuery)
     original_message_id_for_menu = int(parts[1])
     db = get_db()
 
-    template_data = db.fetchone(
+    template_data = await db.fetchone(
         "SELECT name FROM templates WHERE id = ? AND user_id = ?",
         (tpl_id_to_delete, COMMON_TEMPLATE_USER_ID)
     )
@@ -522,12 +539,13 @@ async def delete_common_template_confirm_callback(callback: types.CallbackQuery)
 
     template_name = template_data[0]
     try:
-        db.execute(
+        cursor = await db.execute(
             "DELETE FROM templates WHERE id = ? AND user_id = ?",
             (tpl_id_to_delete, COMMON_TEMPLATE_USER_ID),
             commit=True
         )
-        if db.cursor.rowcount > 0:
+        template_cache.invalidate(tpl_id_to_delete)
+        if cursor.rowcount > 0:
             logger.info(
                 f"Admin {callback.from_user.id} deleted COMMON template '{template_name}' (DB ID {tpl_id_to_delete})")
             await callback.answer(f"🗑 Общий шаблон «{escape_html(template_name)}» удален.", show_alert=True)
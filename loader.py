@@ -1,18 +1,35 @@
 import os
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from models.database import Database
 from services.content_filter import ContentFilter # Опечатка исправлена на ContentFilter
-from config import BOT_TOKEN, DATABASE_NAME, BANNED_WORDS_FILE
+from services.rate_limiter import TelegramRateLimiter, RateLimitMiddleware
+from config import (BOT_TOKEN, TELEGRAM_API_URL, DATABASE_NAME, BANNED_WORDS_FILE, BANNED_WORDS_COMPACT_EVERY,
+                    BANNED_WORDS_RELOAD_SECONDS, CONTENT_FILTER_MODE, CONTENT_FILTER_CACHE_SIZE,
+                    CONTENT_FILTER_CACHE_MAX_BYTES, TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE,
+                    TELEGRAM_GROUP_RATE_PER_MINUTE, TELEGRAM_CHAT_BURST)
 
 load_dotenv()
 
 # Инициализация бота и диспетчера
-bot = Bot(token=BOT_TOKEN)
+if TELEGRAM_API_URL:  # Свой сервер Bot API, например локальный для бенчмарков
+    bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)))
+else:
+    bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 
+# Все исходящие сообщения бота проходят через общий ограничитель частоты (лимиты Telegram)
+rate_limiter = TelegramRateLimiter(
+    global_rate=TELEGRAM_GLOBAL_RATE,
+    chat_rate=TELEGRAM_CHAT_RATE,
+    group_rate=TELEGRAM_GROUP_RATE_PER_MINUTE / 60,
+    chat_burst=TELEGRAM_CHAT_BURST
+)
+bot.session.middleware(RateLimitMiddleware(rate_limiter))
+
 # Класс-обертка для управления соединением с БД
 class DBManager:
     def __init__(self, db_name_param): # Изменено имя параметра во избежание путаницы
@@ -27,16 +44,15 @@ class DBManager:
     async def shutdown(self):
         """Закрывает соединение с базой данных."""
         if self.db_instance and self.db_instance.connection:
-            self.db_instance.close() # Используем метод close из класса Database
+            await self.db_instance.close() # Закрываем соединение и останавливаем поток БД
             # logger.info("Database disconnected.")
 
 db_manager = DBManager(DATABASE_NAME)
 
-# Инициализация планировщика задач APScheduler
-scheduler = AsyncIOScheduler(timezone="Europe/Moscow") # Рекомендуется указать таймзону
-
 # Инициализация фильтра контента
-content_filter_instance = ContentFilter(BANNED_WORDS_FILE) # Переименовано для ясности
+content_filter_instance = ContentFilter(BANNED_WORDS_FILE, CONTENT_FILTER_MODE, BANNED_WORDS_COMPACT_EVERY,
+                                        BANNED_WORDS_RELOAD_SECONDS, CONTENT_FILTER_CACHE_SIZE,
+                                        CONTENT_FILTER_CACHE_MAX_BYTES) # Переименовано для ясности
 
 def get_db() -> Database:
     """Возвращает активный экземпляр подключения к базе данных."""
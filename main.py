@@ -1,6 +1,9 @@
 import asyncio
 import logging
-from loader import bot, dp, db_manager, scheduler
+from loader import bot, dp, db_manager, content_filter
+from services.scheduler import publisher_pool, publish_dispatcher, release_held_leases
+from config import PUBLISH_SHUTDOWN_GRACE_SECONDS
+from services.rescreen import post_rescreener
 from handlers import (
     common,
     channels,
@@ -25,7 +28,11 @@ async def main():
     dp.include_router(admin_features.router)
     dp.include_router(scheduled_posts.router)
 
-    scheduler.start()
+    # Пул воркеров публикации и диспетчер отложенных постов (очередь - таблица posts)
+    publisher_pool.start()
+    await publish_dispatcher.start()
+    # Перечитывание стоп-листа при правках из других процессов или вручную
+    content_filter.start_watching()
 
     try:
         print("Бот запускается...")
@@ -34,9 +41,15 @@ async def main():
         logging.error(f"Ошибка при запуске бота: {e}", exc_info=True)
     finally:
         logging.info("Бот останавливается...")
+        await content_filter.stop_watching()
+        await post_rescreener.stop()
+        # Сначала публикация: начатые отправки должны завершиться через еще открытую сессию,
+        # иначе ошибка закрытой сессии пометила бы их посты 'failed'. Неотправленные посты возвращаются в очередь
+        await publish_dispatcher.stop()
+        await publisher_pool.stop(grace=PUBLISH_SHUTDOWN_GRACE_SECONDS)
+        await release_held_leases()
         if bot.session and not bot.session.closed:
              await bot.session.close()
-        scheduler.shutdown(wait=False)
         await db_manager.shutdown()
         logging.info("Бот остановлен.")
 
@@ -1,19 +1,100 @@
+import asyncio
 import sqlite3
 import logging
-from config import SUPER_ADMIN_ID
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import SUPER_ADMIN_ID, DB_READER_CONNECTIONS
 
 logger = logging.getLogger(__name__)
 
+# Индексы под "горячие" запросы хендлеров. Создаются в _init_db, в том числе для уже существующих БД.
+MANAGED_INDEXES = {
+    # История: WHERE user_id = ? ORDER BY publish_time DESC, а также COUNT(*) по пользователю
+    "idx_posts_user_time": "posts(user_id, publish_time)",
+    # Запланированные посты пользователя: WHERE user_id = ? AND status = 'scheduled' ORDER BY publish_time
+    "idx_posts_user_status_time": "posts(user_id, status, publish_time)",
+    # Выборка постов по статусу в порядке времени публикации (ближайшие запланированные)
+    "idx_posts_status_time": "posts(status, publish_time)",
+    # Диспетчер: наступившие посты с учетом назначенного повтора (services.scheduler.DUE_TIME)
+    "idx_posts_status_due": "posts(status, COALESCE(next_attempt_at, publish_time))",
+    # Клавиатура и список каналов: WHERE user_id = ? ORDER BY title (покрывающий, с channel_id)
+    "idx_channels_user_title": "channels(user_id, title, channel_id)",
+    # Посты одной публикации в несколько каналов (итоговый отчет по группе)
+    "idx_posts_group": "posts(group_id, status) WHERE group_id IS NOT NULL",
+    # /list_users: ORDER BY created_at DESC
+    "idx_bot_users_created": "bot_users(created_at)",
+}
+
+# Счетчики stats_counters, добавленные вместе с новыми статусами постов. В существующей таблице
+# добавляются в _init_counters (триггеры постов при этом пересоздаются, а счетчики пересчитываются)
+STATS_ADDED_COLUMNS = ("posts_publishing", "posts_missed", "posts_held")
+
+# Колонки, добавленные после первой версии схемы. Для существующих БД добавляются через ALTER TABLE в _init_db.
+MANAGED_COLUMNS = {
+    "posts": {
+        # Неудачные попытки публикации и текст последней ошибки (повторы переживают рестарт)
+        "attempts": "INTEGER NOT NULL DEFAULT 0",
+        "last_error": "TEXT",
+        # Аренда поста в статусе 'publishing': какой экземпляр бота его публикует и до какого времени
+        "lease_owner": "TEXT",
+        "lease_until": "DATETIME",
+        # Общий идентификатор постов, созданных одной публикацией в несколько каналов
+        "group_id": "TEXT",
+        # Время следующей попытки после временной ошибки; publish_time при этом не меняется
+        "next_attempt_at": "DATETIME",
+    },
+    "templates": {
+        # Текст шаблона, разобранный при сохранении на сегменты и имена переменных (JSON, см. services/template_cache.py)
+        "segments": "TEXT",
+        "variables": "TEXT",
+    },
+}
+
 
 class Database:
-    def __init__(self, db_name):
+    """
+    Обертка над SQLite с асинхронным API.
+    Все запросы выполняются в потоках БД, чтобы не блокировать event loop бота и планировщика:
+    запись идет через единственное соединение-писатель, чтение - через пул соединений-читателей.
+    В режиме WAL чтение не ждет записи, а каждый запрос получает собственный курсор.
+    """
+
+    def __init__(self, db_name, reader_connections: int = DB_READER_CONNECTIONS):
         self.db_name = db_name
-        self.connection = sqlite3.connect(db_name, check_same_thread=False)  # check_same_thread=False для APScheduler
-        self.cursor = self.connection.cursor()
+        # check_same_thread=False: соединение создается здесь, а используется потоком-писателем
+        self.connection = self._connect()
         self._init_db()
 
+        # Один поток-писатель: SQLite допускает только одну пишущую транзакцию одновременно
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+        # Для БД в памяти у каждого соединения своя база, поэтому читаем через писателя
+        self._reader_local = threading.local()
+        self._reader_connections = []
+        self._reader_connections_lock = threading.Lock()
+        if db_name == ":memory:" or reader_connections <= 0:
+            self._readers = self._writer
+        else:
+            self._readers = ThreadPoolExecutor(max_workers=reader_connections, thread_name_prefix="db-reader",
+                                               initializer=self._init_reader)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_name, check_same_thread=False, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _init_reader(self):
+        """Создает соединение-читатель для текущего потока пула."""
+        connection = self._connect()
+        connection.execute("PRAGMA query_only=ON")
+        self._reader_local.connection = connection
+        with self._reader_connections_lock:
+            self._reader_connections.append(connection)
+
     def _init_db(self):
-        self.cursor.executescript("""
+        cursor = self.connection.cursor()
+        cursor.executescript("""
                                   CREATE TABLE IF NOT EXISTS bot_users
                                   (
                                       user_id
@@ -154,7 +235,7 @@ class Database:
         self.connection.commit()
         # Индекс для user_id=0 и name (Общие шаблоны)
         try:
-            self.cursor.execute("""
+            cursor.execute("""
                                 CREATE UNIQUE INDEX IF NOT EXISTS idx_templates_common_name
                                     ON templates(name) WHERE user_id = 0;
                                 """)
@@ -168,34 +249,396 @@ class Database:
             if "duplicate index name" not in str(e).lower():
                 logger.warning(f"Could not create unique index for common templates (возможно, уже существует): {e}")
 
-    def execute(self, query, params=None, commit=False):
+        self._add_managed_columns(cursor)
+        self._create_managed_indexes(cursor)
+        self._init_counters(cursor)
+        self._init_banned_words(cursor)
+
+    def _add_managed_columns(self, cursor: sqlite3.Cursor):
+        for table_name, columns in MANAGED_COLUMNS.items():
+            existing_columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})")}
+            for column_name, column_definition in columns.items():
+                if column_name not in existing_columns:
+                    cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}")
+                    logger.info(f"Added column {table_name}.{column_name}")
+        self.connection.commit()
+
+    def _create_managed_indexes(self, cursor: sqlite3.Cursor):
+        for index_name, index_definition in MANAGED_INDEXES.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_definition}")
+        # Обновляем статистику планировщика запросов только там, где она устарела
+        cursor.execute("PRAGMA optimize")
+        self.connection.commit()
+
+    def _init_counters(self, cursor: sqlite3.Cursor):
+        """
+        Таблицы счетчиков, поддерживаемые триггерами, вместо COUNT(*) в хендлерах:
+        user_post_counters - посты пользователя (пагинация), stats_counters - одна строка для /admin_stats.
+        При первом создании таблиц счетчики заполняются по существующим данным.
+        """
+        existing_tables = {row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('user_post_counters', 'stats_counters')"
+        )}
+        stats_columns = {row[1] for row in cursor.execute("PRAGMA table_info(stats_counters)")}
+        missing_columns = [column for column in STATS_ADDED_COLUMNS if stats_columns and column not in stats_columns]
+        if missing_columns:
+            for column in missing_columns:
+                cursor.execute(f"ALTER TABLE stats_counters ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            # Старые триггеры не знают новых колонок - пересоздаются ниже
+            for trigger in ("trg_stats_posts_insert", "trg_stats_posts_delete", "trg_stats_posts_status"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            logger.info(f"Added stats_counters columns: {', '.join(missing_columns)}")
+        cursor.executescript("""
+            CREATE TABLE IF NOT EXISTS user_post_counters
+            (
+                user_id         INTEGER PRIMARY KEY,
+                posts_total     INTEGER NOT NULL DEFAULT 0,
+                posts_scheduled INTEGER NOT NULL DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS stats_counters
+            (
+                id                 INTEGER PRIMARY KEY CHECK (id = 1),
+                users_total        INTEGER NOT NULL DEFAULT 0,
+                users_admins       INTEGER NOT NULL DEFAULT 0,
+                channels_total     INTEGER NOT NULL DEFAULT 0,
+                posts_total        INTEGER NOT NULL DEFAULT 0,
+                posts_scheduled    INTEGER NOT NULL DEFAULT 0,
+                posts_publishing   INTEGER NOT NULL DEFAULT 0,
+                posts_published    INTEGER NOT NULL DEFAULT 0,
+                posts_failed       INTEGER NOT NULL DEFAULT 0,
+                posts_cancelled    INTEGER NOT NULL DEFAULT 0,
+                posts_missed       INTEGER NOT NULL DEFAULT 0,
+                posts_held         INTEGER NOT NULL DEFAULT 0,
+                templates_total    INTEGER NOT NULL DEFAULT 0,
+                templates_common   INTEGER NOT NULL DEFAULT 0,
+                templates_personal INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO stats_counters (id) VALUES (1);
+
+            -- Посты: счетчики пользователя и общая статистика
+            CREATE TRIGGER IF NOT EXISTS trg_user_post_counters_insert
+                AFTER INSERT ON posts
+            BEGIN
+                INSERT INTO user_post_counters (user_id) VALUES (NEW.user_id) ON CONFLICT (user_id) DO NOTHING;
+                UPDATE user_post_counters
+                SET posts_total     = posts_total + 1,
+                    posts_scheduled = posts_scheduled + (NEW.status = 'scheduled')
+                WHERE user_id = NEW.user_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_user_post_counters_delete
+                AFTER DELETE ON posts
+            BEGIN
+                UPDATE user_post_counters
+                SET posts_total     = posts_total - 1,
+                    posts_scheduled = posts_scheduled - (OLD.status = 'scheduled')
+                WHERE user_id = OLD.user_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_user_post_counters_status
+                AFTER UPDATE OF status ON posts
+                WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                UPDATE user_post_counters
+                SET posts_scheduled = posts_scheduled - (OLD.status = 'scheduled') + (NEW.status = 'scheduled')
+                WHERE user_id = NEW.user_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_posts_insert
+                AFTER INSERT ON posts
+            BEGIN
+                UPDATE stats_counters
+                SET posts_total      = posts_total + 1,
+                    posts_scheduled  = posts_scheduled + (NEW.status = 'scheduled'),
+                    posts_publishing = posts_publishing + (NEW.status = 'publishing'),
+                    posts_published  = posts_published + (NEW.status = 'published'),
+                    posts_failed     = posts_failed + (NEW.status = 'failed'),
+                    posts_cancelled  = posts_cancelled + (NEW.status = 'cancelled'),
+                    posts_missed     = posts_missed + (NEW.status = 'missed'),
+                    posts_held       = posts_held + (NEW.status = 'held')
+                WHERE id = 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_posts_delete
+                AFTER DELETE ON posts
+            BEGIN
+                UPDATE stats_counters
+                SET posts_total      = posts_total - 1,
+                    posts_scheduled  = posts_scheduled - (OLD.status = 'scheduled'),
+                    posts_publishing = posts_publishing - (OLD.status = 'publishing'),
+                    posts_published  = posts_published - (OLD.status = 'published'),
+                    posts_failed     = posts_failed - (OLD.status = 'failed'),
+                    posts_cancelled  = posts_cancelled - (OLD.status = 'cancelled'),
+                    posts_missed     = posts_missed - (OLD.status = 'missed'),
+                    posts_held       = posts_held - (OLD.status = 'held')
+                WHERE id = 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_posts_status
+                AFTER UPDATE OF status ON posts
+                WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                UPDATE stats_counters
+                SET posts_scheduled  = posts_scheduled - (OLD.status = 'scheduled') + (NEW.status = 'scheduled'),
+                    posts_publishing = posts_publishing - (OLD.status = 'publishing') + (NEW.status = 'publishing'),
+                    posts_published  = posts_published - (OLD.status = 'published') + (NEW.status = 'published'),
+                    posts_failed     = posts_failed - (OLD.status = 'failed') + (NEW.status = 'failed'),
+                    posts_cancelled  = posts_cancelled - (OLD.status = 'cancelled') + (NEW.status = 'cancelled'),
+                    posts_missed     = posts_missed - (OLD.status = 'missed') + (NEW.status = 'missed'),
+                    posts_held       = posts_held - (OLD.status = 'held') + (NEW.status = 'held')
+                WHERE id = 1;
+            END;
+
+            -- Пользователи
+            CREATE TRIGGER IF NOT EXISTS trg_stats_users_insert
+                AFTER INSERT ON bot_users
+            BEGIN
+                UPDATE stats_counters
+                SET users_total  = users_total + 1,
+                    users_admins = users_admins + (NEW.is_admin = 1)
+                WHERE id = 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_users_delete
+                AFTER DELETE ON bot_users
+            BEGIN
+                UPDATE stats_counters
+                SET users_total  = users_total - 1,
+                    users_admins = users_admins - (OLD.is_admin = 1)
+                WHERE id = 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_users_admin
+                AFTER UPDATE OF is_admin ON bot_users
+                WHEN OLD.is_admin IS NOT NEW.is_admin
+            BEGIN
+                UPDATE stats_counters
+                SET users_admins = users_admins - (OLD.is_admin = 1) + (NEW.is_admin = 1)
+                WHERE id = 1;
+            END;
+
+            -- Каналы
+            CREATE TRIGGER IF NOT EXISTS trg_stats_channels_insert
+                AFTER INSERT ON channels
+            BEGIN
+                UPDATE stats_counters SET channels_total = channels_total + 1 WHERE id = 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_channels_delete
+                AFTER DELETE ON channels
+            BEGIN
+                UPDATE stats_counters SET channels_total = channels_total - 1 WHERE id = 1;
+            END;
+
+            -- Шаблоны (user_id = 0 - общие)
+            CREATE TRIGGER IF NOT EXISTS trg_stats_templates_insert
+                AFTER INSERT ON templates
+            BEGIN
+                UPDATE stats_counters
+                SET templates_total    = templates_total + 1,
+                    templates_common   = templates_common + (NEW.user_id = 0),
+                    templates_personal = templates_personal + (NEW.user_id != 0)
+                WHERE id = 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_templates_delete
+                AFTER DELETE ON templates
+            BEGIN
+                UPDATE stats_counters
+                SET templates_total    = templates_total - 1,
+                    templates_common   = templates_common - (OLD.user_id = 0),
+                    templates_personal = templates_personal - (OLD.user_id != 0)
+                WHERE id = 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_stats_templates_owner
+                AFTER UPDATE OF user_id ON templates
+                WHEN OLD.user_id IS NOT NEW.user_id
+            BEGIN
+                UPDATE stats_counters
+                SET templates_common   = templates_common - (OLD.user_id = 0) + (NEW.user_id = 0),
+                    templates_personal = templates_personal - (OLD.user_id != 0) + (NEW.user_id != 0)
+                WHERE id = 1;
+            END;
+        """)
+        if existing_tables != {"user_post_counters", "stats_counters"} or missing_columns:
+            self._rebuild_counters_sync()
+
+    def _init_banned_words(self, cursor: sqlite3.Cursor):
+        """
+        Списки запрещенных слов каналов и пользователей (services.scoped_words).
+        banned_words без rowid: первичный ключ (scope_type, scope_id, word) - это и есть индекс, по которому
+        слова одной области читаются одним диапазоном. banned_word_scopes ведется триггерами: число слов
+        области и версия, которая растет при каждой правке (по ней процессы замечают чужие правки).
+        """
+        cursor.executescript("""
+            CREATE TABLE IF NOT EXISTS banned_words
+            (
+                scope_type TEXT    NOT NULL, -- 'channel' или 'user'
+                scope_id   INTEGER NOT NULL, -- channel_id или user_id
+                word       TEXT    NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (scope_type, scope_id, word)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS banned_word_scopes
+            (
+                scope_type TEXT    NOT NULL,
+                scope_id   INTEGER NOT NULL,
+                words      INTEGER NOT NULL DEFAULT 0,
+                version    INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope_type, scope_id)
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS trg_banned_word_scopes_insert
+                AFTER INSERT ON banned_words
+            BEGIN
+                INSERT INTO banned_word_scopes (scope_type, scope_id) VALUES (NEW.scope_type, NEW.scope_id)
+                ON CONFLICT (scope_type, scope_id) DO NOTHING;
+                UPDATE banned_word_scopes
+                SET words   = words + 1,
+                    version = version + 1
+                WHERE scope_type = NEW.scope_type AND scope_id = NEW.scope_id;
+            END;
+
+            -- Строка области не удаляется и при нуле слов: версия должна только расти
+            CREATE TRIGGER IF NOT EXISTS trg_banned_word_scopes_delete
+                AFTER DELETE ON banned_words
+            BEGIN
+                UPDATE banned_word_scopes
+                SET words   = words - 1,
+                    version = version + 1
+                WHERE scope_type = OLD.scope_type AND scope_id = OLD.scope_id;
+            END;
+        """)
+        self.connection.commit()
+
+    def _rebuild_counters_sync(self):
+        """Пересчитывает все счетчики по данным таблиц (для существующих БД и ручной починки)."""
+        try:
+            self.connection.execute("DELETE FROM user_post_counters")
+            self.connection.execute("""
+                INSERT INTO user_post_counters (user_id, posts_total, posts_scheduled)
+                SELECT user_id, COUNT(*), SUM(status = 'scheduled') FROM posts GROUP BY user_id
+            """)
+            self.connection.execute("""
+                UPDATE stats_counters
+                SET users_total        = (SELECT COUNT(*) FROM bot_users),
+                    users_admins       = (SELECT COUNT(*) FROM bot_users WHERE is_admin = 1),
+                    channels_total     = (SELECT COUNT(*) FROM channels),
+                    posts_total        = (SELECT COUNT(*) FROM posts),
+                    posts_scheduled    = (SELECT COUNT(*) FROM posts WHERE status = 'scheduled'),
+                    posts_publishing   = (SELECT COUNT(*) FROM posts WHERE status = 'publishing'),
+                    posts_published    = (SELECT COUNT(*) FROM posts WHERE status = 'published'),
+                    posts_failed       = (SELECT COUNT(*) FROM posts WHERE status = 'failed'),
+                    posts_cancelled    = (SELECT COUNT(*) FROM posts WHERE status = 'cancelled'),
+                    posts_missed       = (SELECT COUNT(*) FROM posts WHERE status = 'missed'),
+                    posts_held         = (SELECT COUNT(*) FROM posts WHERE status = 'held'),
+                    templates_total    = (SELECT COUNT(*) FROM templates),
+                    templates_common   = (SELECT COUNT(*) FROM templates WHERE user_id = 0),
+                    templates_personal = (SELECT COUNT(*) FROM templates WHERE user_id != 0)
+                WHERE id = 1
+            """)
+            self.connection.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error rebuilding counters: {e}", exc_info=True)
+            self.connection.rollback()
+            raise
+
+    # --- Синхронные методы (выполняются только в потоках БД) ---
+
+    def _execute_sync(self, query, params=None, commit=False):
+        """Выполняет запрос на соединении-писателе. Возвращает новый курсор (rowcount/lastrowid не затираются)."""
         try:
-            self.cursor.execute(query, params or ())
+            cursor = self.connection.execute(query, params or ())
             if commit:
                 self.connection.commit()
-            return self.cursor
+            return cursor
         except sqlite3.Error as e:
             logger.error(f"Database error: {e} on query: {query} with params: {params}", exc_info=True)
             self.connection.rollback()  # Откатываем транзакцию в случае ошибки
             raise
 
-    def fetchone(self, query, params=None):
-        return self.execute(query, params).fetchone()
+    def _execute_returning_sync(self, query, params=None):
+        """Выполняет изменяющий запрос с RETURNING на писателе: читает все строки и фиксирует транзакцию."""
+        try:
+            rows = self.connection.execute(query, params or ()).fetchall()
+            self.connection.commit()
+            return rows
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {e} on query: {query} with params: {params}", exc_info=True)
+            self.connection.rollback()
+            raise
+
+    def _read_connection(self) -> sqlite3.Connection:
+        return getattr(self._reader_local, "connection", None) or self.connection
+
+    def _fetchone_sync(self, query, params=None):
+        try:
+            return self._read_connection().execute(query, params or ()).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {e} on query: {query} with params: {params}", exc_info=True)
+            raise
 
-    def fetchall(self, query, params=None):
-        return self.execute(query, params).fetchall()
+    def _fetchall_sync(self, query, params=None):
+        try:
+            return self._read_connection().execute(query, params or ()).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {e} on query: {query} with params: {params}", exc_info=True)
+            raise
 
-    def close(self):
+    def _close_sync(self):
         if self.connection:
             self.connection.close()
             self.connection = None
             logger.info("Database connection closed by Database.close()")
 
-    def upsert_user(self, user_id: int, username: str | None, first_name: str | None, last_name: str | None):
+    # --- Асинхронный API для хендлеров и планировщика ---
+
+    async def run(self, func, *args):
+        """Выполняет func(*args) в потоке-писателе и возвращает результат."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, func, *args)
+
+    async def run_read(self, func, *args):
+        """Выполняет func(*args) в пуле читателей (только для запросов без записи)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, func, *args)
+
+    async def execute(self, query, params=None, commit=False):
+        return await self.run(self._execute_sync, query, params, commit)
+
+    async def execute_returning(self, query, params=None):
+        return await self.run(self._execute_returning_sync, query, params)
+
+    async def fetchone(self, query, params=None):
+        return await self.run_read(self._fetchone_sync, query, params)
+
+    async def fetchall(self, query, params=None):
+        return await self.run_read(self._fetchall_sync, query, params)
+
+    async def rebuild_counters(self):
+        await self.run(self._rebuild_counters_sync)
+
+    async def close(self):
+        if self._readers is not self._writer:
+            self._readers.shutdown(wait=True)
+        with self._reader_connections_lock:
+            for connection in self._reader_connections:
+                connection.close()
+            self._reader_connections.clear()
+        await self.run(self._close_sync)
+        self._writer.shutdown(wait=True)
+
+    async def upsert_user(self, user_id: int, username: str | None, first_name: str | None, last_name: str | None):
+        await self.run(self._upsert_user_sync, user_id, username, first_name, last_name)
+
+    def _upsert_user_sync(self, user_id: int, username: str | None, first_name: str | None, last_name: str | None):
         is_super_admin_by_id = (user_id == SUPER_ADMIN_ID)
 
         try:
-            existing_user = self.fetchone("SELECT is_admin FROM bot_users WHERE user_id = ?", (user_id,))
+            existing_user = self._fetchone_sync("SELECT is_admin FROM bot_users WHERE user_id = ?", (user_id,))
 
             if existing_user:
                 current_is_admin_db_flag = existing_user[0]
@@ -203,7 +646,7 @@ class Database:
                 # Если пользователь уже админ (не супер-админ), не снимаем с него админку.
                 new_is_admin_status = 1 if is_super_admin_by_id or current_is_admin_db_flag == 1 else 0
 
-                self.execute(
+                self._execute_sync(
                     """UPDATE bot_users
                        SET username     = ?,
                            first_name   = ?,
@@ -218,7 +661,7 @@ class Database:
             else:
                 # Новый пользователь: админ, только если это SUPER_ADMIN_ID
                 new_user_is_admin_status = 1 if is_super_admin_by_id else 0
-                self.execute(
+                self._execute_sync(
                     """INSERT INTO bot_users (user_id, username, first_name, last_name, is_admin, last_seen_at)
                        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
                     (user_id, username, first_name, last_name, new_user_is_admin_status),
@@ -0,0 +1,210 @@
+"""
+Поиск всех запрещенных слов в тексте за один проход (автомат Ахо-Корасик).
+
+build_matcher() выбирает реализацию: если установлен пакет pyahocorasick (модуль ahocorasick, на C),
+используется он, иначе - чистый Python. Для коротких списков (до SUBSTRING_SCAN_MAX_WORDS слов) автомат
+на чистом Python медленнее поиска каждого слова встроенным `in`, поэтому для них остается простой перебор.
+Все реализации возвращают один и тот же набор различных слов, встречающихся в тексте как подстроки.
+"""
+from array import array
+from collections import deque
+
+try:
+    import ahocorasick  # Необязательная ускоренная реализация: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+SUBSTRING_SCAN_MAX_WORDS = 150  # До стольких слов перебор через `in` быстрее автомата на чистом Python
+
+
+class AhoCorasick:
+    """
+    Автомат на чистом Python: переходы - словари состояний, выходы слиты по суффиксным ссылкам при сборке.
+
+    Во время сборки таблицы - словари {состояние: ...} и массив: в отличие от списков на сотни тысяч
+    элементов, их сборщик мусора не обходит (словари чисел, строк и таких же словарей он не отслеживает),
+    а сборка старшего поколения останавливает все потоки, в том числе цикл событий. Готовые таблицы -
+    кортежи: поиск по ним так же быстр, как по спискам, а после первого прохода сборщик перестает их отслеживать.
+    """
+
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(word for word in words if word))
+        goto: dict[int, dict[str, int]] = {0: {}}
+        outputs: dict[int, tuple[int, ...]] = {}
+        for index, word in enumerate(self.words):
+            state = 0
+            for char in word:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto[next_state] = {}
+                state = next_state
+            outputs[state] = outputs.get(state, ()) + (index,)
+
+        # Суффиксные ссылки обходом в ширину; выходы состояния дополняются выходами его ссылки,
+        # поэтому при поиске по ссылкам ходить не нужно
+        fail = array("l", [0]) * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                link = fail[next_state] = goto[link].get(char, 0)
+                if link in outputs:
+                    outputs[next_state] = outputs.get(next_state, ()) + outputs[link]
+        self._set_tables(goto, fail, outputs)
+
+    def _set_tables(self, goto: dict, fail, outputs: dict):
+        # Записи словарей сборки забираются pop по одной: удаление словаря на сотни тысяч записей целиком -
+        # один долгий вызов, не отпускающий GIL
+        states = range(len(goto))
+        self._goto = tuple(goto.pop(state) for state in states)
+        self._fail = tuple(fail)
+        self._outputs = tuple(outputs.pop(state, ()) for state in states)
+
+    def release(self):
+        """
+        Опустошает переходы автомата, который больше не нужен, по одному состоянию: удаление кортежа
+        сотен тысяч полных словарей - один долгий вызов, не отпускающий GIL. Искать им после этого нельзя.
+        """
+        for transitions in self._goto:
+            transitions.clear()
+
+    def to_state(self) -> dict:
+        """
+        Таблицы автомата как простые данные (списки чисел и строки) - для сохранения в JSON.
+        Бор задается родителем и символом каждого состояния, выходы - парами (состояние, индекс слова).
+        """
+        parents, chars = array("l", [0]) * len(self._goto), [""] * len(self._goto)
+        for state, transitions in enumerate(self._goto):
+            for char, next_state in transitions.items():
+                parents[next_state], chars[next_state] = state, char
+        output_states, output_words = [], []
+        for state, indexes in enumerate(self._outputs):
+            for index in indexes:
+                output_states.append(state)
+                output_words.append(index)
+        return {"words": self.words, "parents": parents[1:].tolist(), "chars": "".join(chars[1:]),
+                "fail": list(self._fail), "output_states": output_states, "output_words": output_words}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "AhoCorasick":
+        """Автомат из таблиц to_state() без повторной сборки. Несогласованные таблицы - ValueError."""
+        words, parents, chars, fail = state["words"], state["parents"], state["chars"], state["fail"]
+        output_states, output_words = state["output_states"], state["output_words"]
+        states = len(parents) + 1
+        if len(chars) != len(parents) or len(fail) != states or len(output_states) != len(output_words):
+            raise ValueError("таблицы автомата разной длины")
+        if min(fail) < 0 or max(fail) >= states or fail[0] != 0 \
+                or (output_states and (min(output_states) < 0 or max(output_states) >= states)) \
+                or (output_words and (min(output_words) < 0 or max(output_words) >= len(words))):
+            raise ValueError("ссылка на несуществующее состояние или слово")
+
+        goto: dict[int, dict[str, int]] = {state: {} for state in range(states)}
+        depth = array("l", [0]) * states
+        for next_state, (parent, char) in enumerate(zip(parents, chars), 1):
+            if not 0 <= parent < next_state:  # Родитель создается раньше потомка - бор без циклов
+                raise ValueError("неверный родитель состояния")
+            goto[parent][char] = next_state
+            depth[next_state] = depth[parent] + 1
+        # Суффиксная ссылка ведет в состояние меньшей глубины, иначе поиск мог бы зациклиться
+        if any(depth[link] >= depth[state] for state, link in enumerate(fail) if state):
+            raise ValueError("суффиксная ссылка не уменьшает глубину")
+        outputs: dict[int, tuple[int, ...]] = {}
+        for state, index in zip(output_states, output_words):
+            outputs[state] = outputs.get(state, ()) + (index,)
+
+        matcher = cls.__new__(cls)
+        matcher.words = words
+        matcher._set_tables(goto, fail, outputs)
+        return matcher
+
+    def find_all(self, text: str) -> list[str]:
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found = {}  # dict - различные индексы слов в порядке обнаружения
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                for index in outputs[state]:
+                    found[index] = None
+        return [self.words[index] for index in found]
+
+
+class PyAhoCorasick:
+    """Обертка над pyahocorasick с тем же интерфейсом и результатом, что у AhoCorasick."""
+
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(word for word in words if word))
+        self._automaton = ahocorasick.Automaton()
+        for word in self.words:
+            self._automaton.add_word(word, word)
+        if self.words:
+            self._automaton.make_automaton()
+
+    def to_state(self) -> dict:
+        return {"words": self.words}  # Автомат на C собирается быстро - сохраняются только слова
+
+    @classmethod
+    def from_state(cls, state: dict) -> "PyAhoCorasick":
+        if ahocorasick is None:
+            raise ValueError("pyahocorasick не установлен")
+        return cls(state["words"])
+
+    def find_all(self, text: str) -> list[str]:
+        if not self.words:
+            return []
+        return list(dict.fromkeys(word for _, word in self._automaton.iter(text)))
+
+
+class SubstringScan:
+    """Поиск каждого слова через `in` - для коротких списков, где сборка и обход автомата не окупаются."""
+
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(word for word in words if word))
+
+    def to_state(self) -> dict:
+        return {"words": self.words}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SubstringScan":
+        return cls(state["words"])
+
+    def find_all(self, text: str) -> list[str]:
+        return [word for word in self.words if word in text]
+
+
+MATCHER_TYPES = {cls.__name__: cls for cls in (AhoCorasick, PyAhoCorasick, SubstringScan)}
+
+
+def build_matcher(words) -> AhoCorasick | PyAhoCorasick | SubstringScan:
+    words = list(dict.fromkeys(word for word in words if word))
+    if ahocorasick is not None:
+        return PyAhoCorasick(words)
+    if len(words) <= SUBSTRING_SCAN_MAX_WORDS:
+        return SubstringScan(words)
+    return AhoCorasick(words)
+
+
+def matcher_state(matcher) -> dict:
+    """Состояние автомата build_matcher() как простые данные, с именем реализации."""
+    return {"type": type(matcher).__name__, **matcher.to_state()}
+
+
+def release_matcher(matcher):
+    """Освобождает таблицы ненужного автомата build_matcher() по частям (см. AhoCorasick.release)."""
+    if hasattr(matcher, "release"):
+        matcher.release()
+
+
+def matcher_from_state(state: dict, types: dict = MATCHER_TYPES):
+    """Автомат из matcher_state(). Неизвестная реализация или несогласованные данные - ValueError."""
+    matcher_type = types.get(state.get("type"))
+    if matcher_type is None:
+        raise ValueError(f"неизвестная реализация автомата: {state.get('type')!r}")
+    return matcher_type.from_state(state)
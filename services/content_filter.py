@@ -1,15 +1,248 @@
+import asyncio
+import hashlib
+import json
 import os
 import logging  # Добавим logging
+import sys
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl  # Блокировка файлов стоп-листа между процессами (только Unix)
+except ImportError:
+    fcntl = None
+
+from services.aho_corasick import build_matcher, matcher_state, matcher_from_state, release_matcher, MATCHER_TYPES
+from services.lru_cache import LRUCache
+from services.word_matcher import WordMatcher
 
 logger = logging.getLogger(__name__)
 
+MODE_SUBSTRING = "substring"  # Слово ищется как подстрока текста в нижнем регистре
+MODE_WORDS = "words"  # Слово ищется как целое слово нормализованного текста (см. services/word_matcher.py)
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_ADD = "+"
+JOURNAL_REMOVE = "-"
+LOCK_SUFFIX = ".lock"
+MATCHER_CACHE_SUFFIX = ".matcher.json"
+MATCHER_CACHE_FORMAT = 3  # Увеличивать при изменении устройства автоматов или файла, чтобы старые файлы не загружались
+MATCHER_CACHE_CHUNK = 20_000  # Элементов таблицы в одной строке файла автомата: json держит GIL на время всей строки
+# Реализации, которые можно восстановить из сохраненного состояния (режим words - WordMatcher)
+CACHED_MATCHER_TYPES = {**MATCHER_TYPES, WordMatcher.__name__: WordMatcher}
+VERDICT_ENTRY_OVERHEAD = 320  # Примерный размер записи кэша вердиктов без найденных слов: ключ, кортежи, узел LRU
+
+
+def read_words_files(words_file: str) -> tuple[set[str], int]:
+    """Читает снимок списка и применяет к нему журнал правок. Возвращает слова и число записей журнала."""
+    with open(words_file, 'r', encoding='utf-8') as f:
+        # Используем set() для удаления дубликатов и более быстрой проверки
+        words = {word.strip().lower() for word in f if word.strip()}
+    journal_entries = 0
+    journal_file = words_file + JOURNAL_SUFFIX
+    if os.path.exists(journal_file):
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                operation, word = line[:1], line[1:].strip()
+                if not word or not line.endswith("\n"):
+                    continue  # Пустая строка или недописанная последняя строка после сбоя
+                if operation == JOURNAL_ADD:
+                    words.add(word)
+                elif operation == JOURNAL_REMOVE:
+                    words.discard(word)
+                journal_entries += 1
+    return words, journal_entries
+
+
+def words_digest(words) -> str:
+    """
+    Отпечаток набора различных слов: по нему проверяется, подходит ли сохраненный на диске автомат.
+    Сумма хэшей слов не зависит от порядка, поэтому слова не сортируются: sorted() по сотне тысяч строк -
+    один долгий вызов, не отпускающий GIL, а цикл по словам дает циклу событий работать.
+    """
+    total = 0
+    for word in words:
+        total += int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=16).digest(), "big")
+    return f"{len(words):x}-{total % (1 << 128):032x}"
+
+
+def state_chunks(value) -> list:
+    """Таблица состояния автомата по частям не больше MATCHER_CACHE_CHUNK элементов (строки - по символам)."""
+    if isinstance(value, dict):
+        items = list(value.items())
+        return [dict(items[i:i + MATCHER_CACHE_CHUNK]) for i in range(0, len(items), MATCHER_CACHE_CHUNK)] or [value]
+    if isinstance(value, array):
+        return [value[i:i + MATCHER_CACHE_CHUNK].tolist() for i in range(0, len(value), MATCHER_CACHE_CHUNK)] or [[]]
+    if isinstance(value, (list, tuple, str)):
+        return [value[i:i + MATCHER_CACHE_CHUNK] for i in range(0, len(value), MATCHER_CACHE_CHUNK)] or [value]
+    return [value]
+
+
+def merge_state_chunks(chunks) -> dict:
+    """
+    Состояние автомата из пар [ключ, часть] в порядке state_chunks(). Таблицы чисел собираются в массивы:
+    числа каждой части освобождаются сразу, а не одним долгим удалением списка на сотни тысяч элементов.
+    """
+    state, string_parts = {}, {}
+    for key, chunk in chunks:
+        if isinstance(chunk, list) and chunk and isinstance(chunk[0], int):
+            chunk = array("q", chunk)
+        if isinstance(chunk, str):
+            if key in state:
+                raise ValueError(f"части таблицы {key!r} разных типов")
+            string_parts.setdefault(key, []).append(chunk)  # Части строки склеиваются один раз в конце
+        elif key not in state:
+            if key in string_parts:
+                raise ValueError(f"части таблицы {key!r} разных типов")
+            state[key] = chunk
+        elif isinstance(chunk, (list, array)) and type(chunk) is type(state[key]):
+            state[key].extend(chunk)
+        elif isinstance(chunk, dict) and isinstance(state[key], dict):
+            state[key].update(chunk)
+        else:
+            raise ValueError(f"части таблицы {key!r} разных типов")
+    state.update((key, "".join(parts)) for key, parts in string_parts.items())
+    return state
+
+
+def load_cached_matcher(cache_file: str, mode: str, digest: str):
+    """
+    Автомат, сохраненный этим или другим процессом для того же режима и набора слов, или None.
+    Файл - строки JSON: заголовок (формат, режим, отпечаток слов), затем строки [ключ, часть таблицы]
+    (см. state_chunks) - простые данные без исполняемого содержимого, из которых собираются объекты
+    автомата. Таблицы читаются, только если заголовок подходит, и разбираются небольшими частями, чтобы
+    разбор не держал GIL подолгу; слова в них еще раз сверяются с отпечатком.
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if (header["format"], header["mode"], header["digest"]) != (MATCHER_CACHE_FORMAT, mode, digest):
+                return None
+            state = merge_state_chunks(json.loads(line) for line in f)
+        matcher = matcher_from_state(state, CACHED_MATCHER_TYPES)
+        if words_digest(matcher.words) != digest:
+            raise ValueError("слова автомата не совпадают с отпечатком")
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # Поврежденный файл или автомат другой реализации (например, без pyahocorasick)
+        logger.warning(f"Не удалось загрузить сохраненный автомат {cache_file}: {e}")
+        return None
+    return matcher
+
+
+def save_cached_matcher(cache_file: str, mode: str, digest: str, matcher):
+    """Сохраняет автомат для других процессов: запись во временный файл и атомарная подмена."""
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"format": MATCHER_CACHE_FORMAT, "mode": mode, "digest": digest}) + "\n")
+            for key, value in matcher_state(matcher).items():
+                for chunk in state_chunks(value):
+                    f.write(json.dumps([key, chunk], ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить автомат в {cache_file}: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
 
 class ContentFilter:
-    def __init__(self, words_file):
+    """
+    Глобальный список запрещенных слов.
+
+    На диске список - это снимок (words_file, по слову в строке) и журнал правок рядом с ним
+    (words_file + ".journal", строки "+слово" и "-слово"). Правка дописывает в журнал одну строку,
+    а не переписывает весь файл; когда в журнале набирается compact_every записей, он сворачивается
+    в новый снимок, который атомарно подменяет старый (os.replace). Запись на диск и пересборка
+    автомата выполняются в отдельном потоке, не блокируя цикл событий.
+
+    Несколько процессов могут работать с одними файлами: запись и чтение идут под блокировкой
+    (words_file + ".lock"), а наблюдатель (start_watching) раз в reload_interval секунд проверяет
+    время изменения и размер файлов и при чужих правках перечитывает список. Новый автомат
+    собирается в фоне и подменяет прежний одним присваиванием, так что check_text всегда работает
+    с целым автоматом. Таблицы собранного автомата сохраняются рядом (words_file + ".matcher.json"), и процесс,
+    запускающийся с тем же списком, восстанавливает автомат из них вместо сборки.
+
+    Результаты check_text кэшируются (LRU, не больше cache_entries записей и примерно cache_bytes байт)
+    по хэшу текста и версии автомата: один и тот же текст в сценарии создания поста проверяется
+    несколько раз, а любая подмена автомата увеличивает версию, и старые вердикты больше не находятся.
+    """
+
+    def __init__(self, words_file, mode: str = MODE_SUBSTRING, compact_every: int = 1000,
+                 reload_interval: float = 0, cache_entries: int = 10000, cache_bytes: int = 4 * 1024 * 1024):
         self.banned_words = set()  # Используем set для более быстрой проверки наличия слова
         self.words_file = words_file
+        self.journal_file = words_file + JOURNAL_SUFFIX
+        self.lock_file = words_file + LOCK_SUFFIX
+        self.matcher_cache_file = words_file + MATCHER_CACHE_SUFFIX
+        if mode not in (MODE_SUBSTRING, MODE_WORDS):
+            logger.warning(f"Неизвестный режим фильтра '{mode}', используется '{MODE_SUBSTRING}'.")
+            mode = MODE_SUBSTRING
+        self.mode = mode
+        self.compact_every = compact_every
+        self.reload_interval = reload_interval
+        self._journal_entries = 0
+        self._known_files_stat = None  # Время изменения и размер файлов на момент последнего чтения
+        self._watch_task = None
+        self._matcher_dirty = False  # Список изменился после начала последней пересборки автомата
+        self._rebuild_task = None
+        self._edits_in_flight = 0  # Собственные правки, которые сейчас записываются в журнал
+        self._edit_generation = 0  # Увеличивается по завершении каждой собственной правки
+        # Один поток: записи в журнал, сворачивание и пересборки выполняются строго по очереди
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="content-filter")
+        self._matcher = build_matcher(())  # Автомат Ахо-Корасик по banned_words, пересобирается при изменении списка
+        self._matcher_version = 0  # Увеличивается при каждой подмене автомата; входит в ключ кэша вердиктов
+        self._verdicts = LRUCache(cache_entries, cache_bytes, self._verdict_size)
         self.load_words()
 
+    def _build_matcher(self, words):
+        if self.mode == MODE_WORDS:
+            return WordMatcher(words)
+        return build_matcher(words)
+
+    def _matcher_for(self, words):
+        """Автомат для набора слов: сохраненный на диске, если он подходит, иначе собранный заново."""
+        digest = words_digest(words)
+        matcher = load_cached_matcher(self.matcher_cache_file, self.mode, digest)
+        if matcher is None:
+            matcher = self._build_matcher(words)
+            # Сохранение - следующей задачей в потоке фильтра, чтобы не задерживать подмену автомата
+            self._io.submit(save_cached_matcher, self.matcher_cache_file, self.mode, digest, matcher)
+        return matcher
+
+    def _set_matcher(self, matcher):
+        previous, self._matcher = self._matcher, matcher
+        self._matcher_version += 1
+        self._verdicts.clear()  # Вердикты прежней версии уже не найдутся по ключу - освобождаем память сразу
+        # Прежний автомат освобождается по частям в потоке фильтра, после уже поставленных туда задач
+        # (в том числе его сохранения): check_text ищет синхронно в цикле событий, так что после подмены
+        # прежним автоматом никто не пользуется, а удаление целиком остановило бы цикл событий
+        self._io.submit(release_matcher, previous)
+
+    def _rebuild_matcher(self):
+        self._set_matcher(self._matcher_for(frozenset(self.banned_words)))
+
+    async def _rebuild_matcher_async(self):
+        """
+        Пересобирает автомат в потоке фильтра и ждет, пока в нем появятся текущие правки.
+        Правки, сделанные во время сборки, попадают в одну следующую пересборку, а не в отдельную на каждую.
+        """
+        self._matcher_dirty = True
+        if self._rebuild_task is None:
+            self._rebuild_task = asyncio.create_task(self._rebuild_while_dirty())
+        await asyncio.shield(self._rebuild_task)
+
+    async def _rebuild_while_dirty(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._matcher_dirty:
+                self._matcher_dirty = False
+                words = frozenset(self.banned_words)
+                self._set_matcher(await loop.run_in_executor(self._io, self._matcher_for, words))
+        finally:
+            self._rebuild_task = None
+
     def load_words(self):
         try:
             if not os.path.exists(self.words_file):
@@ -18,73 +251,214 @@ class ContentFilter:
                 # Создаем пустой файл, если его нет, чтобы избежать ошибок при первой записи
                 with open(self.words_file, 'a', encoding='utf-8') as f:
                     pass
-                self.banned_words = set()
-                return
-
-            with open(self.words_file, 'r', encoding='utf-8') as f:
-                # Используем set() для удаления дубликатов и более быстрой проверки
-                self.banned_words = {word.strip().lower() for word in f if word.strip()}
-            logger.info(f"Загружено {len(self.banned_words)} запрещенных слов из {self.words_file}")
+            self._known_files_stat = self._files_stat()
+            self.banned_words, self._journal_entries = self._read_files_sync()
+            logger.info(f"Загружено {len(self.banned_words)} запрещенных слов из {self.words_file} "
+                        f"(записей в журнале: {self._journal_entries})")
         except Exception as e:
             logger.error(f"Ошибка загрузки запрещенных слов из {self.words_file}: {e}", exc_info=True)
             self.banned_words = set()
+        self._rebuild_matcher()
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        """Блокировка файлов стоп-листа между процессами; без fcntl - только порядок внутри процесса."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _local_edit(self):
+        """Собственная правка процесса: перечитывание, заставшее ее, не подменяет список в памяти (см. reload_if_changed)."""
+        self._edits_in_flight += 1
+        try:
+            yield
+        finally:
+            self._edits_in_flight -= 1
+            self._edit_generation += 1
+
+    def _files_stat(self):
+        result = []
+        for path in (self.words_file, self.journal_file):
+            try:
+                stat = os.stat(path)
+                result.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                result.append(None)
+        return tuple(result)
+
+    def _read_files_sync(self):
+        with self._locked(shared=True):
+            return read_words_files(self.words_file)
+
+    def start_watching(self):
+        """Запускает наблюдение за файлами списка (если задан reload_interval)."""
+        if self.reload_interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch_loop(), name="banned-words-watcher")
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    async def _watch_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload_if_changed()
+            except Exception as e:
+                logger.error(f"Ошибка перечитывания списка запрещенных слов: {e}", exc_info=True)
+
+    async def reload_if_changed(self) -> bool:
+        """Перечитывает список, если файлы изменились (например, другим процессом). True - список обновлен."""
+        loop = asyncio.get_running_loop()
+        edit_generation = self._edit_generation
+        files_stat = await loop.run_in_executor(self._io, self._files_stat)
+        if files_stat == self._known_files_stat:
+            return False
+        # Время и размер берутся до чтения: правка во время чтения будет замечена при следующей проверке
+        words, journal_entries = await loop.run_in_executor(self._io, self._read_files_sync)
+        if self._edits_in_flight or self._edit_generation != edit_generation:
+            # Во время чтения процесс сам правил список: снимок может не содержать правку, которая уже
+            # в памяти. Известное состояние файлов не обновляется - перечитаем при следующей проверке
+            return False
+        self._known_files_stat = files_stat
+        self._journal_entries = journal_entries
+        if words == self.banned_words:
+            return False  # Изменения - собственные правки этого процесса, они уже в памяти
+        self.banned_words = words
+        await self._rebuild_matcher_async()
+        logger.info(f"Список запрещенных слов изменился на диске, перечитано {len(words)} слов.")
+        return True
+
+    def _find(self, matcher, text: str) -> list:
+        if not text:
+            return []
+        if self.mode == MODE_WORDS:
+            return matcher.find_all(text)  # WordMatcher сам нормализует текст
+        # Все слова из banned_words, входящие в текст как подстроки, - за один проход автомата
+        # вместо отдельного поиска каждого слова
+        return matcher.find_all(text.lower())
+
+    @staticmethod
+    def _verdict_size(key, found: tuple) -> int:
+        return VERDICT_ENTRY_OVERHEAD + sum(sys.getsizeof(word) for word in found)
 
     def check_text(self, text: str) -> list:
         if not text:
             return []
-        text_lower = text.lower()
-        # Находим все вхождения слов из banned_words в text_lower
-        # Можно использовать более сложный поиск по словам, но для простоты оставим так
-        found_words = [word for word in self.banned_words if word in text_lower]
-        return found_words
-
-    def _save_words_to_file(self):
-        """Приватный метод для сохранения текущего набора слов в файл."""
+        key = (self._matcher_version, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        found = self._verdicts.get(key)
+        if found is None:
+            found = tuple(self._find(self._matcher, text))
+            self._verdicts.put(key, found)
+        return list(found)
+
+    def cache_stats(self) -> dict:
+        """Статистика кэша вердиктов check_text (для /admin_stats)."""
+        return {**self._verdicts.stats(), "version": self._matcher_version}
+
+    def checker_for(self, words):
+        """Проверка текста только на заданные слова, по тем же правилам, что и check_text (для повторной проверки)."""
+        matcher = self._build_matcher(words)
+        return lambda text: self._find(matcher, text)
+
+    def _append_journal_sync(self, operation: str, words: list[str]):
+        """Дописывает правки в журнал одной записью на диск (выполняется в потоке фильтра)."""
+        with self._locked(), open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write("".join(f"{operation}{word}\n" for word in words))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact_sync(self):
+        """
+        Сворачивает журнал в новый снимок (выполняется в потоке фильтра).
+        Снимок строится из файлов, а не из памяти, поэтому в него попадают ровно записанные правки.
+        Сбой до os.replace оставляет прежние снимок и журнал; сбой после - новый снимок и журнал,
+        повторное применение которого ничего не меняет.
+        """
+        with self._locked():
+            words, _ = read_words_files(self.words_file)
+            tmp_file = f"{self.words_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write("".join(f"{word}\n" for word in sorted(words)))  # Отсортированный список для порядка в файле
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.words_file)
+            with open(self.journal_file, 'w', encoding='utf-8'):
+                pass
+        return len(words)
+
+    async def _write_journal(self, operation: str, words: list[str]) -> bool:
+        loop = asyncio.get_running_loop()
         try:
-            with open(self.words_file, 'w', encoding='utf-8') as f:
-                for word in sorted(list(self.banned_words)):  # Сохраняем отсортированный список для порядка в файле
-                    f.write(f"{word}\n")
-            return True
+            await loop.run_in_executor(self._io, self._append_journal_sync, operation, words)
         except Exception as e:
-            logger.error(f"Ошибка записи списка запрещенных слов в файл {self.words_file}: {e}", exc_info=True)
+            logger.error(f"Ошибка записи в журнал запрещенных слов {self.journal_file}: {e}", exc_info=True)
             return False
+        self._journal_entries += len(words)
+        if self._journal_entries >= self.compact_every:
+            try:
+                words_count = await loop.run_in_executor(self._io, self._compact_sync)
+                self._journal_entries = 0
+                logger.info(f"Журнал запрещенных слов свернут в {self.words_file} ({words_count} слов).")
+            except Exception as e:
+                # Журнал остается целым, свернем при следующей правке
+                logger.error(f"Ошибка сворачивания журнала запрещенных слов: {e}", exc_info=True)
+        return True
+
+    async def add_words(self, words) -> list[str] | None:
+        """
+        Добавляет слова одной записью в журнал и одной пересборкой автомата.
+        Возвращает новые (которых еще не было в списке) слова или None, если журнал записать не удалось.
+        """
+        new_words = list(dict.fromkeys(
+            word.strip().lower() for word in words if word.strip() and word.strip().lower() not in self.banned_words
+        ))
+        if not new_words:
+            return []
+        with self._local_edit():
+            if not await self._write_journal(JOURNAL_ADD, new_words):
+                logger.error(f"Не удалось сохранить {len(new_words)} слов в журнал, изменение отменено.")
+                return None
+            self.banned_words.update(new_words)
+        await self._rebuild_matcher_async()
+        logger.info(f"Добавлено и сохранено запрещенных слов: {len(new_words)}.")
+        return new_words
 
-    def add_word(self, word: str) -> bool:
+    async def add_word(self, word: str) -> bool:
         word_lower = word.strip().lower()
         if not word_lower:
             logger.warning("Попытка добавить пустое запрещенное слово.")
             return False
 
-        if word_lower not in self.banned_words:
-            self.banned_words.add(word_lower)
-            if self._save_words_to_file():
-                logger.info(f"Запрещенное слово '{word_lower}' добавлено и сохранено.")
-                return True
-            else:
-                # Если сохранить не удалось, откатываем добавление в память
-                self.banned_words.discard(word_lower)
-                logger.error(f"Не удалось сохранить слово '{word_lower}' в файл, изменение отменено.")
-                return False
-        else:
+        if word_lower in self.banned_words:
             logger.info(f"Запрещенное слово '{word_lower}' уже в списке.")
             return False  # Слово уже было, но это не ошибка, просто не добавили заново
+        return bool(await self.add_words([word_lower]))
 
-    def remove_word(self, word: str) -> bool:
+    async def remove_word(self, word: str) -> bool:
         word_lower = word.strip().lower()
         if not word_lower:
             logger.warning("Попытка удалить пустое запрещенное слово.")
             return False
 
         if word_lower in self.banned_words:
-            self.banned_words.discard(word_lower)  # Используем discard, чтобы не было ошибки, если слова вдруг нет
-            if self._save_words_to_file():
-                logger.info(f"Запрещенное слово '{word_lower}' удалено и файл обновлен.")
-                return True
-            else:
-                # Если сохранить не удалось, возвращаем слово в память
-                self.banned_words.add(word_lower)
-                logger.error(f"Не удалось обновить файл после удаления слова '{word_lower}', изменение отменено.")
-                return False
+            with self._local_edit():
+                if not await self._write_journal(JOURNAL_REMOVE, [word_lower]):
+                    logger.error(f"Не удалось записать удаление слова '{word_lower}' в журнал, изменение отменено.")
+                    return False
+                self.banned_words.discard(word_lower)  # Используем discard, чтобы не было ошибки, если слова вдруг нет
+            await self._rebuild_matcher_async()
+            logger.info(f"Запрещенное слово '{word_lower}' удалено, правка записана в журнал.")
+            return True
         else:
             logger.info(f"Запрещенное слово '{word_lower}' не найдено в списке для удаления.")
-            return False  # Слова не было, это не ошибка, просто не удалили
\ No newline at end of file
+            return False  # Слова не было, это не ошибка, просто не удалили.
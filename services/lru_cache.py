@@ -0,0 +1,63 @@
+"""
+Ограниченный LRU-кэш для кэшей процесса (вердикты фильтра, автоматы стоп-листов, разобранные шаблоны).
+
+Размер ограничивается числом записей и, если задан sizeof, примерной суммой их размеров в байтах:
+при превышении любого предела вытесняются давно не использованные записи. Кэш рассчитан на работу
+из цикла событий, без блокировок.
+"""
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_entries: int, max_bytes: int | None = None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof  # sizeof(key, value) -> примерный размер записи в байтах
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        size = self._sizeof(key, value) if self._sizeof is not None else 0
+        old_entry = self._entries.pop(key, None)
+        if old_entry is not None:
+            self._bytes -= old_entry[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self._bytes -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from aiogram import types
+
+from config import ALBUM_COLLECT_SECONDS
+
+# Альбом хранится в posts.media / templates.media как JSON-список пар [тип, file_id] в порядке отправки,
+# media_type при этом 'album'. Одиночные фото и видео хранятся как раньше: file_id и 'photo' / 'video'.
+MEDIA_TYPE_ALBUM = "album"
+ALBUM_MAX_ITEMS = 10  # Ограничение Telegram на sendMediaGroup
+
+
+def message_media(message: types.Message) -> tuple[str, str] | None:
+    """(тип, file_id) фото или видео из сообщения, None - если медиа нет."""
+    if message.photo:
+        return "photo", message.photo[-1].file_id
+    if message.video:
+        return "video", message.video.file_id
+    return None
+
+
+def pack_album(items: list[tuple[str, str]]) -> str:
+    return json.dumps([list(item) for item in items[:ALBUM_MAX_ITEMS]], separators=(",", ":"))
+
+
+def unpack_album(media: str) -> list[tuple[str, str]]:
+    return [(item_type, file_id) for item_type, file_id in json.loads(media)]
+
+
+def album_input_media(items: list[tuple[str, str]], caption: str | None = None,
+                      parse_mode: str | None = None) -> list[types.InputMediaPhoto | types.InputMediaVideo]:
+    """InputMedia для sendMediaGroup; подпись Telegram показывает у первого элемента альбома."""
+    input_media = []
+    for index, (item_type, file_id) in enumerate(items):
+        item_caption = caption if index == 0 and caption else None
+        media_class = types.InputMediaVideo if item_type == "video" else types.InputMediaPhoto
+        input_media.append(media_class(media=file_id, caption=item_caption,
+                                       parse_mode=parse_mode if item_caption else None))
+    return input_media
+
+
+def media_label(media_type: str | None, album_size: int | None = None) -> str:
+    """Короткая подпись о вложении для списков постов и шаблонов."""
+    if media_type == MEDIA_TYPE_ALBUM:
+        return f"🖼 Альбом ({album_size})" if album_size else "🖼 Альбом"
+    return {"photo": "🖼 Фото", "video": "🎬 Видео"}.get(media_type, "")
+
+
+class AlbumCollector:
+    """
+    Собирает альбом, который Telegram присылает отдельными сообщениями с общим media_group_id.
+    Первое сообщение альбома ждет, пока новые части не перестанут приходить ALBUM_COLLECT_SECONDS,
+    и получает весь альбом; остальные сообщения только добавляются к нему и получают None.
+    Работает потому, что диспетчер обрабатывает апдейты параллельными задачами.
+    """
+
+    def __init__(self, delay: float = ALBUM_COLLECT_SECONDS):
+        self._delay = delay
+        self._albums: dict[tuple[int, str], list[types.Message]] = {}
+
+    async def collect(self, message: types.Message) -> list[types.Message] | None:
+        key = (message.chat.id, message.media_group_id)
+        album = self._albums.get(key)
+        if album is not None:
+            album.append(message)
+            return None
+
+        album = self._albums[key] = [message]
+        try:
+            while True:
+                received = len(album)
+                await asyncio.sleep(self._delay)
+                if len(album) == received:
+                    break
+        finally:
+            del self._albums[key]
+        return sorted(album, key=lambda album_message: album_message.message_id)
+
+
+album_collector = AlbumCollector()
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Методы Bot API, которые отправляют новое сообщение в чат и попадают под лимиты Telegram
+THROTTLED_API_METHODS = {"forwardMessage", "forwardMessages", "copyMessage", "copyMessages"}
+
+# Сколько бакетов чатов держать, прежде чем удалять простаивающие
+CHAT_BUCKETS_CLEANUP_THRESHOLD = 10_000
+
+# Слот чата, заранее забронированный через try_reserve_chat (пулом публикации): первая отправка
+# в этот чат из той же задачи не бронирует его повторно
+_reserved_chat: ContextVar[list | None] = ContextVar("reserved_chat", default=None)
+
+
+@contextmanager
+def chat_slot_reserved(chat_id: int | str):
+    """Внутри блока первая отправка в chat_id использует уже забронированный слот чата."""
+    token = _reserved_chat.set([chat_id])
+    try:
+        yield
+    finally:
+        _reserved_chat.reset(token)
+
+
+class TokenBucket:
+    """
+    Токен-бакет в форме GCRA: вместо счетчика токенов хранится теоретическое время следующей отправки (tat).
+    reserve() сразу бронирует слот и возвращает момент, когда его можно использовать,
+    поэтому ожидающие обслуживаются строго в порядке обращения.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (max(1, burst) - 1)
+        self.tat = 0.0
+
+    def reserve(self, now: float) -> float:
+        allowed_at = max(now, self.tat - self.tolerance)
+        self.tat = max(self.tat, allowed_at) + self.interval
+        return allowed_at
+
+    def ready_at(self) -> float:
+        """Момент, с которого reserve() вернет слот без ожидания."""
+        return self.tat - self.tolerance
+
+    def is_idle(self, now: float) -> bool:
+        """Бакет полностью восстановился - его можно удалить без потери состояния."""
+        return self.tat <= now
+
+
+class TelegramRateLimiter:
+    """
+    Ограничитель исходящих сообщений: глобальный бакет на бота и отдельный бакет на каждый chat_id.
+    acquire() не бросает ошибку, а ждет своей очереди. Часы и sleep можно подменить (для проверки на
+    симулированном времени).
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, group_rate: float, chat_burst: int = 1,
+                 global_burst: int = 1, clock=time.monotonic, sleep=asyncio.sleep):
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chat_rate = chat_rate
+        self._group_rate = group_rate
+        self._chat_burst = chat_burst
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._clock = clock
+        self._sleep = sleep
+
+        # Метрики
+        self.waiting = 0  # Текущая глубина очереди ожидающих отправки
+        self.max_waiting = 0
+        self.acquired = 0
+        self.delayed = 0  # Сколько отправок пришлось задержать
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _chat_bucket(self, chat_id: int | str, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_CLEANUP_THRESHOLD:
+                self._chats = {cid: b for cid, b in self._chats.items() if not b.is_idle(now)}
+            # Отрицательный id или @username - группа или канал, у них свой (поминутный) лимит
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(self._group_rate if is_group else self._chat_rate, self._chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _wait_until(self, moment: float):
+        delay = moment - self._clock()
+        if delay > 0:
+            await self._sleep(delay)
+
+    def chat_delay(self, chat_id: int | str) -> float:
+        """Через сколько секунд освободится слот чата (0 - свободен сейчас); ничего не бронирует."""
+        now = self._clock()
+        return max(0.0, self._chat_bucket(chat_id, now).ready_at() - now)
+
+    def try_reserve_chat(self, chat_id: int | str) -> float:
+        """
+        Бронирует слот чата, если он свободен прямо сейчас, и возвращает 0. Иначе ничего не бронирует
+        и возвращает, через сколько секунд слот освободится - вызывающий может заняться другим чатом.
+        """
+        delay = self.chat_delay(chat_id)
+        if delay == 0:
+            self._chat_bucket(chat_id, self._clock()).reserve(self._clock())
+        return delay
+
+    @staticmethod
+    def _take_reserved(chat_id: int | str) -> bool:
+        reserved = _reserved_chat.get()
+        if reserved and reserved[0] == chat_id:
+            reserved.clear()
+            return True
+        return False
+
+    async def acquire(self, chat_id: int | str | None = None):
+        """Дожидается разрешения на отправку одного сообщения в chat_id (None - только глобальный лимит)."""
+        started = self._clock()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            # Сначала лимит чата, потом глобальный: пока ждем чат, глобальные слоты достаются другим чатам
+            if chat_id is not None and not self._take_reserved(chat_id):
+                await self._wait_until(self._chat_bucket(chat_id, started).reserve(started))
+            await self._wait_until(self._global.reserve(self._clock()))
+        finally:
+            self.waiting -= 1
+        waited = self._clock() - started
+        self.acquired += 1
+        if waited > 0:
+            self.delayed += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait": self.max_wait,
+            "chats_tracked": len(self._chats),
+        }
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: каждая отправка сообщения (bot.send_*, message.answer и т.д.) проходит через лимитер."""
+
+    def __init__(self, limiter: TelegramRateLimiter):
+        self.limiter = limiter
+
+    async def __call__(self, make_request, bot, method):
+        api_method = getattr(method, "__api_method__", "")
+        if api_method.startswith("send") or api_method in THROTTLED_API_METHODS:
+            await self.limiter.acquire(getattr(method, "chat_id", None))
+        return await make_request(bot, method)
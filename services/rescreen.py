@@ -0,0 +1,158 @@
+"""
+Повторная проверка запланированных постов после пополнения списка запрещенных слов.
+
+Посты проверяются при создании, поэтому слово, добавленное позже, не мешает уже запланированным постам
+выйти. PostRescreener получает только добавленные слова (words_added вызывают хендлеры администратора),
+собирает автомат по ним одним и проходит по постам в статусе 'scheduled' порциями в порядке времени
+публикации - ближайшие проверяются первыми. Стоимость зависит от числа добавленных слов и
+запланированных постов, а не от размера всего списка. Слова, добавленные в список канала или
+пользователя (services.scoped_words), проверяются только по постам этого канала или пользователя.
+Найденные посты по RESCREEN_POLICY снимаются
+с публикации (статус 'held') или только отмечаются, владелец получает одно сводное уведомление.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from loader import bot, get_db, content_filter
+from bot_utils import notify_user, escape_html
+from config import RESCREEN_POLICY, RESCREEN_CHUNK_SIZE
+from services.scoped_words import SCOPE_CHANNEL, SCOPE_USER
+
+logger = logging.getLogger(__name__)
+
+POLICY_HOLD = "hold"  # Снять пост с публикации: статус 'held', причина - в last_error
+POLICY_FLAG = "flag"  # Оставить пост в очереди и только предупредить владельца
+NOTIFICATION_MAX_LENGTH = 4000
+# Условие на посты области; значение подставляется параметром
+SCOPE_CONDITIONS = {SCOPE_CHANNEL: "AND p.channel_id = ?", SCOPE_USER: "AND p.user_id = ?"}
+
+
+def screen_rows(checker, rows: list) -> list[tuple]:
+    """Проверяет порцию постов (выполняется в пуле потоков). Возвращает [(строка поста, найденные слова)]."""
+    matches = []
+    for row in rows:
+        found = checker(row[3])
+        if found:
+            matches.append((row, found))
+    return matches
+
+
+class PostRescreener:
+    def __init__(self, policy: str = RESCREEN_POLICY, chunk_size: int = RESCREEN_CHUNK_SIZE):
+        if policy not in (POLICY_HOLD, POLICY_FLAG):
+            logger.warning(f"Unknown RESCREEN_POLICY '{policy}', using '{POLICY_HOLD}'.")
+            policy = POLICY_HOLD
+        self.policy = policy
+        self.chunk_size = chunk_size
+        # Область (None - общий список, иначе (scope_type, scope_id)) -> добавленные слова
+        self._pending_words: dict[tuple[str, int] | None, set[str]] = {}
+        self._task: asyncio.Task | None = None
+
+    def words_added(self, words, scope: tuple[str, int] | None = None):
+        """
+        Запускает (или дополняет уже идущую) повторную проверку на добавленные слова.
+        scope - (scope_type, scope_id), если слова добавлены в список канала или пользователя.
+        """
+        if words:
+            self._pending_words.setdefault(scope, set()).update(words)
+        if self._pending_words and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(), name="post-rescreen")
+
+    async def wait(self):
+        """Дожидается окончания текущей проверки."""
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        # Слова, добавленные во время проверки, проверяются следующим проходом
+        while self._pending_words:
+            pending, self._pending_words = self._pending_words, {}
+            for scope, words in pending.items():
+                try:
+                    checked, matched = await self.rescreen(words, scope)
+                    logger.info(f"Re-screened {checked} scheduled post(s) against {len(words)} new banned word(s)"
+                                f"{f' of {scope[0]} {scope[1]}' if scope else ''}: {matched} matched "
+                                f"(policy '{self.policy}').")
+                except Exception as e:
+                    logger.error(f"Ошибка повторной проверки запланированных постов: {e}", exc_info=True)
+
+    async def rescreen(self, words, scope: tuple[str, int] | None = None) -> tuple[int, int]:
+        """
+        Проверяет запланированные посты на words (только посты канала или пользователя, если задана scope).
+        Возвращает (проверено постов, найдено совпадений).
+        """
+        db = get_db()
+        scope_condition, scope_params = (SCOPE_CONDITIONS[scope[0]], (scope[1],)) if scope else ("", ())
+        loop = asyncio.get_running_loop()
+        checker = await loop.run_in_executor(None, content_filter.checker_for, frozenset(words))
+        checked, matched = 0, 0
+        found_by_user: dict[int, list[str]] = {}
+        last_time, last_id = "", 0
+        while True:
+            # Ключ продолжения (publish_time, id) идет по индексу idx_posts_status_time без сортировки
+            rows = await db.fetchall(
+                f"""SELECT p.id, p.user_id, p.channel_id, p.content, p.publish_time,
+                          (SELECT title FROM channels ch WHERE ch.channel_id = p.channel_id AND ch.user_id = p.user_id)
+                   FROM posts p
+                   WHERE p.status = 'scheduled' AND (p.publish_time, p.id) > (?, ?) {scope_condition}
+                   ORDER BY p.publish_time, p.id LIMIT ?""",
+                (last_time, last_id, *scope_params, self.chunk_size)
+            )
+            if not rows:
+                break
+            checked += len(rows)
+            last_time, last_id = rows[-1][4], rows[-1][0]
+            for row, found in await loop.run_in_executor(None, screen_rows, checker, rows):
+                if await self._apply_policy(row[0], found):
+                    matched += 1
+                    found_by_user.setdefault(row[1], []).append(self._post_line(row, found))
+            if len(rows) < self.chunk_size:
+                break
+
+        for user_id, lines in found_by_user.items():
+            await self._notify_owner(user_id, lines)
+        return checked, matched
+
+    async def _apply_policy(self, post_id: int, found: list[str]) -> bool:
+        """Снимает пост с публикации; False - пост уже не в очереди (опубликован, отменен, забран воркером)."""
+        if self.policy == POLICY_FLAG:
+            return True
+        cursor = await get_db().execute(
+            "UPDATE posts SET status = 'held', last_error = ? WHERE id = ? AND status = 'scheduled'",
+            (f"Запрещенные слова: {', '.join(found)}", post_id),
+            commit=True
+        )
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _post_line(row: tuple, found: list[str]) -> str:
+        post_id, _, channel_id, _, publish_time, channel_title = row
+        publish_time_str = datetime.fromisoformat(publish_time).strftime('%d.%m.%Y %H:%M')
+        title = escape_html(channel_title) if channel_title else f"ID {channel_id}"
+        return (f"▫️ Пост #{post_id} в «{title}» на {publish_time_str}: "
+                f"<code>{escape_html(', '.join(found))}</code>")
+
+    async def _notify_owner(self, user_id: int, lines: list[str]):
+        if self.policy == POLICY_HOLD:
+            header = ("🛑 В список запрещенных добавлены новые слова, и они найдены в ваших запланированных постах. "
+                      "Эти посты сняты с публикации - создайте их заново без этих слов:\n")
+        else:
+            header = ("⚠️ В список запрещенных добавлены новые слова, и они найдены в ваших запланированных постах. "
+                      "Посты остаются в очереди - проверьте и при необходимости отмените их:\n")
+        text = header
+        for index, line in enumerate(lines):
+            if len(text) + len(line) + 1 > NOTIFICATION_MAX_LENGTH:
+                text += f"\n…и еще {len(lines) - index}"
+                break
+            text += f"\n{line}"
+        await notify_user(bot, user_id, text, parse_mode="HTML")
+
+
+post_rescreener = PostRescreener()
@@ -0,0 +1,32 @@
+import asyncio
+import random
+
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+
+from config import PUBLISH_MAX_ATTEMPTS, PUBLISH_RETRY_BASE_SECONDS, PUBLISH_RETRY_MAX_SECONDS
+
+# Временные ошибки: флуд-контроль Telegram, сетевые сбои и таймауты, ответы 5xx.
+# Все остальное (BadRequest, Forbidden, NotFound, ошибки в данных поста) повтором не исправить.
+TRANSIENT_ERRORS = (TelegramRetryAfter, TelegramNetworkError, TelegramServerError, asyncio.TimeoutError,
+                    ConnectionError)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+def retry_delay(error: BaseException, attempt: int, rand=random.random) -> float:
+    """
+    Задержка перед следующей попыткой (attempt - номер уже неудавшейся попытки, с 1).
+    Экспоненциальный рост с "полным джиттером", чтобы повторы не приходили пачкой;
+    для TelegramRetryAfter - не раньше указанного сервером retry_after.
+    """
+    backoff = min(PUBLISH_RETRY_MAX_SECONDS, PUBLISH_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    delay = backoff * rand()
+    if isinstance(error, TelegramRetryAfter):
+        delay = error.retry_after + min(delay, PUBLISH_RETRY_BASE_SECONDS)
+    return delay
+
+
+def should_retry(error: BaseException, attempt: int) -> bool:
+    return is_transient_error(error) and attempt < PUBLISH_MAX_ATTEMPTS
@@ -1,155 +1,751 @@
-from datetime import datetime
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.jobstores.base import JobLookupError  # Для обработки ошибки, если задача не найдена
-from aiogram import Bot
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from aiogram import Bot, types
 import logging
 
-from loader import get_db
-from bot_utils import notify_post_published, notify_user, escape_html
+from loader import bot, get_db, rate_limiter
+from bot_utils import notify_post_published, notify_user, escape_html, channel_post_link
+from config import (PUBLISH_WORKERS, DISPATCH_BATCH_SIZE, DISPATCH_MAX_SLEEP_SECONDS, PUBLISH_MAX_ATTEMPTS,
+                    INTERACTIVE_LANE_WEIGHT, BULK_LANE_WEIGHT, MISFIRE_POLICY, MISFIRE_GRACE_SECONDS,
+                    MISFIRE_REPLAY_RATE, INSTANCE_ID, PUBLISH_LEASE_SECONDS, PUBLISH_SHUTDOWN_GRACE_SECONDS)
+from services.rate_limiter import TokenBucket, TelegramRateLimiter, chat_slot_reserved
+from services.media import MEDIA_TYPE_ALBUM, unpack_album, album_input_media
+from services.retry_policy import should_retry, retry_delay
 
 logger = logging.getLogger(__name__)
 
+# Полосы пула публикации
+LANE_INTERACTIVE = "interactive"  # Действия пользователя: немедленная публикация
+LANE_BULK = "bulk"  # Отложенные посты от диспетчера
 
-def add_scheduled_job(scheduler_instance: AsyncIOScheduler, bot_instance: Bot, data: dict):
-    required_keys = ['post_db_id', 'publish_time', 'channel_id', 'user_id', 'channel_title']
-    # Проверка на media_type если есть media
-    if data.get('media') and 'media_type' not in data:
-        logger.error(
-            f"Ошибка планирования: есть 'media', но отсутствует 'media_type' в данных для поста {data.get('post_db_id')}.")
-        # Уведомление пользователя должно происходить в вызывающем коде (handlers/posts.py)
-        # Здесь просто прекращаем выполнение, чтобы не запланировать некорректную задачу.
-        return False  # Возвращаем False при ошибке
+# Владелец аренды постов: несколько экземпляров бота могут делить одну таблицу posts
+PUBLISHER_ID = INSTANCE_ID or f"{socket.gethostname()}:{os.getpid()}"
 
-    for key in required_keys:
-        if key not in data:
-            logger.error(
-                f"Ошибка планирования: отсутствует ключ '{key}' в данных задачи для поста {data.get('post_db_id')}.")
-            return False  # Возвращаем False при ошибке
+# Когда пост пора публиковать: время повтора после временной ошибки или запланированное время.
+# Выражение совпадает с индексом idx_posts_status_due, иначе SQLite его не использует
+DUE_TIME = "COALESCE(next_attempt_at, publish_time)"
 
-    job_id = f"post_{data['post_db_id']}"
+# Колонки поста, которые получает воркер публикации (название канала - подзапросом, в RETURNING нет JOIN)
+CLAIMED_POST_COLUMNS = """id, user_id, channel_id, content, media, media_type, attempts,
+    (SELECT title FROM channels ch WHERE ch.channel_id = posts.channel_id AND ch.user_id = posts.user_id), group_id"""
 
-    try:
-        scheduler_instance.add_job(
-            send_scheduled_post,
-            trigger='date',
-            run_date=data['publish_time'],
-            args=(bot_instance, data),
-            id=job_id,
-            name=f"Post to {data.get('channel_title', 'N/A')} at {data['publish_time']}",
-            replace_existing=True
+# Посты, забранные этим процессом и еще не опубликованные (ждут в пуле, в том числе из-за лимита чата).
+# Их аренду продлевает диспетчер (renew_leases), а пост, который снова забран, пока его прежняя задача
+# еще в пуле (аренду успели вернуть в очередь), второй раз в пул не ставится
+_held_posts: set[int] = set()
+
+
+async def send_post_content(bot_instance: Bot, channel_id: int, content: str | None, media: str | None,
+                            media_type: str | None) -> types.Message:
+    """Отправляет пост в канал (текст, медиа или альбом с подписью). Общая часть отложенной и немедленной публикации."""
+    content = content or ''
+    parse_mode_for_send = "HTML"  # По умолчанию HTML
+
+    if media:
+        if media_type == MEDIA_TYPE_ALBUM:
+            # Весь альбом - один вызов sendMediaGroup (и один токен ограничителя частоты); ссылка ведет на первый элемент
+            sent_messages = await bot_instance.send_media_group(
+                chat_id=channel_id, media=album_input_media(unpack_album(media), content, parse_mode_for_send)
+            )
+            return sent_messages[0]
+        if media_type == "photo":
+            return await bot_instance.send_photo(
+                chat_id=channel_id, photo=media, caption=content, parse_mode=parse_mode_for_send
+            )
+        if media_type == "video":
+            return await bot_instance.send_video(
+                chat_id=channel_id, video=media, caption=content, parse_mode=parse_mode_for_send
+            )
+        logger.warning(f"Неизвестный или отсутствующий media_type ({media_type}) для медиа {media}.")
+        if not content:
+            raise ValueError(f"Нет текста и неизвестный тип медиа {media}")
+        return await bot_instance.send_message(
+            chat_id=channel_id,
+            text=f"{content}\n[Медиафайл: {escape_html(str(media))}]",
+            parse_mode=parse_mode_for_send
         )
-        logger.info(
-            f"Job {job_id} (Post ID: {data['post_db_id']}) added for {data['publish_time']} to channel {data.get('channel_title', 'N/A')}")
-        return True  # Возвращаем True при успехе
-    except Exception as e:
-        logger.error(f"Ошибка добавления задачи {job_id} в планировщик: {e}", exc_info=True)
-        return False  # Возвращаем False при ошибке
+    return await bot_instance.send_message(chat_id=channel_id, text=content, parse_mode=parse_mode_for_send)
 
 
-def remove_scheduled_job(scheduler_instance: AsyncIOScheduler, job_id: str) -> bool:
+async def claim_due_posts(now: datetime, limit: int, after: datetime | None = None) -> list[tuple]:
     """
-    Удаляет задачу из планировщика по ее ID.
-    Возвращает True, если задача была найдена и удалена, иначе False.
+    Забирает до limit постов, время публикации которых наступило (и позже after, если задано):
+    одним UPDATE ... RETURNING переводит их из 'scheduled' в 'publishing' с арендой на этот экземпляр
+    и возвращает строки для воркеров. Запрос атомарен, поэтому один пост не достанется двум процессам.
     """
-    try:
-        scheduler_instance.remove_job(job_id)
-        logger.info(f"Scheduled job '{job_id}' successfully removed.")
-        return True
-    except JobLookupError:
-        logger.warning(f"Scheduled job '{job_id}' not found for removal (may have already run or been removed).")
-        return False  # Задача не найдена
-    except Exception as e:
-        logger.error(f"Error removing scheduled job '{job_id}': {e}", exc_info=True)
-        return False  # Другая ошибка
+    db = get_db()
+    rows = await db.execute_returning(
+        f"""UPDATE posts SET status = 'publishing', lease_owner = ?, lease_until = ?
+            WHERE id IN (SELECT id FROM posts
+                         WHERE status = 'scheduled' AND {DUE_TIME} > ? AND {DUE_TIME} <= ?
+                         ORDER BY {DUE_TIME}
+                         LIMIT ?)
+            RETURNING {CLAIMED_POST_COLUMNS}""",
+        (PUBLISHER_ID, lease_deadline().isoformat(), "" if after is None else after.isoformat(), now.isoformat(),
+         limit)
+    )
+    return hold_leases(rows)
+
 
+def hold_leases(post_rows: list[tuple]) -> list[tuple]:
+    """
+    Отмечает забранные посты как ожидающие публикации в этом процессе. Возвращает только те,
+    которых еще нет в пуле: для остальных аренда снова наша, и их опубликует уже стоящая задача.
+    """
+    new_rows = [row for row in post_rows if row[0] not in _held_posts]
+    _held_posts.update(row[0] for row in new_rows)
+    return new_rows
 
-async def send_scheduled_post(bot_instance: Bot, data: dict):
+
+async def renew_leases() -> int:
+    """Продлевает аренду постов, ожидающих публикации в этом процессе, чтобы их не забрал другой экземпляр."""
+    if not _held_posts:
+        return 0
     db = get_db()
-    post_db_id = data['post_db_id']
-    user_id_to_notify = data['user_id']
-    channel_id = data['channel_id']
-    channel_title = data['channel_title']
-    content_to_send = data.get('content', '')
-    media_to_send = data.get('media')
-    media_type_to_send = data.get('media_type')
+    cursor = await db.execute(
+        """UPDATE posts SET lease_until = ?
+           WHERE id IN (SELECT value FROM json_each(?)) AND status = 'publishing' AND lease_owner = ?""",
+        (lease_deadline().isoformat(), json.dumps(list(_held_posts)), PUBLISHER_ID),
+        commit=True
+    )
+    return cursor.rowcount
 
-    post_status_final = "failed"
-    published_message_id_in_channel = None
 
-    logger.info(f"Attempting to send scheduled post (DB ID: {post_db_id}) to channel {channel_title} ({channel_id})")
+async def release_held_leases() -> int:
+    """
+    Возвращает в 'scheduled' посты, забранные этим процессом, но не опубликованные (вызывается при остановке
+    бота после остановки пула): их сразу заберет другой экземпляр или этот же после рестарта.
+    """
+    if not _held_posts:
+        return 0
+    db = get_db()
+    cursor = await db.execute(
+        """UPDATE posts SET status = 'scheduled', lease_owner = NULL, lease_until = NULL
+           WHERE id IN (SELECT value FROM json_each(?)) AND status = 'publishing' AND lease_owner = ?""",
+        (json.dumps(list(_held_posts)), PUBLISHER_ID),
+        commit=True
+    )
+    _held_posts.clear()
+    if cursor.rowcount:
+        logger.info(f"Released lease of {cursor.rowcount} unpublished post(s) on shutdown.")
+    return cursor.rowcount
+
+
+async def renew_lease(post_db_id: int) -> bool:
+    """Продлевает аренду поста перед отправкой. False - аренда потеряна, пост публикует кто-то другой."""
+    db = get_db()
+    cursor = await db.execute(
+        "UPDATE posts SET lease_until = ? WHERE id = ? AND status = 'publishing' AND lease_owner = ?",
+        (lease_deadline().isoformat(), post_db_id, PUBLISHER_ID),
+        commit=True
+    )
+    return cursor.rowcount > 0
+
+
+def lease_deadline() -> datetime:
+    return datetime.now() + timedelta(seconds=PUBLISH_LEASE_SECONDS)
 
+
+async def next_publish_time(after: datetime | None = None) -> datetime | None:
+    """Время ближайшего запланированного поста или повтора (поиск по индексу idx_posts_status_due)."""
+    db = get_db()
+    row = await db.fetchone(
+        f"SELECT {DUE_TIME} FROM posts WHERE status = 'scheduled' AND {DUE_TIME} > ? ORDER BY {DUE_TIME} LIMIT 1",
+        ("" if after is None else after.isoformat(),)
+    )
+    return datetime.fromisoformat(row[0]) if row else None
+
+
+async def count_due_posts(until: datetime) -> int:
+    db = get_db()
+    row = await db.fetchone(
+        f"SELECT COUNT(*) FROM posts WHERE status = 'scheduled' AND {DUE_TIME} <= ?", (until.isoformat(),)
+    )
+    return row[0]
+
+
+async def apply_misfire_policy(policy: str, cutoff: datetime, now: datetime, chunk_size: int) -> dict[int, int]:
+    """
+    Обрабатывает посты, опоздавшие дольше окна (DUE_TIME < cutoff), по политике MISFIRE_POLICY:
+    'missed' - помечает их пропущенными, 'reschedule' - переносит на ближайшие сутки вперед в то же время.
+    Работает порциями по chunk_size, чтобы не держать писателя БД. Возвращает {user_id: количество постов}.
+    """
+    db = get_db()
+    if policy == "missed":
+        query = f"""UPDATE posts SET status = 'missed', last_error = 'Бот был недоступен в момент публикации'
+                    WHERE id IN (SELECT id FROM posts WHERE status = 'scheduled' AND {DUE_TIME} < ? LIMIT ?)
+                    RETURNING user_id"""
+        params = (cutoff.isoformat(), chunk_size)
+    elif policy == "reschedule":
+        # Сдвиг на целое число суток: время суток, выбранное пользователем, сохраняется.
+        # Назначенный повтор теряет смысл - пост просто публикуется в новое время
+        query = f"""UPDATE posts SET publish_time = strftime('%Y-%m-%dT%H:%M:%S', publish_time,
+                        '+' || (CAST(julianday(?) - julianday(publish_time) AS INTEGER) + 1) || ' days'),
+                                     next_attempt_at = NULL
+                    WHERE id IN (SELECT id FROM posts WHERE status = 'scheduled' AND {DUE_TIME} < ? LIMIT ?)
+                    RETURNING user_id"""
+        params = (now.isoformat(), cutoff.isoformat(), chunk_size)
+    else:
+        return {}
+
+    affected: dict[int, int] = {}
+    while True:
+        rows = await db.execute_returning(query, params)
+        for (user_id,) in rows:
+            affected[user_id] = affected.get(user_id, 0) + 1
+        if len(rows) < chunk_size:
+            return affected
+
+
+async def recover_expired_leases(include_own: bool = False) -> int:
+    """
+    Возвращает в очередь посты в 'publishing', аренда которых истекла (экземпляр упал или завис посреди
+    публикации). include_own - при старте сразу забрать и собственные посты (актуально при заданном INSTANCE_ID).
+    """
+    db = get_db()
+    cursor = await db.execute(
+        """UPDATE posts SET status = 'scheduled', lease_owner = NULL, lease_until = NULL
+           WHERE status = 'publishing' AND (lease_until IS NULL OR lease_until < ? OR lease_owner = ?)""",
+        (datetime.now().isoformat(), PUBLISHER_ID if include_own else None),
+        commit=True
+    )
+    if cursor.rowcount:
+        logger.warning(f"Recovered {cursor.rowcount} post(s) with expired 'publishing' lease.")
+    return cursor.rowcount
+
+
+def _finish_post_sync(db, query: str, params: tuple, group_id: str | None) -> tuple[bool, bool]:
+    """
+    Выполняется в потоке-писателе БД: финальный UPDATE поста и подсчет незавершенных постов его группы
+    в одной транзакции. Писатель один, поэтому группу "последним" завершает ровно один воркер,
+    даже если посты группы публикуются параллельно.
+    """
     try:
-        current_post_status_query = db.fetchone("SELECT status FROM posts WHERE id = ?", (post_db_id,))
-        if not current_post_status_query:
-            logger.warning(f"Post (DB ID: {post_db_id}) not found in DB. Skipping scheduled send.")
-            return
-        if current_post_status_query[0] != 'scheduled':
-            logger.warning(
-                f"Post (DB ID: {post_db_id}) is not in 'scheduled' state (current: {current_post_status_query[0]}). Skipping.")
-            return
+        is_updated = db.connection.execute(query, params).rowcount > 0
+        is_group_completed = False
+        if is_updated and group_id:
+            pending = db.connection.execute(
+                "SELECT COUNT(*) FROM posts WHERE group_id = ? AND status IN ('scheduled', 'publishing')",
+                (group_id,)
+            ).fetchone()[0]
+            is_group_completed = pending == 0
+        db.connection.commit()
+    except sqlite3.Error:
+        db.connection.rollback()
+        raise
+    return is_updated, is_group_completed
 
-        published_message = None
-        parse_mode_for_send = "HTML"  # По умолчанию HTML
-
-        if media_to_send:
-            if media_type_to_send == "photo":
-                published_message = await bot_instance.send_photo(
-                    chat_id=channel_id, photo=media_to_send, caption=content_to_send, parse_mode=parse_mode_for_send
-                )
-            elif media_type_to_send == "video":
-                published_message = await bot_instance.send_video(
-                    chat_id=channel_id, video=media_to_send, caption=content_to_send, parse_mode=parse_mode_for_send
-                )
-            else:
-                logger.warning(
-                    f"Неизвестный или отсутствующий media_type ({media_type_to_send}) для медиа {media_to_send} поста {post_db_id}.")
-                if content_to_send:
-                    published_message = await bot_instance.send_message(
-                        chat_id=channel_id,
-                        text=f"{content_to_send}\n[Медиафайл: {escape_html(str(media_to_send))}]",
-                        # Добавил escape_html
-                        parse_mode=parse_mode_for_send
-                    )
-                else:
-                    raise ValueError(
-                        f"Не удалось отправить пост {post_db_id}: нет текста и неизвестный тип медиа {media_to_send}")
+
+async def _finish_post(query: str, params: tuple, group_id: str | None) -> tuple[bool, bool]:
+    """Возвращает (обновлен ли пост, завершилась ли этим обновлением вся его группа)."""
+    db = get_db()
+    return await db.run(_finish_post_sync, db, query, params, group_id)
+
+
+async def record_publish_failure(post_db_id: int, attempts_before: int, error: Exception,
+                                 group_id: str | None = None) -> tuple[datetime | None, bool]:
+    """
+    Записывает неудачную попытку публикации поста в статусе 'publishing'. Временную ошибку
+    (см. services.retry_policy) откладывает: пост возвращается в 'scheduled' с временем повтора
+    в next_attempt_at (publish_time остается временем, выбранным пользователем), и его снова заберет
+    диспетчер, в том числе после рестарта.
+    Возвращает (время повтора или None, если пост окончательно помечен 'failed'; завершилась ли группа поста).
+    """
+    db = get_db()
+    attempt = attempts_before + 1
+    error_text = f"{type(error).__name__}: {error}"[:1000]
+    if should_retry(error, attempt):
+        retry_at = datetime.now() + timedelta(seconds=retry_delay(error, attempt))
+        await db.execute(
+            """UPDATE posts SET status = 'scheduled', next_attempt_at = ?, attempts = ?, last_error = ?,
+                                lease_owner = NULL, lease_until = NULL
+               WHERE id = ? AND status = 'publishing' AND lease_owner = ?""",
+            (retry_at.isoformat(), attempt, error_text, post_db_id, PUBLISHER_ID),
+            commit=True
+        )
+        publish_dispatcher.wake()
+        logger.warning(f"Post (DB ID: {post_db_id}) attempt {attempt}/{PUBLISH_MAX_ATTEMPTS} failed with transient "
+                       f"error ({error_text}). Retry at {retry_at.isoformat(timespec='seconds')}.")
+        return retry_at, False
+
+    _, is_group_completed = await _finish_post(
+        """UPDATE posts SET status = 'failed', attempts = ?, last_error = ?, lease_owner = NULL, lease_until = NULL
+           WHERE id = ? AND status = 'publishing' AND lease_owner = ?""",
+        (attempt, error_text, post_db_id, PUBLISHER_ID), group_id
+    )
+    logger.error(f"Post (DB ID: {post_db_id}) failed permanently after {attempt} attempt(s): {error_text}")
+    return None, is_group_completed
+
+
+async def build_publish_report(post_ids: list[int] | None = None, group_id: str | None = None) -> str:
+    """Итоговое сообщение о публикации поста в один или несколько каналов (по списку ID или по группе)."""
+    db = get_db()
+    if group_id is not None:
+        condition, params = "p.group_id = ?", (group_id,)
+    else:
+        condition, params = f"p.id IN ({', '.join('?' * len(post_ids))})", tuple(post_ids)
+    rows = await db.fetchall(
+        f"""SELECT p.status, p.channel_id, p.message_id, ch.title, p.last_error,
+                   COALESCE(p.next_attempt_at, p.publish_time)
+            FROM posts p
+            LEFT JOIN channels ch ON p.channel_id = ch.channel_id AND p.user_id = ch.user_id
+            WHERE {condition}
+            ORDER BY ch.title""",
+        params
+    )
+    published = sum(1 for row in rows if row[0] == "published")
+    if len(rows) == 1:
+        header = "✅ Пост успешно опубликован!" if published else "⚠️ Пост не опубликован."
+    else:
+        header = f"📣 Пост опубликован в каналах: {published} из {len(rows)}."
+
+    lines = [header, ""]
+    for status, channel_id, message_id, title, last_error, due_time in rows:
+        safe_title = escape_html(title or str(channel_id))
+        if status == "published":
+            lines.append(f"✅ «{safe_title}»: {channel_post_link(channel_id, message_id)}")
+        elif status == "scheduled":  # Временная ошибка, назначен повтор
+            retry_at = datetime.fromisoformat(due_time).strftime('%H:%M:%S')
+            lines.append(f"⏳ «{safe_title}»: временная ошибка, повтор в {retry_at}")
+        elif status == "failed":
+            lines.append(f"❌ «{safe_title}»: {escape_html((last_error or '')[:200])}")
         else:
-            published_message = await bot_instance.send_message(
-                chat_id=channel_id,
-                text=content_to_send,
-                parse_mode=parse_mode_for_send
-            )
+            lines.append(f"ℹ️ «{safe_title}»: {escape_html(status)}")
+
+    report = "\n".join(lines)
+    return report if len(report) <= 4000 else report[:3990] + "\n…"
 
-        post_status_final = "published"
-        published_message_id_in_channel = published_message.message_id if published_message else None
 
-        logger.info(
-            f"Scheduled post (DB ID: {post_db_id}) successfully sent to channel {channel_title}. Message ID: {published_message_id_in_channel}")
+async def publish_claimed_post(post_row: tuple, bot_instance: Bot | None = None, notify: bool = True):
+    """
+    Публикует пост, уже переведенный в 'publishing', и записывает итоговый статус.
+    notify=False - не уведомлять владельца (немедленная публикация сама собирает отчет для пользователя).
+    Посты группы (публикация в несколько каналов) не уведомляют по одному: когда завершается
+    последний пост группы, владелец получает один общий отчет.
+    Перед отправкой аренда продлевается условным UPDATE: если за время ожидания в пуле ее вернули
+    в очередь и пост забрал другой экземпляр, отправка пропускается.
+    """
+    post_db_id = post_row[0]
+    is_cancelled = False
+    try:
+        if not await renew_lease(post_db_id):
+            logger.warning(f"Post (DB ID: {post_db_id}) skipped: lease lost while queued, "
+                           f"not leased by {PUBLISHER_ID} anymore.")
+            return
+        await _publish_leased_post(post_row, bot_instance or bot, notify)
+    except asyncio.CancelledError:
+        is_cancelled = True  # Остановка бота: аренду поста вернет release_held_leases
+        raise
+    finally:
+        if not is_cancelled:
+            _held_posts.discard(post_db_id)
 
-        if user_id_to_notify and published_message_id_in_channel:
-            await notify_post_published(bot_instance, user_id_to_notify, channel_id, published_message_id_in_channel,
-                                        channel_title)
 
+async def _publish_leased_post(post_row: tuple, bot_instance: Bot, notify: bool):
+    (post_db_id, user_id_to_notify, channel_id, content_to_send, media_to_send, media_type_to_send,
+     attempts_before, channel_title, group_id) = post_row
+    channel_title = channel_title or str(channel_id)
+    notify = notify and bool(user_id_to_notify)
+
+    logger.info(f"Attempting to send scheduled post (DB ID: {post_db_id}) to channel {channel_title} ({channel_id})")
+
+    try:
+        published_message = await send_post_content(bot_instance, channel_id, content_to_send, media_to_send,
+                                                     media_type_to_send)
     except Exception as e:
         logger.error(f"Ошибка публикации запланированного поста (DB ID: {post_db_id}) в «{channel_title}»: {e}",
                      exc_info=True)
-        post_status_final = "failed"
-        if user_id_to_notify:
-            await notify_user(bot_instance, user_id_to_notify,
-                              f"❌ Ошибка публикации вашего запланированного поста (ID: {post_db_id}) для «{escape_html(channel_title)}».\nПричина: {escape_html(str(e))}")
-    finally:
         try:
-            db.execute(
-                "UPDATE posts SET status = ?, message_id = ? WHERE id = ?",
-                (post_status_final, published_message_id_in_channel, post_db_id),
-                commit=True
-            )
-            if db.cursor.rowcount > 0:
-                logger.info(f"Status for post (DB ID: {post_db_id}) updated to '{post_status_final}' in DB.")
-            else:  # Поста уже нет или статус не 'scheduled'
-                logger.warning(
-                    f"Could not update status in DB for post (DB ID: {post_db_id}). Post not found or status was not 'scheduled'.")
+            retry_at, is_group_completed = await record_publish_failure(post_db_id, attempts_before, e, group_id)
         except Exception as db_e:
             logger.critical(
                 f"Критическая ошибка: не удалось обновить статус поста (DB ID: {post_db_id}) в БД после попытки публикации: {db_e}",
-                exc_info=True)
\ No newline at end of file
+                exc_info=True)
+            return
+        if not notify or retry_at is not None:  # Пользователя беспокоим только когда пост окончательно не опубликован
+            return
+        if is_group_completed:
+            await notify_user(bot_instance, user_id_to_notify, await build_publish_report(group_id=group_id),
+                              disable_web_page_preview=True)
+        elif not group_id:
+            await notify_user(bot_instance, user_id_to_notify,
+                              f"❌ Ошибка публикации вашего запланированного поста (ID: {post_db_id}) для «{escape_html(channel_title)}».\nПричина: {escape_html(str(e))}")
+        return
+
+    published_message_id_in_channel = published_message.message_id if published_message else None
+    logger.info(
+        f"Scheduled post (DB ID: {post_db_id}) successfully sent to channel {channel_title}. Message ID: {published_message_id_in_channel}")
+
+    is_group_completed = False
+    try:
+        is_updated, is_group_completed = await _finish_post(
+            """UPDATE posts SET status = 'published', message_id = ?, lease_owner = NULL, lease_until = NULL
+               WHERE id = ? AND status = 'publishing' AND lease_owner = ?""",
+            (published_message_id_in_channel, post_db_id, PUBLISHER_ID), group_id
+        )
+        if is_updated:
+            logger.info(f"Status for post (DB ID: {post_db_id}) updated to 'published' in DB.")
+        else:  # Поста уже нет, статус не 'publishing' или аренда истекла и пост забрал другой экземпляр
+            logger.warning(
+                f"Could not update status in DB for post (DB ID: {post_db_id}). Post not found or not leased by {PUBLISHER_ID}.")
+    except Exception as db_e:
+        logger.critical(
+            f"Критическая ошибка: не удалось обновить статус поста (DB ID: {post_db_id}) в БД после попытки публикации: {db_e}",
+            exc_info=True)
+
+    if not notify:
+        return
+    if is_group_completed:
+        await notify_user(bot_instance, user_id_to_notify, await build_publish_report(group_id=group_id),
+                          disable_web_page_preview=True)
+    elif published_message_id_in_channel and not group_id:
+        await notify_post_published(bot_instance, user_id_to_notify, channel_id, published_message_id_in_channel,
+                                    channel_title)
+
+
+class PublisherPool:
+    """
+    Пул воркеров публикации: фиксированное число корутин разбирает задачи из нескольких очередей ("полос").
+    Полоса interactive - действия пользователя (немедленная публикация), bulk - отложенные посты от диспетчера.
+    Свободный воркер берет задачу из непустой полосы с наименьшим "виртуальным временем" (stride scheduling):
+    каждая выданная задача сдвигает его на 1/вес, поэтому массовая публикация не может надолго занять пул.
+    Число параллельных вызовов Bot API от пула ограничено числом воркеров, а очередь ограничителя частоты - тем более.
+
+    С limiter задача с chat_id получает слот чата до того, как займет воркер: если лимит чата исчерпан,
+    задача откладывается до его восстановления, а воркер берет следующую. Иначе один канал, упершийся
+    в поминутный лимит, держал бы все воркеры в ожидании, в том числе задачи полосы interactive.
+    """
+
+    def __init__(self, workers: int, weights: dict[str, int], capacities: dict[str, int] | None = None,
+                 limiter: TelegramRateLimiter | None = None):
+        self._workers_count = max(1, workers)
+        self._weights = {lane: max(1, weight) for lane, weight in weights.items()}
+        capacities = capacities or {}
+        self._queues: dict[str, deque] = {lane: deque() for lane in weights}
+        # Ограничение длины полосы: put() ждет места, так диспетчер не забирает из БД больше, чем успевает пул
+        self._space = {lane: asyncio.Semaphore(capacities[lane]) for lane in weights if capacities.get(lane)}
+        self._pass = {lane: 0.0 for lane in weights}
+        self._virtual_time = 0.0
+        self._available: asyncio.Semaphore | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._busy: set[asyncio.Task] = set()  # Воркеры, выполняющие задачу прямо сейчас
+        self._closing = False
+        self._limiter = limiter
+        # chat_id -> (полоса, задача): задачи, ждущие слота чата; до возвращения в полосу занимают в ней место
+        self._deferred: dict[int | str, deque] = {}
+        self._resume_handles: dict[int | str, asyncio.TimerHandle] = {}
+        self._stats = {lane: {"served": 0, "failed": 0, "deferred": 0, "wait_total": 0.0, "wait_max": 0.0,
+                              "service_total": 0.0, "service_max": 0.0} for lane in weights}
+
+    def start(self):
+        self._closing = False
+        self._available = asyncio.Semaphore(sum(len(queue) for queue in self._queues.values()))
+        self._tasks = [asyncio.create_task(self._worker(), name=f"publish-worker-{i}")
+                       for i in range(self._workers_count)]
+        logger.info(f"Publisher pool started with {self._workers_count} worker(s), lane weights: {self._weights}.")
+
+    async def stop(self, grace: float = 0.0):
+        """
+        Останавливает воркеры. Новые задачи из полос больше не берутся, уже начатые получают до grace секунд,
+        чтобы завершиться (отправка поста, прерванная посередине, может оказаться доставленной).
+        """
+        self._closing = True
+        busy = [task for task in self._tasks if task in self._busy]
+        if busy and grace > 0:
+            await asyncio.wait(busy, timeout=grace)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for handle in self._resume_handles.values():
+            handle.cancel()
+        self._resume_handles.clear()
+
+    async def put(self, lane: str, func, *args, chat_id: int | str | None = None) -> asyncio.Future:
+        """
+        Ставит вызов func(*args) в полосу lane (дожидаясь места) и возвращает future с результатом.
+        chat_id - чат, в который func отправит сообщение (см. limiter).
+        """
+        if lane in self._space:
+            await self._space[lane].acquire()
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(lane, (func, args, future, time.monotonic(), chat_id, False))
+        return future
+
+    async def run(self, lane: str, func, *args, chat_id: int | str | None = None):
+        """Выполняет func(*args) воркером пула и возвращает результат (или пробрасывает исключение)."""
+        return await (await self.put(lane, func, *args, chat_id=chat_id))
+
+    def _enqueue(self, lane: str, item: tuple, front: bool = False):
+        if not self._queues[lane]:
+            # Простаивавшая полоса не копит "кредит": иначе после простоя она надолго вытеснила бы остальные
+            self._pass[lane] = max(self._pass[lane], self._virtual_time)
+        if front:
+            self._queues[lane].appendleft(item)
+        else:
+            self._queues[lane].append(item)
+        self._available.release()
+
+    def _defer(self, lane: str, item: tuple) -> bool:
+        """
+        Откладывает задачу, если слот ее чата сейчас занят или чата уже ждут другие задачи
+        (иначе бронирует слот). Отложенные задачи чата возвращаются в начало своих полос по одной,
+        в прежнем порядке, каждая - с уже забронированным слотом.
+        """
+        chat_id = item[4]
+        deferred = self._deferred.get(chat_id)
+        if deferred is None:
+            delay = self._limiter.try_reserve_chat(chat_id)
+            if delay == 0:
+                return False
+            deferred = self._deferred[chat_id] = deque()
+            self._resume_handles[chat_id] = asyncio.get_running_loop().call_later(delay, self._resume, chat_id)
+        deferred.append((lane, item))
+        self._stats[lane]["deferred"] += 1
+        return True
+
+    def _resume(self, chat_id: int | str):
+        delay = self._limiter.try_reserve_chat(chat_id)
+        if delay == 0:  # Слот мог занять, например, ответ пользователю в тот же чат мимо пула
+            lane, item = self._deferred[chat_id].popleft()
+            self._enqueue(lane, item[:5] + (True,), front=True)
+            if not self._deferred[chat_id]:
+                del self._deferred[chat_id], self._resume_handles[chat_id]
+                return
+            delay = self._limiter.chat_delay(chat_id)
+        self._resume_handles[chat_id] = asyncio.get_running_loop().call_later(delay, self._resume, chat_id)
+
+    def _next_lane(self) -> str:
+        lane = min((lane for lane, queue in self._queues.items() if queue), key=self._pass.__getitem__)
+        self._virtual_time = self._pass[lane]
+        self._pass[lane] += 1.0 / self._weights[lane]
+        return lane
+
+    async def _worker(self):
+        while not self._closing:
+            await self._available.acquire()
+            if self._closing:
+                return
+            lane = self._next_lane()
+            item = self._queues[lane].popleft()
+            func, args, future, enqueued_at, chat_id, is_reserved = item
+            if chat_id is not None and self._limiter is not None and not is_reserved and self._defer(lane, item):
+                continue
+            if lane in self._space:
+                self._space[lane].release()
+            lane_stats = self._stats[lane]
+            started = time.monotonic()
+            waited = started - enqueued_at
+            lane_stats["served"] += 1
+            lane_stats["wait_total"] += waited
+            lane_stats["wait_max"] = max(lane_stats["wait_max"], waited)
+            self._busy.add(asyncio.current_task())
+            try:
+                if chat_id is not None and self._limiter is not None:
+                    with chat_slot_reserved(chat_id):
+                        result = await func(*args)
+                else:
+                    result = await func(*args)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                lane_stats["failed"] += 1
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._busy.discard(asyncio.current_task())
+                service = time.monotonic() - started
+                lane_stats["service_total"] += service
+                lane_stats["service_max"] = max(lane_stats["service_max"], service)
+
+    def stats(self) -> dict:
+        """Статистика по полосам: длина очереди, обслужено, среднее/максимальное ожидание и время выполнения."""
+        result = {}
+        for lane, lane_stats in self._stats.items():
+            served = lane_stats["served"]
+            result[lane] = {
+                "queued": len(self._queues[lane]),
+                "served": served,
+                "failed": lane_stats["failed"],
+                "deferred": lane_stats["deferred"],
+                "wait_avg": lane_stats["wait_total"] / served if served else 0.0,
+                "wait_max": lane_stats["wait_max"],
+                "service_avg": lane_stats["service_total"] / served if served else 0.0,
+                "service_max": lane_stats["service_max"],
+            }
+        return result
+
+
+def _log_unhandled_error(future: asyncio.Future):
+    if not future.cancelled() and future.exception():
+        logger.error(f"Необработанная ошибка воркера публикации: {future.exception()}", exc_info=future.exception())
+
+
+class PublishDispatcher:
+    """
+    Диспетчер отложенных публикаций. Источник истины - таблица posts: диспетчер спит до ближайшего
+    publish_time (или до wake()), забирает наступившие посты пачками через claim_due_posts
+    и передает их в полосу bulk пула воркеров.
+
+    Забранные посты арендуются на PUBLISH_LEASE_SECONDS (lease_owner/lease_until), поэтому несколько
+    экземпляров бота могут делить одну таблицу posts; посты упавшего экземпляра возвращаются в очередь
+    по истечении аренды (recover_expired_leases). Аренду постов, которые еще ждут в пуле, диспетчер
+    продлевает (_renew_loop), так что долгая очередь к каналу, упершемуся в лимит, ее не теряет.
+
+    Посты, опоздавшие к моменту старта, разбирает отдельная фоновая задача догонки (_catch_up):
+    опоздавшие дольше MISFIRE_GRACE_SECONDS обрабатываются по MISFIRE_POLICY, остальные
+    публикуются с темпом не выше MISFIRE_REPLAY_RATE. Основной цикл тем временем обслуживает
+    только посты позже момента старта, так что накопленный хвост не задерживает свежие публикации.
+    """
+
+    def __init__(self, pool: PublisherPool, batch_size: int = DISPATCH_BATCH_SIZE,
+                 max_sleep: float = DISPATCH_MAX_SLEEP_SECONDS, misfire_policy: str = MISFIRE_POLICY,
+                 misfire_grace: float = MISFIRE_GRACE_SECONDS, replay_rate: float = MISFIRE_REPLAY_RATE):
+        self._pool = pool
+        self._batch_size = max(1, batch_size)
+        self._max_sleep = max_sleep
+        self._misfire_policy = misfire_policy
+        self._misfire_grace = misfire_grace
+        self._replay_rate = replay_rate
+        self._catch_up_until: datetime | None = None  # Граница догонки; основной цикл берет посты только позже нее
+        self._recovery_interval = max(1.0, PUBLISH_LEASE_SECONDS / 2)
+        self._renew_interval = PUBLISH_LEASE_SECONDS / 3
+        self._next_recovery = 0.0
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        # Посты других экземпляров с живой арендой не трогаем - они публикуются прямо сейчас
+        await recover_expired_leases(include_own=True)
+        self._next_recovery = time.monotonic() + self._recovery_interval
+        self._catch_up_until = datetime.now()
+        self._tasks = [asyncio.create_task(self._dispatch_loop(), name="publish-dispatcher"),
+                       asyncio.create_task(self._catch_up(self._catch_up_until), name="publish-catch-up"),
+                       asyncio.create_task(self._renew_loop(), name="publish-lease-renewal")]
+        logger.info("Publish dispatcher started.")
+
+    async def stop(self):
+        # Посты, забранные, но не отправленные, возвращает в очередь release_held_leases после остановки пула
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Publish dispatcher stopped.")
+
+    def wake(self):
+        """Будит диспетчер, чтобы он пересчитал время сна (например, после планирования нового поста)."""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _dispatch_loop(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                if time.monotonic() >= self._next_recovery:
+                    await recover_expired_leases()
+                    self._next_recovery = time.monotonic() + self._recovery_interval
+                claimed = await claim_due_posts(datetime.now(), self._batch_size, after=self._catch_up_until)
+                for post_row in claimed:
+                    future = await self._pool.put(LANE_BULK, publish_claimed_post, post_row, chat_id=post_row[2])
+                    future.add_done_callback(_log_unhandled_error)
+                if len(claimed) == self._batch_size:
+                    continue  # Наступивших постов может быть больше - забираем следующую пачку сразу
+
+                next_time = await next_publish_time(after=self._catch_up_until)
+                delay = min(self._max_sleep, max(self._next_recovery - time.monotonic(), 0.0))
+                if next_time is not None:
+                    delay = min(max((next_time - datetime.now()).total_seconds(), 0.0), delay)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в цикле диспетчера публикаций: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def _renew_loop(self):
+        """
+        Продлевает аренду постов, ожидающих в пуле. Отдельная задача: основной цикл может надолго
+        встать в put(), пока полоса bulk заполнена постами канала, упершегося в лимит.
+        """
+        while True:
+            await asyncio.sleep(self._renew_interval)
+            try:
+                await renew_leases()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка продления аренды постов: {e}", exc_info=True)
+
+    async def _catch_up(self, until: datetime):
+        """Догонка постов, время которых наступило, пока бот был выключен (DUE_TIME <= until)."""
+        try:
+            cutoff = until - timedelta(seconds=self._misfire_grace)
+            affected = await apply_misfire_policy(self._misfire_policy, cutoff, until, self._batch_size)
+            if affected:
+                logger.warning(f"Misfire policy '{self._misfire_policy}' applied to {sum(affected.values())} "
+                               f"post(s) overdue for more than {self._misfire_grace:g} s.")
+                await self._notify_misfired(affected)
+
+            total = await count_due_posts(until)
+            if total:
+                logger.info(f"Catch-up: {total} overdue post(s) to publish, replay rate {self._replay_rate:g}/s.")
+            pacing = TokenBucket(self._replay_rate)
+            dispatched, last_report = 0, time.monotonic()
+            while True:
+                claimed = await claim_due_posts(until, self._batch_size)
+                for post_row in claimed:
+                    delay = pacing.reserve(time.monotonic()) - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    future = await self._pool.put(LANE_BULK, publish_claimed_post, post_row, chat_id=post_row[2])
+                    future.add_done_callback(_log_unhandled_error)
+                dispatched += len(claimed)
+                if len(claimed) < self._batch_size:
+                    break
+                if time.monotonic() - last_report >= 10:
+                    logger.info(f"Catch-up progress: {dispatched}/{total} overdue post(s) dispatched.")
+                    last_report = time.monotonic()
+            if total:
+                logger.info(f"Catch-up finished: {dispatched} overdue post(s) dispatched.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка догонки опоздавших постов: {e}", exc_info=True)
+        finally:
+            # Оставшиеся опоздавшие посты (например, после ошибки) подхватит основной цикл
+            self._catch_up_until = None
+            self.wake()
+
+    async def _notify_misfired(self, affected: dict[int, int]):
+        if self._misfire_policy == "missed":
+            text = ("⏰ Бот был недоступен, и {count} ваших запланированных пост(а/ов) не были опубликованы вовремя. "
+                    "Они отмечены как пропущенные - при необходимости создайте их заново.")
+        else:
+            text = ("⏰ Бот был недоступен, поэтому {count} ваших запланированных пост(а/ов) "
+                    "перенесены на то же время следующих суток. Проверьте их в разделе «🗓️ Запланированные».")
+        for user_id, count in affected.items():
+            if user_id:
+                await notify_user(bot, user_id, text.format(count=count))
+
+
+publisher_pool = PublisherPool(
+    PUBLISH_WORKERS,
+    weights={LANE_INTERACTIVE: INTERACTIVE_LANE_WEIGHT, LANE_BULK: BULK_LANE_WEIGHT},
+    capacities={LANE_BULK: DISPATCH_BATCH_SIZE},
+    limiter=rate_limiter
+)
+publish_dispatcher = PublishDispatcher(publisher_pool)
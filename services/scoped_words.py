@@ -0,0 +1,165 @@
+"""
+Списки запрещенных слов отдельных каналов и пользователей.
+
+Общий список остается в файле (services.content_filter), а слова областей (scope) хранятся в БД:
+banned_words(scope_type, scope_id, word), по первичному ключу слова одной области читаются одним
+диапазоном индекса. Триггеры ведут banned_word_scopes - число слов и версию каждой области.
+
+Автомат области собирается при первой проверке текста с ее участием и хранится в LRU: не больше
+max_scopes областей и примерно max_bytes байт, давно не нужные области вытесняются и при следующей
+проверке загружаются заново. Области без слов запоминаются как пустые, чтобы не ходить за ними в БД.
+Правки через этот модуль сразу сбрасывают автомат области; правки других процессов замечаются
+по версии области не позже чем через recheck_interval секунд.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from loader import get_db, content_filter
+from config import SCOPED_MATCHERS_MAX, SCOPED_MATCHERS_MAX_BYTES, BANNED_WORDS_RELOAD_SECONDS
+from services.aho_corasick import SUBSTRING_SCAN_MAX_WORDS
+from services.content_filter import MODE_WORDS
+from services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+SCOPE_CHANNEL = "channel"
+SCOPE_USER = "user"
+SCOPE_TYPES = (SCOPE_CHANNEL, SCOPE_USER)
+
+# Примерная память автомата на символ слов списка (замерено tracemalloc, с запасом)
+MATCHER_BYTES_PER_CHAR = {"scan": 8, MODE_WORDS: 40, "automaton": 260}
+SCOPE_ENTRY_OVERHEAD = 512  # Ключ, запись LRU, замыкание проверки
+
+
+def estimate_matcher_bytes(words, mode: str) -> int:
+    """Оценка памяти автомата области для ограничения LRU по объему."""
+    if mode == MODE_WORDS:
+        kind = MODE_WORDS
+    elif len(words) <= SUBSTRING_SCAN_MAX_WORDS:
+        kind = "scan"
+    else:
+        kind = "automaton"
+    return SCOPE_ENTRY_OVERHEAD + MATCHER_BYTES_PER_CHAR[kind] * sum(len(word) for word in words)
+
+
+class ScopedWordLists:
+    def __init__(self, max_scopes: int = SCOPED_MATCHERS_MAX, max_bytes: int = SCOPED_MATCHERS_MAX_BYTES,
+                 recheck_interval: float = BANNED_WORDS_RELOAD_SECONDS):
+        self.recheck_interval = recheck_interval
+        # (scope_type, scope_id) -> (версия, проверка или None для пустой области, размер, время сверки версии)
+        self._matchers = LRUCache(max_scopes, max_bytes, lambda scope, entry: entry[2])
+        self.loads = 0
+        self._edits = 0  # Правки этого процесса; загрузка, начатая до правки, не кладет результат в кэш
+
+    @staticmethod
+    def scopes_for(channel_ids=(), user_id: int | None = None) -> list[tuple[str, int]]:
+        scopes = [(SCOPE_CHANNEL, channel_id) for channel_id in channel_ids]
+        if user_id is not None:
+            scopes.append((SCOPE_USER, user_id))
+        return scopes
+
+    async def check_text(self, text: str, channel_ids=(), user_id: int | None = None) -> list:
+        """
+        Проверяет текст по общему списку, спискам каналов channel_ids (слово, запрещенное хотя бы в одном
+        из выбранных каналов, запрещает пост) и списку пользователя user_id.
+        """
+        found = content_filter.check_text(text)
+        if not text:
+            return found
+        for checker in await self._checkers(self.scopes_for(channel_ids, user_id)):
+            found.extend(word for word in checker(text) if word not in found)
+        return found
+
+    async def _checkers(self, scopes: list[tuple[str, int]]) -> list:
+        now = time.monotonic()
+        checkers, stale = [], {}
+        for scope in scopes:
+            entry = self._matchers.get(scope)
+            if entry is not None and now - entry[3] < self.recheck_interval:
+                if entry[1] is not None:
+                    checkers.append(entry[1])
+            else:
+                stale[scope] = entry
+        if not stale:
+            return checkers
+
+        edits = self._edits
+        versions = await self._fetch_versions(list(stale))
+        for scope, entry in stale.items():
+            words_count, version = versions.get(scope, (0, 0))
+            if entry is not None and entry[0] == version:
+                entry = (entry[0], entry[1], entry[2], now)  # Список не менялся - только продлеваем сверку
+            elif words_count == 0:
+                entry = (version, None, SCOPE_ENTRY_OVERHEAD, now)
+            else:
+                entry = await self._load(scope, version, now)
+            if edits == self._edits:
+                self._matchers.put(scope, entry)
+            if entry[1] is not None:
+                checkers.append(entry[1])
+        return checkers
+
+    @staticmethod
+    async def _fetch_versions(scopes: list[tuple[str, int]]) -> dict:
+        """Число слов и версия областей одним запросом по первичному ключу banned_word_scopes."""
+        conditions = " OR ".join(["(scope_type = ? AND scope_id = ?)"] * len(scopes))
+        params = [value for scope in scopes for value in scope]
+        rows = await get_db().fetchall(
+            f"SELECT scope_type, scope_id, words, version FROM banned_word_scopes WHERE {conditions}", params
+        )
+        return {(scope_type, scope_id): (words, version) for scope_type, scope_id, words, version in rows}
+
+    async def _load(self, scope: tuple[str, int], version: int, now: float) -> tuple:
+        # Слова читаются после версии: если их успели поменять, версия окажется старой
+        # и область перезагрузится при следующей сверке
+        rows = await get_db().fetchall(
+            "SELECT word FROM banned_words WHERE scope_type = ? AND scope_id = ?", scope
+        )
+        words = frozenset(row[0] for row in rows)
+        loop = asyncio.get_running_loop()
+        checker = await loop.run_in_executor(None, content_filter.checker_for, words)
+        self.loads += 1
+        return version, checker, estimate_matcher_bytes(words, content_filter.mode), now
+
+    async def list_words(self, scope_type: str, scope_id: int) -> list[str]:
+        rows = await get_db().fetchall(
+            "SELECT word FROM banned_words WHERE scope_type = ? AND scope_id = ? ORDER BY word",
+            (scope_type, scope_id)
+        )
+        return [row[0] for row in rows]
+
+    async def add_words(self, scope_type: str, scope_id: int, words) -> list[str]:
+        """Добавляет слова в список области. Возвращает слова, которых в нем еще не было."""
+        words = list(dict.fromkeys(word for word in words if word))
+        if not words:
+            return []
+        rows = await get_db().execute_returning(
+            """INSERT INTO banned_words (scope_type, scope_id, word)
+               SELECT ?, ?, value FROM json_each(?) WHERE true
+               ON CONFLICT (scope_type, scope_id, word) DO NOTHING
+               RETURNING word""",
+            (scope_type, scope_id, json.dumps(words, ensure_ascii=False))
+        )
+        self._forget(scope_type, scope_id)
+        logger.info(f"Added {len(rows)} banned word(s) to {scope_type} {scope_id}.")
+        return [row[0] for row in rows]
+
+    async def remove_word(self, scope_type: str, scope_id: int, word: str) -> bool:
+        cursor = await get_db().execute(
+            "DELETE FROM banned_words WHERE scope_type = ? AND scope_id = ? AND word = ?",
+            (scope_type, scope_id, word), commit=True
+        )
+        self._forget(scope_type, scope_id)
+        return cursor.rowcount > 0
+
+    def _forget(self, scope_type: str, scope_id: int):
+        self._edits += 1
+        self._matchers.pop((scope_type, scope_id))
+
+    def stats(self) -> dict:
+        return {**self._matchers.stats(), "loads": self.loads}
+
+
+scoped_words = ScopedWordLists()
@@ -0,0 +1,116 @@
+"""
+Разобранные шаблоны постов.
+
+Текст шаблона разбирается один раз, при сохранении, на сегменты: CUSTOM_VAR_REGEX.split дает список,
+в котором на четных местах стоит обычный текст, а на нечетных - имена переменных {[имя]}. Сегменты
+и имена переменных хранятся рядом с текстом (templates.segments и templates.variables, JSON);
+шаблоны, сохраненные до появления этих колонок, разбираются при первой загрузке. Подстановка
+значений - один "".join по сегментам, без повторного поиска переменных в тексте.
+
+Загруженные шаблоны держатся в LRU. Удаление шаблона сразу сбрасывает его запись, а удаление
+в другом процессе бота становится видно не позже чем через ttl секунд.
+"""
+import json
+import re
+import time
+
+from loader import get_db
+from bot_utils import escape_html
+from config import TEMPLATE_CACHE_SIZE, TEMPLATE_CACHE_TTL
+from services.lru_cache import LRUCache
+
+# Регулярное выражение для поиска переменных вида {[имя]}
+CUSTOM_VAR_REGEX = re.compile(r"{\[([^\]\[{}]+)\]}")
+
+
+def parse_template(content: str | None) -> list[str]:
+    """Сегменты шаблона: [текст, переменная, текст, ..., текст]."""
+    return CUSTOM_VAR_REGEX.split(content or "")
+
+
+def template_variables(segments: list[str]) -> list[str]:
+    """Имена переменных в порядке первого появления, без повторов."""
+    return list(dict.fromkeys(segments[1::2]))
+
+
+def template_columns(content: str | None) -> tuple[str, str]:
+    """Значения колонок segments и variables для INSERT шаблона."""
+    segments = parse_template(content)
+    return json.dumps(segments, ensure_ascii=False), json.dumps(template_variables(segments), ensure_ascii=False)
+
+
+def render_template(segments: list[str], values: dict[str, str]) -> str:
+    """Подставляет значения переменных; переменная без значения остается в тексте как есть."""
+    return "".join(segment if index % 2 == 0 else values.get(segment, f"{{[{segment}]}}")
+                   for index, segment in enumerate(segments))
+
+
+def template_preview_html(segments: list[str]) -> str:
+    """Текст шаблона для просмотра (HTML): переменные выделены."""
+    return "".join(escape_html(segment) if index % 2 == 0 else f"<code>{{[{escape_html(segment)}]}}</code>"
+                   for index, segment in enumerate(segments))
+
+
+class ParsedTemplate:
+    __slots__ = ("template_id", "user_id", "name", "media", "media_type", "segments", "variables", "loaded_at")
+
+    def __init__(self, template_id: int, user_id: int, name: str, media: str | None, media_type: str | None,
+                 segments: list[str], variables: list[str]):
+        self.template_id = template_id
+        self.user_id = user_id
+        self.name = name
+        self.media = media
+        self.media_type = media_type
+        self.segments = segments
+        self.variables = variables
+        self.loaded_at = time.monotonic()
+
+    def render(self, values: dict[str, str]) -> str:
+        return render_template(self.segments, values)
+
+
+class TemplateCache:
+    def __init__(self, max_entries: int = TEMPLATE_CACHE_SIZE, ttl: float = TEMPLATE_CACHE_TTL):
+        self.ttl = ttl
+        self._templates = LRUCache(max_entries)  # template_id -> ParsedTemplate
+        self._invalidations = 0  # Загрузка, начатая до сброса записи, не кладет результат в кэш
+
+    async def get(self, template_id: int, user_id: int) -> ParsedTemplate | None:
+        """Шаблон, доступный пользователю (общий или его личный), или None."""
+        template = self._templates.get(template_id)
+        if template is None or time.monotonic() - template.loaded_at >= self.ttl:
+            invalidations = self._invalidations
+            template = await self._load(template_id)
+            if template is None:
+                self._templates.pop(template_id)
+                return None
+            if invalidations == self._invalidations:
+                self._templates.put(template_id, template)
+        return template if template.user_id in (0, user_id) else None
+
+    @staticmethod
+    async def _load(template_id: int) -> ParsedTemplate | None:
+        row = await get_db().fetchone(
+            "SELECT user_id, name, content, media, media_type, segments, variables FROM templates WHERE id = ?",
+            (template_id,)
+        )
+        if not row:
+            return None
+        user_id, name, content, media, media_type, segments_json, variables_json = row
+        if segments_json is None:  # Шаблон сохранен до появления колонок - разбираем здесь
+            segments = parse_template(content)
+            variables = template_variables(segments)
+        else:
+            segments, variables = json.loads(segments_json), json.loads(variables_json)
+        return ParsedTemplate(template_id, user_id, name, media, media_type, segments, variables)
+
+    def invalidate(self, template_id: int):
+        """Вызывается при изменении или удалении шаблона."""
+        self._invalidations += 1
+        self._templates.pop(template_id)
+
+    def stats(self) -> dict:
+        return self._templates.stats()
+
+
+template_cache = TemplateCache()
@@ -0,0 +1,131 @@
+"""
+Поиск запрещенных слов по границам слов в нормализованном тексте (режим CONTENT_FILTER_MODE=words).
+
+Текст и запрещенные слова приводятся к одной форме функцией normalize_text():
+  * регистр и совместимые формы Unicode (casefold + NFKC посимвольно), ё -> е;
+  * латинские и цифровые двойники кириллических букв -> кириллица ("kaзинo" -> "казино");
+  * разделители внутри слова (точки, дефисы, звездочки, невидимые символы, диакритика) удаляются,
+    остальные не-буквы становятся пробелами ("к.а.з.и.н.о" -> "казино");
+  * повторы букв схлопываются ("казиииино" -> "казино"), буквы, набранные через пробел
+    (от трех подряд), склеиваются ("к а з и н о" -> "казино").
+Текст разбивается по пробелам, и каждое слово нормализуется один раз: результат кэшируется по самому слову
+(большинство слов повторяется из текста в текст), так что проверка - это split, поиск слов в кэше и один
+проход регулярного выражения, без посимвольной работы на Python.
+
+Запрещенное слово совпадает только с целым словом текста; "слово*" - со всеми словами, начинающимися
+на "слово"; фраза из нескольких слов - с такой же последовательностью слов.
+"""
+import re
+import unicodedata
+
+from services.aho_corasick import build_matcher, matcher_state, matcher_from_state, release_matcher
+
+# Латинские буквы, цифры и знаки, похожие на кириллические буквы. Ключи - исходные символы (с учетом
+# регистра: "B" похожа на "В", а "b" - нет), значения - кириллица в нижнем регистре
+HOMOGLYPHS = {
+    "a": "а", "A": "а", "B": "в", "c": "с", "C": "с", "e": "е", "E": "е", "H": "н", "K": "к", "k": "к",
+    "M": "м", "o": "о", "O": "о", "p": "р", "P": "р", "T": "т", "x": "х", "X": "х", "y": "у", "Y": "у",
+    "ё": "е", "Ё": "е", "0": "о", "3": "з", "@": "а",
+}
+# Символы, которыми разбивают слово, чтобы обойти фильтр: внутри слова удаляются, а не разделяют его
+JOINERS = set(".-_*'`\"~|/\\+^­​‌‍⁠﻿")
+STEM_SUFFIX = "*"
+TOKEN_CACHE_SIZE = 100_000  # Сколько нормализованных слов хранить; при переполнении кэш очищается
+
+_REPEATS = re.compile(r"(.)\1+")  # Повторы одного символа
+_SPACED_LETTERS = re.compile(r" (?:[^ ] ){2,}[^ ](?= )")  # Три и больше "слова" из одной буквы подряд
+
+
+class _FoldTable(dict):
+    """Таблица для str.translate: символ -> нормализованная строка, пустая строка или пробел.
+    Заполняется при первой встрече символа (__missing__), дальше translate берет готовое значение."""
+
+    def __missing__(self, code: int) -> str:
+        char = chr(code)
+        if char in HOMOGLYPHS:
+            folded = HOMOGLYPHS[char]
+        elif char in JOINERS or unicodedata.category(char) in ("Mn", "Me", "Cf"):
+            folded = ""
+        else:
+            folded = "".join(HOMOGLYPHS.get(c, c) for c in unicodedata.normalize("NFKC", char).casefold())
+            if not folded.isalnum():
+                folded = " "
+        self[code] = folded
+        return folded
+
+
+class _TokenCache(dict):
+    """Слово текста (как его дал str.split) -> нормализованные слова через пробел или пустая строка."""
+
+    def __missing__(self, token: str) -> str:
+        if len(self) >= TOKEN_CACHE_SIZE:
+            self.clear()
+        folded = unicodedata.normalize("NFC", token).translate(_fold_table)
+        folded = " ".join(_REPEATS.sub(r"\1", folded).split())
+        self[token] = folded
+        return folded
+
+
+_fold_table = _FoldTable()
+_token_cache = _TokenCache()
+
+
+def normalize_text(text: str) -> str:
+    """Нормализованный текст: слова из букв и цифр, разделенные одним пробелом, с пробелами по краям."""
+    text = " ".join(filter(None, map(_token_cache.__getitem__, text.split())))
+    text = _SPACED_LETTERS.sub(lambda match: " " + match.group().replace(" ", ""), f" {text} ")
+    return text
+
+
+class WordMatcher:
+    """Индекс запрещенных слов: целые слова - в множестве, основы и фразы - в автомате по тексту с пробелами."""
+
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(word for word in words if word))
+        self._by_key: dict[str, str] = {}  # Нормализованная форма -> слово, как оно записано в списке
+        single_words, patterns = set(), []
+        for word in self.words:
+            is_stem = word.endswith(STEM_SUFFIX)
+            key = normalize_text(word.rstrip(STEM_SUFFIX) if is_stem else word).strip()
+            if not key:
+                continue
+            if is_stem:
+                pattern = f" {key}"
+            elif " " in key:
+                pattern = f" {key} "
+            else:
+                single_words.add(key)
+                self._by_key[key] = word
+                continue
+            patterns.append(pattern)
+            self._by_key[pattern] = word
+        self._single_words = frozenset(single_words)
+        self._patterns = build_matcher(patterns) if patterns else None
+
+    def to_state(self) -> dict:
+        """Индекс как простые данные: нормализация слов при загрузке не повторяется."""
+        return {"words": self.words, "by_key": self._by_key, "single_words": sorted(self._single_words),
+                "patterns": matcher_state(self._patterns) if self._patterns is not None else None}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "WordMatcher":
+        by_key = state["by_key"]
+        single_words = frozenset(state["single_words"])
+        patterns = matcher_from_state(state["patterns"]) if state["patterns"] is not None else None
+        if not single_words.issubset(by_key) or (patterns is not None and not set(patterns.words).issubset(by_key)):
+            raise ValueError("слово индекса без записи в by_key")
+        matcher = cls.__new__(cls)
+        matcher.words, matcher._by_key, matcher._single_words, matcher._patterns = \
+            state["words"], by_key, single_words, patterns
+        return matcher
+
+    def release(self):
+        if self._patterns is not None:
+            release_matcher(self._patterns)
+
+    def find_all(self, text: str) -> list[str]:
+        normalized = normalize_text(text)
+        found = [self._by_key[key] for key in self._single_words.intersection(normalized.split())]
+        if self._patterns is not None:
+            found.extend(self._by_key[pattern] for pattern in self._patterns.find_all(normalized))
+        return list(dict.fromkeys(found))